@@ -9,6 +9,7 @@ const db = require('./database');
 // Import middleware
 const { requireAuth } = require('./middleware/auth');
 const { logAction } = require('./middleware/audit');
+const { insertAlert } = require('./utils/alerts');
 
 // Import routes
 const agentsRouter = require('./routes/agents');
@@ -210,11 +211,8 @@ app.delete('/api/groups/:id/members/:agentId', (req, res) => {
 // Alerts endpoint (convenience alias)
 app.post('/api/alerts', (req, res) => {
     try {
-        const { agent_id, alert_id, rule_id, rule_name, description, category, severity, event } = req.body;
-        db.prepare(`
-            INSERT INTO alerts (agent_id, alert_id, rule_id, rule_name, description, category, severity, event_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        `).run(agent_id, alert_id, rule_id, rule_name, description, category, severity, JSON.stringify(event || {}));
+        const { agent_id, ...alert } = req.body;
+        insertAlert(db, agent_id, alert);
         res.json({ success: true });
     } catch (error) {
         res.status(500).json({ error: error.message });
@@ -15,6 +15,13 @@ const SKIP_AUTH_PATHS = [
     '/api/health',
 ];
 
+// Agent-facing downloads (GET only); they need the agent token issued at
+// registration, since the EDM index header carries its salt
+const AGENT_DOWNLOAD_PATHS = [
+    '/api/monitoring/dlp/edm-index',
+    '/api/monitoring/dlp/fingerprint-index',
+];
+
 function requireAuth(req, res, next) {
     // Skip auth for non-API routes
     if (!req.path.startsWith('/api/')) {
@@ -40,6 +47,11 @@ function requireAuth(req, res, next) {
     const token = authHeader.split(' ')[1];
     try {
         const decoded = jwt.verify(token, JWT_SECRET);
+        // Agent tokens only open the agent downloads
+        if (decoded.role === 'agent' &&
+            !(AGENT_DOWNLOAD_PATHS.includes(req.path) && req.method === 'GET')) {
+            return res.status(403).json({ error: 'Insufficient permissions' });
+        }
         req.user = decoded;
         next();
     } catch (error) {
@@ -59,4 +71,13 @@ function requireRole(...roles) {
     };
 }
 
-module.exports = { requireAuth, requireRole, JWT_SECRET };
+/**
+ * Token an agent sends for the agent downloads
+ * @param {string} agentId - Registered agent
+ * @returns {string} Signed JWT with role 'agent'
+ */
+function signAgentToken(agentId) {
+    return jwt.sign({ agent_id: agentId, role: 'agent' }, JWT_SECRET, { expiresIn: '7d' });
+}
+
+module.exports = { requireAuth, requireRole, signAgentToken, JWT_SECRET };
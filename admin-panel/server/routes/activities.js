@@ -2,10 +2,28 @@ const express = require('express');
 const router = express.Router();
 const db = require('../database');
 
+// Expand a packed batch: { strings: [...], rows: [[app, title, exe, started_at, ended_at, duration]] }
+// where app, title and exe index into strings (-1 for none)
+function unpackActivities(packed) {
+    if (!packed || !Array.isArray(packed.strings) || !Array.isArray(packed.rows)) {
+        return null;
+    }
+    const str = (i) => (i >= 0 && i < packed.strings.length ? packed.strings[i] : null);
+    return packed.rows.map(([app, title, exe, started_at, ended_at, duration_seconds]) => ({
+        app_name: str(app),
+        window_title: str(title),
+        executable_path: str(exe),
+        started_at,
+        ended_at,
+        duration_seconds
+    }));
+}
+
 // Submit activity data from agent
 router.post('/', (req, res) => {
     try {
-        const { agent_id, activities } = req.body;
+        const { agent_id, packed_activities } = req.body;
+        const activities = packed_activities ? unpackActivities(packed_activities) : req.body.activities;
 
         if (!agent_id || !activities || !Array.isArray(activities)) {
             return res.status(400).json({ error: 'Invalid request data' });
@@ -2,6 +2,17 @@ const express = require('express');
 const router = express.Router();
 const db = require('../database');
 const { v4: uuidv4 } = require('uuid');
+const { signAgentToken } = require('../middleware/auth');
+
+// File exclusion/category/sensitivity rules pushed to agents (settings key 'file_rules')
+function getFileRules() {
+    try {
+        const row = db.prepare("SELECT value FROM settings WHERE key = 'file_rules'").get();
+        return row ? JSON.parse(row.value) : null;
+    } catch (e) {
+        return null;
+    }
+}
 
 // Register a new agent
 router.post('/register', (req, res) => {
@@ -58,10 +69,12 @@ router.post('/register', (req, res) => {
         res.json({
             success: true,
             agent_id: agentId,
+            agent_token: signAgentToken(agentId),
             usb_policies: policies,
             blocked_apps: blockedApps,
             blocked_websites: blockedWebsites,
-            device_policy: {}
+            device_policy: {},
+            file_rules: getFileRules()
         });
     } catch (error) {
         console.error('Agent registration error:', error);
@@ -89,7 +102,8 @@ router.post('/heartbeat', (req, res) => {
 
         res.json({
             success: true,
-            usb_policies: policies
+            usb_policies: policies,
+            file_rules: getFileRules()
         });
     } catch (error) {
         console.error('Heartbeat error:', error);
@@ -3,8 +3,23 @@
  */
 
 const express = require('express');
+const path = require('path');
+const fs = require('fs');
+const { requireRole } = require('../middleware/auth');
+const { ensureAlertColumns, insertAlert, applyAlertUpdate } = require('../utils/alerts');
 const router = express.Router();
 
+// DLP indexes agents download, kept next to the database:
+// edm-index (agent/monitors/dlp_edm.py), fingerprint-index (agent/monitors/dlp_fingerprint.py)
+const isPackaged = __dirname.includes('app.asar');
+const dlpIndexDir = isPackaged
+    ? path.join(process.env.APPDATA || path.join(require('os').homedir(), 'AppData', 'Roaming'), 'employee-monitor-admin')
+    : path.join(__dirname, '..', '..', 'data');
+const DLP_INDEXES = {
+    'edm-index': { file: 'dlp-edm.idx', magic: 'EDM1' },
+    'fingerprint-index': { file: 'dlp-fingerprints.idx', magic: 'FPX1' },
+};
+
 module.exports = (db) => {
     // Create monitoring tables if they don't exist
     db.exec(`
@@ -200,6 +215,7 @@ module.exports = (db) => {
         );
 
         CREATE INDEX IF NOT EXISTS idx_alerts_agent ON alerts(agent_id);
+        CREATE INDEX IF NOT EXISTS idx_alerts_agent_alert ON alerts(agent_id, alert_id);
         CREATE INDEX IF NOT EXISTS idx_alerts_severity ON alerts(severity);
         CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts(created_at);
         CREATE INDEX IF NOT EXISTS idx_web_history_agent ON web_history(agent_id);
@@ -308,6 +324,9 @@ module.exports = (db) => {
         CREATE UNIQUE INDEX IF NOT EXISTS idx_report_schedules_unique ON report_schedules(agent_id, report_type);
     `);
 
+    // Coalesced alerts carry count, first_seen, last_seen and samples
+    ensureAlertColumns(db);
+
     // Receive aggregated monitoring data
     router.post('/data', (req, res) => {
         try {
@@ -321,6 +340,7 @@ module.exports = (db) => {
                 device_events,
                 login_events,
                 alerts,
+                alert_updates,
                 risk_score,
                 productivity,
                 time_tracking,
@@ -483,26 +503,23 @@ module.exports = (db) => {
 
             // Store alerts
             if (alerts && alerts.length > 0) {
-                const alertStmt = db.prepare(`
-                    INSERT INTO alerts (agent_id, alert_id, rule_id, rule_name, description, category, severity, event_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                `);
+                // Agents resend alerts until acknowledged; insertAlert skips ones already stored
                 for (const alert of alerts.slice(0, 20)) {
                     try {
-                        alertStmt.run(
-                            agent_id,
-                            alert.alert_id,
-                            alert.rule_id,
-                            alert.rule_name,
-                            alert.description,
-                            alert.category,
-                            alert.severity,
-                            JSON.stringify(alert.event || {})
-                        );
+                        insertAlert(db, agent_id, alert);
                     } catch (e) { console.error('Insert error (alerts):', e.message); }
                 }
             }
 
+            // Apply count/sample deltas for coalesced alerts
+            if (alert_updates && alert_updates.length > 0) {
+                for (const update of alert_updates.slice(0, 200)) {
+                    try {
+                        applyAlertUpdate(db, agent_id, update);
+                    } catch (e) { console.error('Update error (alerts):', e.message); }
+                }
+            }
+
             // Store productivity score
             if (productivity && productivity.score !== undefined) {
                 const today = new Date().toISOString().split('T')[0];
@@ -986,6 +1003,48 @@ module.exports = (db) => {
         }
     });
 
+    // ==================== DLP INDEXES ====================
+    for (const [name, index] of Object.entries(DLP_INDEXES)) {
+        const indexPath = path.join(dlpIndexDir, index.file);
+
+        // Agents download the index; sendFile answers If-None-Match with 304
+        router.get(`/dlp/${name}`, (req, res) => {
+            if (!fs.existsSync(indexPath)) {
+                return res.status(404).json({ error: `No ${name} configured` });
+            }
+            res.sendFile(indexPath, { headers: { 'Content-Type': 'application/octet-stream' } }, (error) => {
+                if (error && !res.headersSent) {
+                    res.status(500).json({ error: error.message });
+                }
+            });
+        });
+
+        // Upload a new index (raw file body); agents pick it up on their next sync
+        router.put(`/dlp/${name}`, requireRole('admin'),
+            express.raw({ type: 'application/octet-stream', limit: '512mb' }), (req, res) => {
+                try {
+                    if (!Buffer.isBuffer(req.body) || req.body.subarray(0, 4).toString('latin1') !== index.magic) {
+                        return res.status(400).json({ error: `Not a ${name} file` });
+                    }
+                    const tmpPath = indexPath + '.tmp';
+                    fs.writeFileSync(tmpPath, req.body);
+                    fs.renameSync(tmpPath, indexPath);
+                    res.json({ success: true, size: req.body.length });
+                } catch (error) {
+                    res.status(500).json({ error: error.message });
+                }
+            });
+
+        router.delete(`/dlp/${name}`, requireRole('admin'), (req, res) => {
+            try {
+                if (fs.existsSync(indexPath)) fs.unlinkSync(indexPath);
+                res.json({ success: true });
+            } catch (error) {
+                res.status(500).json({ error: error.message });
+            }
+        });
+    }
+
     // ==================== DEVICE EVENTS ====================
     // Get device events - supports both URL param and query param
     router.get('/device-events/:agent_id?', (req, res) => {
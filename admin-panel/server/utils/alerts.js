@@ -0,0 +1,92 @@
+/**
+ * Alert Storage Utility
+ * Stores agent alerts and applies coalescing deltas (count, last_seen, samples)
+ */
+
+// Matches the agent's AlertCoalescer max_samples
+const MAX_ALERT_SAMPLES = 5;
+
+/**
+ * Add the coalescing columns to an existing alerts table
+ * @param {Object} db - Database instance
+ */
+function ensureAlertColumns(db) {
+    for (const column of ['count INTEGER DEFAULT 1', 'first_seen TEXT', 'last_seen TEXT', 'samples TEXT']) {
+        try {
+            db.exec(`ALTER TABLE alerts ADD COLUMN ${column}`);
+        } catch (e) {
+            // Column already exists
+        }
+    }
+}
+
+/**
+ * Store an alert unless it is already stored (agents resend until acknowledged)
+ * @param {Object} db - Database instance
+ * @param {string} agentId - Agent the alert came from
+ * @param {Object} alert - Alert as sent by the agent
+ * @returns {boolean} True if a row was inserted
+ */
+function insertAlert(db, agentId, alert) {
+    if (alert.alert_id && db.prepare('SELECT 1 FROM alerts WHERE agent_id = ? AND alert_id = ?').get(agentId, alert.alert_id)) {
+        // Already stored; the resend may carry a higher count
+        if (alert.count) applyAlertUpdate(db, agentId, { ...alert, new_samples: [] });
+        return false;
+    }
+    db.prepare(`
+        INSERT INTO alerts (agent_id, alert_id, rule_id, rule_name, description, category, severity, event_data,
+                            count, first_seen, last_seen, samples)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    `).run(
+        agentId,
+        alert.alert_id,
+        alert.rule_id,
+        alert.rule_name,
+        alert.description,
+        alert.category,
+        alert.severity,
+        JSON.stringify(alert.event || {}),
+        alert.count || 1,
+        alert.first_seen || alert.timestamp || null,
+        alert.last_seen || alert.timestamp || null,
+        JSON.stringify((alert.samples || []).slice(0, MAX_ALERT_SAMPLES))
+    );
+    return true;
+}
+
+/**
+ * Apply a coalescing delta to a stored alert
+ *
+ * Deltas can arrive twice (WebSocket and HTTP upload) or out of order, so
+ * the count only ever grows and samples are only added by a newer count.
+ * @param {Object} db - Database instance
+ * @param {string} agentId - Agent the update came from
+ * @param {Object} update - { alert_id, count, last_seen, new_samples }
+ * @returns {boolean} True if the stored alert changed
+ */
+function applyAlertUpdate(db, agentId, update) {
+    if (!update || !update.alert_id || !update.count) return false;
+    const row = db.prepare('SELECT count, samples FROM alerts WHERE agent_id = ? AND alert_id = ?')
+        .get(agentId, update.alert_id);
+    // Not stored yet: the alert itself carries the latest count when it arrives
+    if (!row || update.count <= (row.count || 1)) return false;
+
+    let samples = [];
+    try {
+        samples = JSON.parse(row.samples || '[]');
+    } catch (e) {
+        // Unreadable samples are replaced
+    }
+    samples = samples.concat(update.new_samples || []).slice(0, MAX_ALERT_SAMPLES);
+
+    db.prepare('UPDATE alerts SET count = ?, last_seen = COALESCE(?, last_seen), samples = ? WHERE agent_id = ? AND alert_id = ?')
+        .run(update.count, update.last_seen || null, JSON.stringify(samples), agentId, update.alert_id);
+    return true;
+}
+
+module.exports = {
+    MAX_ALERT_SAMPLES,
+    ensureAlertColumns,
+    insertAlert,
+    applyAlertUpdate
+};
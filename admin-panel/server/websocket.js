@@ -2,6 +2,7 @@ const WebSocket = require('ws');
 const jwt = require('jsonwebtoken');
 const db = require('./database');
 const { JWT_SECRET } = require('./middleware/auth');
+const { applyAlertUpdate } = require('./utils/alerts');
 
 // Try to load email utility (optional dependency)
 let emailUtils = null;
@@ -117,6 +118,7 @@ function handleMessage(ws, data, context) {
             if (data.token) {
                 try {
                     const decoded = jwt.verify(data.token, JWT_SECRET);
+                    if (decoded.role === 'agent') throw new Error('Agent token');
                     ws.user = decoded;
                 } catch (e) {
                     ws.send(JSON.stringify({ type: 'error', message: 'Invalid token' }));
@@ -262,6 +264,22 @@ function handleMessage(ws, data, context) {
             }
             break;
 
+        // Count/sample delta for a coalesced alert (no repeat email)
+        case 'alert_update':
+            if (clientType === 'agent') {
+                try {
+                    applyAlertUpdate(db, agentId, data.alert);
+                } catch (e) {
+                    console.error('Error updating alert:', e);
+                }
+                broadcastToAdmins({
+                    type: 'alert_update',
+                    agent_id: agentId,
+                    alert: data.alert
+                });
+            }
+            break;
+
         // Screen stream frame from agent
         case 'screen_frame':
             if (clientType === 'agent') {
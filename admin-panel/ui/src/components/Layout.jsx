@@ -150,6 +150,9 @@ export default function Layout() {
         if (alert.severity === 'critical' || alert.severity === 'high') {
           showNotification(`${alert.severity.toUpperCase()}: ${alert.rule_name || 'Alert triggered'}`, 'error')
         }
+      } else if (data.type === 'alert_update') {
+        // A coalesced alert fired again; no new notification
+        window.dispatchEvent(new CustomEvent('alert_update', { detail: data }))
       } else if (data.type === 'screenshot_requested') {
         showNotification('Screenshot requested - waiting for agent...', 'info')
       } else if (data.type === 'screenshot_ready') {
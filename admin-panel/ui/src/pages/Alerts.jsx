@@ -85,6 +85,21 @@ export default function Alerts() {
     fetchAlerts()
   }, [selectedAgent, dateRange])
 
+  // Coalesced alerts keep counting while the page is open
+  useEffect(() => {
+    const handleAlertUpdate = (event) => {
+      const { agent_id, alert: update } = event.detail || {}
+      if (!update || !update.alert_id) return
+      setAlerts(prev => prev.map(a =>
+        a.agent_id === agent_id && a.alert_id === update.alert_id && update.count > (a.count || 1)
+          ? { ...a, count: update.count, last_seen: update.last_seen || a.last_seen }
+          : a
+      ))
+    }
+    window.addEventListener('alert_update', handleAlertUpdate)
+    return () => window.removeEventListener('alert_update', handleAlertUpdate)
+  }, [])
+
   const fetchAgents = async () => {
     if (USE_MOCK_DATA) {
       setAgents(MOCK_AGENTS)
@@ -891,6 +906,11 @@ export default function Alerts() {
                         <span style={{ fontSize: '13px', fontWeight: 600, color: '#1e293b' }}>
                           {alert.rule_name || 'Unknown Alert'}
                         </span>
+                        {alert.count > 1 && (
+                          <span style={{ marginLeft: '6px', fontSize: '11px', fontWeight: 600, color: '#64748b' }}>
+                            ×{alert.count}
+                          </span>
+                        )}
                         {alert.description && (
                           <p style={{ fontSize: '12px', color: '#64748b', marginTop: '2px', overflow: 'hidden', textOverflow: 'ellipsis', whiteSpace: 'nowrap' }}>
                             {alert.description}
@@ -0,0 +1,239 @@
+"""
+DLP Benchmark - Throughput, recall and memory of DLPMonitor on a synthetic corpus
+Runs on any platform (imports the DLP modules directly, not the Windows monitors package)
+
+Usage:
+    python benchmarks/dlp_benchmark.py --size 4 --output results.json
+    python benchmarks/dlp_benchmark.py --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(AGENT_DIR, 'monitors'))
+sys.path.insert(0, BENCH_DIR)
+
+from dlp_monitor import DLPMonitor, CONTEXT_KEYWORDS
+from dlp_scanner import PatternScanner
+from dlp_corpus import CorpusGenerator, KINDS
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+MB = 1024 * 1024
+
+
+def best_time(fn, repeat):
+    """Fastest of `repeat` runs; returns (seconds, last result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def peak_memory(fn):
+    """Peak Python heap allocated while fn runs, in MB"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / MB
+    finally:
+        tracemalloc.stop()
+
+
+def recall(alerts, planted):
+    """Per type: (planted, planted values found) -- a find counts if it starts inside one"""
+    found = {}
+    by_type = {}
+    for alert in alerts:
+        by_type.setdefault(alert['type'], []).append(alert['offset'])
+    for kind, start, end in planted:
+        hits = found.setdefault(kind, [0, 0])
+        hits[0] += 1
+        if any(start <= offset < end for offset in by_type.get(kind, ())):
+            hits[1] += 1
+    return found
+
+
+def bench_kind(kind, size, generator, repeat):
+    """Benchmark one kind of text"""
+    text, planted = generator.generate(kind, size)
+    megabytes = len(text.encode('utf-8')) / MB
+
+    # No cache, match cap or time budget: every run does the full work
+    monitor = DLPMonitor(cache_size=0, max_pattern_matches=10 ** 9, scan_budget=None, file_scan_budget=None)
+    text_seconds, alerts = best_time(lambda: monitor.scan_text(text, source='benchmark'), repeat)
+    text_peak = peak_memory(lambda: monitor.scan_text(text, source='benchmark'))
+
+    fd, path = tempfile.mkstemp(suffix='.txt', prefix='dlp-bench-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        file_seconds, file_alerts = best_time(lambda: monitor.scan_file(path), repeat)
+        file_peak = peak_memory(lambda: monitor.scan_file(path))
+    finally:
+        os.remove(path)
+
+    found = recall(alerts, planted)
+    patterns = {}
+    for name, config in monitor.compiled_patterns.items():
+        # Each pattern alone, anchor pass included
+        scanner = PatternScanner({name: config}, {})
+        seconds, (matches, _) = best_time(lambda: scanner.scan(text), repeat)
+        planted_count, planted_found = found.get(name, (0, 0))
+        patterns[name] = {
+            'mb_per_s': round(megabytes / seconds, 2) if seconds else None,
+            'matches': len(matches),
+            'alerts': sum(1 for a in alerts if a['type'] == name),
+            'planted': planted_count,
+            'planted_found': planted_found,
+        }
+
+    planted_found = sum(hits[1] for hits in found.values())
+    return {
+        'megabytes': round(megabytes, 3),
+        'planted': len(planted),
+        'planted_found': planted_found,
+        'recall': round(planted_found / len(planted), 4) if planted else None,
+        'scan_text': {
+            'seconds': round(text_seconds, 4),
+            'mb_per_s': round(megabytes / text_seconds, 2),
+            'peak_mb': round(text_peak, 2),
+            'alerts': len(alerts),
+        },
+        'scan_file': {
+            'seconds': round(file_seconds, 4),
+            'mb_per_s': round(megabytes / file_seconds, 2),
+            'peak_mb': round(file_peak, 2),
+            'alerts': len(file_alerts),
+        },
+        'patterns': patterns,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=AGENT_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(kinds, size_mb, seed, density, repeat, label=None):
+    """Run the benchmark and return the results dict"""
+    generator = CorpusGenerator(seed=seed, density=density)
+    results = {
+        'meta': {
+            'label': label,
+            'revision': git_revision(),
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'size_mb': size_mb,
+            'seed': seed,
+            'density': density,
+            'repeat': repeat,
+            'context_groups': sorted(CONTEXT_KEYWORDS),
+        },
+        'kinds': {},
+    }
+    for kind in kinds:
+        print(f"Benchmarking {kind} ({size_mb} MB)...")
+        result = bench_kind(kind, int(size_mb * MB), generator, repeat)
+        results['kinds'][kind] = result
+        print(f"  scan_text {result['scan_text']['mb_per_s']:7.2f} MB/s  "
+              f"peak {result['scan_text']['peak_mb']:6.2f} MB  |  "
+              f"scan_file {result['scan_file']['mb_per_s']:7.2f} MB/s  "
+              f"peak {result['scan_file']['peak_mb']:6.2f} MB  |  "
+              f"recall {result['planted_found']}/{result['planted']}")
+
+    total_mb = sum(r['megabytes'] for r in results['kinds'].values())
+    total_seconds = sum(r['scan_text']['seconds'] for r in results['kinds'].values())
+    results['overall'] = {
+        'megabytes': round(total_mb, 3),
+        'scan_text_mb_per_s': round(total_mb / total_seconds, 2) if total_seconds else None,
+        'recall': round(sum(r['planted_found'] for r in results['kinds'].values())
+                        / max(sum(r['planted'] for r in results['kinds'].values()), 1), 4),
+    }
+    return results
+
+
+def print_patterns(results):
+    kinds = list(results['kinds'])
+    names = list(next(iter(results['kinds'].values()))['patterns']) if kinds else []
+    print(f"\n{'pattern':16}" + ''.join(f"{k:>12}" for k in kinds) + "   (MB/s, alone)")
+    for name in names:
+        row = ''.join(f"{results['kinds'][k]['patterns'][name]['mb_per_s'] or 0:12.1f}" for k in kinds)
+        print(f"{name:16}{row}")
+
+
+def compare(current, previous):
+    """Print throughput changes against an earlier results file"""
+    print(f"\nCompared with {previous['meta'].get('label') or previous['meta'].get('revision')} "
+          f"({previous['meta'].get('timestamp')}):")
+    for key in ('size_mb', 'seed', 'density'):
+        if previous['meta'].get(key) != current['meta'][key]:
+            print(f"  Note: {key} differs ({previous['meta'].get(key)} vs {current['meta'][key]}), "
+                  f"so the corpora are not the same")
+    for kind, result in current['kinds'].items():
+        old = previous['kinds'].get(kind)
+        if not old:
+            continue
+        for mode in ('scan_text', 'scan_file'):
+            new_rate, old_rate = result[mode]['mb_per_s'], old[mode]['mb_per_s']
+            change = (new_rate / old_rate - 1) * 100 if old_rate else 0.0
+            print(f"  {kind:6} {mode:9} {old_rate:8.2f} -> {new_rate:8.2f} MB/s ({change:+.1f}%)  "
+                  f"peak {old[mode]['peak_mb']:.2f} -> {result[mode]['peak_mb']:.2f} MB")
+        if old['planted_found'] != result['planted_found'] and old['planted'] == result['planted']:
+            print(f"  {kind:6} recall {old['planted_found']} -> {result['planted_found']} of {result['planted']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DLP scanning benchmark')
+    parser.add_argument('--size', type=float, default=2.0, help='MB of text per corpus kind')
+    parser.add_argument('--kinds', default=','.join(KINDS), help='Comma-separated corpus kinds')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus seed')
+    parser.add_argument('--density', type=int, default=200, help='Planted secrets per MB')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per measurement (best kept)')
+    parser.add_argument('--label', help='Name for this run, e.g. a version')
+    parser.add_argument('--output', '-o', help='Results JSON path (default: benchmarks/results/)')
+    parser.add_argument('--compare', '-c', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    kinds = [k for k in args.kinds.split(',') if k]
+    for kind in kinds:
+        if kind not in KINDS:
+            parser.error(f"unknown kind {kind!r} (choose from {', '.join(KINDS)})")
+
+    results = run(kinds, args.size, args.seed, args.density, args.repeat, args.label)
+    print_patterns(results)
+    print(f"\nOverall: {results['overall']['scan_text_mb_per_s']} MB/s scan_text, "
+          f"recall {results['overall']['recall']:.2%}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = args.label or results['meta']['revision'] or 'run'
+        output = os.path.join(RESULTS_DIR, f"dlp-{name}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,8 @@ class APIClient:
         self.server_url = server_url or SERVER_URL
         self.session = self._create_session()
         self.agent_id = None
+        self.agent_token = None  # sent with the DLP index downloads
+        self.registration = None  # register() arguments, to renew the token
 
     def _create_session(self):
         """Create a requests session with retry logic"""
@@ -46,6 +48,7 @@ class APIClient:
 
     def register(self, employee_name, pc_name, os_version):
         """Register agent with the server"""
+        self.registration = (employee_name, pc_name, os_version)
         try:
             response = self.session.post(
                 f"{self.server_url}/api/agents/register",
@@ -61,6 +64,7 @@ class APIClient:
 
             if data.get('success'):
                 self.agent_id = data.get('agent_id')
+                self.agent_token = data.get('agent_token')
                 return {
                     'success': True,
                     'agent_id': self.agent_id,
@@ -102,7 +106,7 @@ class APIClient:
                 f"{self.server_url}/api/activities",
                 json={
                     'agent_id': self.agent_id,
-                    'activities': activities
+                    'packed_activities': self._pack_activities(activities)
                 },
                 timeout=10
             )
@@ -111,6 +115,34 @@ class APIClient:
         except requests.RequestException as e:
             return {'success': False, 'error': str(e)}
 
+    @staticmethod
+    def _pack_activities(activities):
+        """
+        Activities as a per-batch string table and rows that index into it
+
+        Rows are [app, title, exe, started_at, ended_at, duration_seconds];
+        app, title and exe are string indexes (-1 for none), so a name or
+        title repeated across the batch is sent once. Durations are rounded
+        to whole seconds here, after segments have been merged.
+        """
+        strings, index = [], {}
+
+        def ref(value):
+            if value is None:
+                return -1
+            i = index.get(value)
+            if i is None:
+                i = index[value] = len(strings)
+                strings.append(value)
+            return i
+
+        rows = [
+            [ref(a.get('app_name')), ref(a.get('window_title')), ref(a.get('executable_path')),
+             a.get('started_at'), a.get('ended_at'), int(round(a.get('duration_seconds', 0)))]
+            for a in activities
+        ]
+        return {'strings': strings, 'rows': rows}
+
     def upload_screenshot(self, image_bytes, filename):
         """Upload screenshot to server"""
         if not self.agent_id:
@@ -219,6 +251,42 @@ class APIClient:
         except requests.RequestException:
             return {}
 
+    def get_dlp_index(self, name, etag=None):
+        """
+        Download a DLP index
+
+        Args:
+            name: 'edm-index' (Exact Data Match) or 'fingerprint-index' (documents)
+            etag: ETag of the index already held, so an unchanged one isn't resent
+
+        Returns:
+            (status, data, etag) where status is 'updated', 'unchanged',
+            'none' (the server has no index) or 'error'
+        """
+        headers = {'If-None-Match': etag} if etag else {}
+        try:
+            for attempt in range(2):
+                if self.agent_token:
+                    headers['Authorization'] = f"Bearer {self.agent_token}"
+                response = self.session.get(
+                    f"{self.server_url}/api/monitoring/dlp/{name}",
+                    headers=headers,
+                    timeout=60
+                )
+                # Expired agent token: registering again issues a new one
+                if response.status_code != 401 or attempt or not self.registration:
+                    break
+                if not self.register(*self.registration).get('success'):
+                    break
+            if response.status_code == 304:
+                return 'unchanged', None, etag
+            if response.status_code == 404:
+                return 'none', None, None
+            response.raise_for_status()
+            return 'updated', response.content, response.headers.get('ETag')
+        except requests.RequestException:
+            return 'error', None, etag
+
     def check_connection(self):
         """Check if server is reachable"""
         try:
@@ -29,9 +29,18 @@ EMAIL_CHECK_INTERVAL = 60  # seconds
 # Application Install Monitoring
 INSTALL_CHECK_INTERVAL = 60  # seconds
 
+# Hash files of file events to follow copies of sensitive files (also the
+# 'hashing' key of the server's file_rules setting)
+FILE_HASHING = False
+
+# DLP index downloads (Exact Data Match, document fingerprints)
+DLP_INDEX_SYNC_INTERVAL = 3600  # seconds
+
 # File paths
 APP_DATA_DIR = os.path.join(os.getenv('APPDATA', '.'), 'EmployeeMonitor')
 CONFIG_FILE = os.path.join(APP_DATA_DIR, 'config.json')
+EDM_INDEX_FILE = os.path.join(APP_DATA_DIR, 'dlp-edm.idx')
+FINGERPRINT_INDEX_FILE = os.path.join(APP_DATA_DIR, 'dlp-fingerprints.idx')
 
 # Ensure app data directory exists
 os.makedirs(APP_DATA_DIR, exist_ok=True)
@@ -9,6 +9,7 @@ import time
 import threading
 import argparse
 import ctypes
+import multiprocessing
 import socket
 import psutil
 from datetime import datetime
@@ -28,10 +29,11 @@ else:
 sys.path.insert(0, BASE_DIR)
 
 from config import (
-    load_config, save_config, get_or_create_agent_id,
+    load_config, save_config, get_or_create_agent_id, APP_DATA_DIR,
     HEARTBEAT_INTERVAL, ACTIVITY_SEND_INTERVAL, SERVER_URL, WS_URL,
     SERVER_HOST, SERVER_PORT, SCREENSHOT_INTERVAL,
-    NETWORK_MONITOR_INTERVAL, EMAIL_CHECK_INTERVAL, INSTALL_CHECK_INTERVAL
+    NETWORK_MONITOR_INTERVAL, EMAIL_CHECK_INTERVAL, INSTALL_CHECK_INTERVAL,
+    DLP_INDEX_SYNC_INTERVAL, EDM_INDEX_FILE, FINGERPRINT_INDEX_FILE, FILE_HASHING
 )
 from utils.system_info import get_system_info
 from utils.stealth import enable_stealth_mode, disable_stealth_mode, set_window_visibility
@@ -107,7 +109,13 @@ class EmployeeMonitorAgent:
         self._init_monitors()
 
         # Initialize alert engine and productivity scorer
-        self.alert_engine = AlertEngine(on_alert_callback=self.on_alert)
+        self.alert_updates = {}  # alert_id -> merged delta, until the next upload
+        self.alert_updates_lock = threading.Lock()
+        self.alert_engine = AlertEngine(
+            on_alert_callback=self.on_alert,
+            on_alert_update_callback=self.on_alert_update,
+            journal_dir=os.path.join(APP_DATA_DIR, 'alerts')
+        )
         self.productivity_scorer = ProductivityScorer()
 
         # Employee dashboard (optional, disabled in stealth mode)
@@ -139,9 +147,13 @@ class EmployeeMonitorAgent:
         )
 
         # Phase 3 monitors
-        self.file_monitor = FileMonitor(on_file_event_callback=self.on_file_event)
+        self.file_monitor = FileMonitor(on_file_event_callback=self.on_file_event, hashing=FILE_HASHING)
         self.print_monitor = PrintMonitor(on_print_callback=self.on_print_event)
-        self.dlp_monitor = DLPMonitor(on_alert_callback=self.on_dlp_alert)
+        self.dlp_monitor = DLPMonitor(
+            on_alert_callback=self.on_dlp_alert,
+            edm_index_path=EDM_INDEX_FILE if os.path.exists(EDM_INDEX_FILE) else None,
+            fingerprint_index_path=FINGERPRINT_INDEX_FILE if os.path.exists(FINGERPRINT_INDEX_FILE) else None
+        )
 
         # Phase 4 monitors
         self.device_control = DeviceControl(on_device_event_callback=self.on_device_event)
@@ -360,6 +372,10 @@ class EmployeeMonitorAgent:
         for site in blocked_sites:
             self.web_monitor.block_site(site)
 
+        # File exclusion, category and sensitivity rules
+        if 'file_rules' in registration_result:
+            self.file_monitor.update_rules(registration_result['file_rules'])
+
     def retry_registration(self):
         """Retry registration with exponential backoff"""
         delay = 5
@@ -392,11 +408,17 @@ class EmployeeMonitorAgent:
         self.auto_screenshot_thread = threading.Thread(target=self.auto_screenshot_loop, daemon=True)
         self.auto_screenshot_thread.start()
 
+        # DLP index sync thread (Exact Data Match, document fingerprints)
+        self.dlp_index_thread = threading.Thread(target=self.dlp_index_sync_loop, daemon=True)
+        self.dlp_index_thread.start()
+
     def heartbeat_loop(self):
         """Send periodic heartbeats"""
         while self.running:
             try:
-                self.api_client.heartbeat()
+                result = self.api_client.heartbeat()
+                if result.get('success') and 'file_rules' in result:
+                    self.file_monitor.update_rules(result['file_rules'])
 
                 if self.ws_client.connected:
                     self.ws_client.send_heartbeat()
@@ -411,12 +433,13 @@ class EmployeeMonitorAgent:
         while self.running:
             try:
                 # Process activities
-                activities = self.process_monitor.get_activities(clear=False)
+                # Taken and cleared at once, so segments merged during the send are kept
+                activities = self.process_monitor.get_activities(clear=True)
                 if activities:
                     result = self.api_client.send_activities(activities)
-                    if result.get('success'):
-                        self.process_monitor.get_activities(clear=True)
-
+                    if not result.get('success'):
+                        self.process_monitor.requeue_activities(activities)
+                    else:
                         # Update productivity scorer
                         for activity in activities:
                             self.productivity_scorer.record_app_time(
@@ -441,18 +464,24 @@ class EmployeeMonitorAgent:
                 if not self.running:
                     break
 
+                # Alerts stay queued (and journaled) until the server accepts them
+                pending_alerts = self.alert_engine.get_undelivered_alerts(limit=20)
+                with self.alert_updates_lock:
+                    pending_updates = list(self.alert_updates.values())
+
                 # Collect data from all monitors
                 data = {
                     'agent_id': self.agent_id,
                     'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
                     'web_history': self.web_monitor.get_visits()[-50:],
-                    'file_events': self.file_monitor.get_events()[-50:] if hasattr(self.file_monitor, 'get_events') else [],
+                    'file_events': self.file_monitor.get_events(limit=50) if hasattr(self.file_monitor, 'get_events') else [],
                     'print_jobs': self.print_monitor.get_job_history()[-20:] if hasattr(self.print_monitor, 'get_job_history') else [],
                     'dlp_alerts': self.dlp_monitor.get_alerts()[-20:],
                     'device_events': self.device_control.get_events()[-20:] if hasattr(self.device_control, 'get_events') else [],
                     'login_events': self.login_tracker.get_events()[-20:] if hasattr(self.login_tracker, 'get_events') else [],
                     'comm_events': self.comm_monitor.get_events()[-20:] if hasattr(self.comm_monitor, 'get_events') else [],
-                    'alerts': self.alert_engine.get_alerts()[-20:],
+                    'alerts': pending_alerts,
+                    'alert_updates': pending_updates,
                     'risk_score': self.alert_engine.get_risk_score(),
                     'productivity': self.productivity_scorer.calculate_score(),
                     'time_tracking': self.time_tracker.get_today_summary(),
@@ -464,11 +493,62 @@ class EmployeeMonitorAgent:
                 }
 
                 # Send to server
-                self.api_client.send_monitoring_data(data)
+                result = self.api_client.send_monitoring_data(data)
+                if result.get('success') and pending_alerts:
+                    self.alert_engine.mark_delivered([a['alert_id'] for a in pending_alerts])
+                if result.get('success') and pending_updates:
+                    with self.alert_updates_lock:
+                        for update in pending_updates:
+                            # Keep any that grew again while the upload was in flight
+                            if self.alert_updates.get(update['alert_id']) is update:
+                                del self.alert_updates[update['alert_id']]
 
             except Exception as e:
                 print(f"Data aggregation error: {e}")
 
+    def dlp_index_sync_loop(self):
+        """Keep the DLP indexes in step with the server"""
+        while self.running:
+            for name, path, load, clear in (
+                ('edm-index', EDM_INDEX_FILE,
+                 self.dlp_monitor.load_edm_index, self.dlp_monitor.clear_edm_index),
+                ('fingerprint-index', FINGERPRINT_INDEX_FILE,
+                 self.dlp_monitor.load_fingerprint_index, self.dlp_monitor.clear_fingerprint_index),
+            ):
+                try:
+                    self.sync_dlp_index(name, path, load, clear)
+                except Exception as e:
+                    print(f"DLP {name} sync error: {e}")
+
+            time.sleep(DLP_INDEX_SYNC_INTERVAL)
+
+    def sync_dlp_index(self, name, path, load, clear):
+        """Download a DLP index if it changed and load it into the DLP monitor"""
+        etag_key = name.replace('-', '_') + '_etag'
+        etag = self.config.get(etag_key) if os.path.exists(path) else None
+        status, data, etag = self.api_client.get_dlp_index(name, etag)
+
+        if status == 'updated':
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+            if load(path):
+                self.config[etag_key] = etag
+                print(f"[DLP] {name} loaded ({len(data)} bytes)")
+            else:
+                # Unusable download; fetch it again next time
+                os.remove(path)
+                self.config[etag_key] = None
+            save_config(self.config)
+
+        elif status == 'none' and os.path.exists(path):
+            clear()
+            os.remove(path)
+            self.config[etag_key] = None
+            save_config(self.config)
+            print(f"[DLP] {name} removed by server")
+
     def auto_screenshot_loop(self):
         """Take screenshots automatically at configured interval"""
         interval = self.config.get('screenshot_interval', SCREENSHOT_INTERVAL)
@@ -505,10 +585,10 @@ class EmployeeMonitorAgent:
             if alerts:
                 for alert in alerts:
                     self.alert_engine.process_event({
+                        **alert,
                         'type': 'dlp',
-                        'severity': alert['severity'],
+                        'pattern': alert['type'],
                         'source': 'clipboard',
-                        **alert
                     })
 
     def _on_idle_state_change(self, event):
@@ -565,18 +645,18 @@ class EmployeeMonitorAgent:
 
     def on_file_event(self, event):
         """Handle file event"""
-        if event.get('is_sensitive'):
-            self.alert_engine.process_event({
-                'type': 'file',
-                'is_sensitive': True,
-                **event
-            })
+        # All file events feed correlation rules; sensitive_file checks is_sensitive
+        self.alert_engine.process_event({
+            'type': 'file',
+            **event
+        })
 
-        # Check file content for DLP
-        if event.get('action') in ['created', 'modified']:
+        # Check file content for DLP (queued; scans run off the watcher thread)
+        action = event.get('action')
+        if action in ['created', 'modified'] or (action == 'renamed' and event.get('modified')):
             filepath = event.get('filepath')
-            if filepath and event.get('category') in ['documents', 'data']:
-                self.dlp_monitor.scan_file(filepath)
+            if filepath and event.get('category') in ['documents', 'data', 'archives']:
+                self.dlp_monitor.scan_file_async(filepath, sensitive=event.get('is_sensitive', False))
 
         self.alert_engine.record_activity('file_access')
 
@@ -591,9 +671,11 @@ class EmployeeMonitorAgent:
 
     def on_dlp_alert(self, alert):
         """Handle DLP alert"""
+        # DLP alerts carry the pattern name in 'type'; keep it as 'pattern'
         self.alert_engine.process_event({
+            **alert,
             'type': 'dlp',
-            **alert
+            'pattern': alert.get('type'),
         })
 
     def on_login_event(self, event):
@@ -638,6 +720,26 @@ class EmployeeMonitorAgent:
                     'alert': alert
                 })
 
+    def on_alert_update(self, update):
+        """Handle count/sample delta for a coalesced alert"""
+        # Every stored alert can grow, so every severity is updated. The
+        # latest count is also uploaded with the next batch, in case the
+        # WebSocket message is lost; the server ignores stale counts.
+        if self.ws_client.connected:
+            self.ws_client.send({
+                'type': 'alert_update',
+                'alert': update
+            })
+        with self.alert_updates_lock:
+            queued = self.alert_updates.get(update['alert_id'])
+            if queued is not None:
+                update = {
+                    **update,
+                    'count_delta': queued.get('count_delta', 0) + update.get('count_delta', 0),
+                    'new_samples': (queued.get('new_samples', []) + update.get('new_samples', []))[:5],
+                }
+            self.alert_updates[update['alert_id']] = update
+
     # WebSocket handlers
     def handle_screenshot_request(self):
         """Handle screenshot request"""
@@ -730,7 +832,7 @@ class EmployeeMonitorAgent:
             elif data_type == 'web_history':
                 data['web_history'] = self.web_monitor.get_visits()[-50:]
             elif data_type == 'file_events':
-                data['file_events'] = self.file_monitor.get_events()[-50:] if hasattr(self.file_monitor, 'get_events') else []
+                data['file_events'] = self.file_monitor.get_events(limit=50) if hasattr(self.file_monitor, 'get_events') else []
             elif data_type == 'dlp_alerts':
                 data['dlp_alerts'] = self.dlp_monitor.get_alerts()[-20:]
             elif data_type == 'print_jobs':
@@ -778,6 +880,8 @@ class EmployeeMonitorAgent:
                 'status': 'restarting'
             })
             time.sleep(1)
+            # Persist alert/risk state; execv skips normal shutdown
+            self.alert_engine.checkpoint()
             # Restart the process
             os.execv(sys.executable, ['python'] + sys.argv)
         except Exception as e:
@@ -912,6 +1016,7 @@ class EmployeeMonitorAgent:
             self.email_monitor,
             self.network_monitor,
             self.install_monitor,
+            self.dlp_monitor,
             self.alert_engine,
         ]
 
@@ -973,4 +1078,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # DLP scan workers are separate processes; needed for the frozen exe
+    multiprocessing.freeze_support()
     main()
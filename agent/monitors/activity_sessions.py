@@ -0,0 +1,211 @@
+"""
+Activity Sessions - Title-level activity segments with run-length compaction
+Window titles are normalized first (unread counters, unsaved markers), so a
+ticking "(3) Inbox" stays one segment. Segments too short to stand alone are
+folded into a neighbouring segment of the same app, so a title that keeps
+changing still counts all its time. Consecutive segments of the same app and
+title, such as those either side of a flicker, are merged into one, and
+repeated strings share one object.
+"""
+
+import re
+from collections import deque
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+
+MIN_SEGMENT_SECONDS = 1  # shorter segments are folded into a neighbour of the same app
+MERGE_GAP_SECONDS = 5  # identical segments at most this far apart are merged
+
+# (pattern, replacement) applied in order to every window title
+DEFAULT_TITLE_RULES = [
+    (r'^\(\d+\+?\)\s*', ''),  # "(3) Inbox - Gmail"
+    (r'^\[\d+\+?\]\s*', ''),  # "[2] Slack"
+    (r'^[●•*]\s*', ''),  # unsaved markers: "● main.py", "*Untitled"
+    (r'\s+-\s+\d+\s+(?:new|unread)\s+(?:messages?|items?)(?=\s+-|$)', ''),  # "Inbox - 4 unread messages - Outlook"
+    (r'\s{2,}', ' '),
+]
+
+
+class TitleNormalizer:
+    """
+    Rewrites window titles through an ordered list of regex rules
+
+    Results are memoized, since the same few titles come back all day.
+
+    Args:
+        rules: [(pattern, replacement)] (default DEFAULT_TITLE_RULES)
+    """
+
+    MEMO_SIZE = 2048
+
+    def __init__(self, rules: Optional[Iterable[Tuple[str, str]]] = None):
+        self.rules = [(re.compile(pattern), replacement)
+                      for pattern, replacement in (DEFAULT_TITLE_RULES if rules is None else rules)]
+        self.memo = {}
+
+    def add_rule(self, pattern: str, replacement: str = ''):
+        """Append a rule (applied after the existing ones)"""
+        self.rules.append((re.compile(pattern), replacement))
+        self.memo = {}
+
+    def normalize(self, title: Optional[str]) -> str:
+        if not title:
+            return ''
+        normalized = self.memo.get(title)
+        if normalized is None:
+            normalized = title
+            for pattern, replacement in self.rules:
+                normalized = pattern.sub(replacement, normalized)
+            normalized = normalized.strip() or title.strip()
+            if len(self.memo) >= self.MEMO_SIZE:
+                self.memo = {}
+            self.memo[title] = normalized
+        return normalized
+
+
+class SessionLog:
+    """
+    Buffer of (app, title) activity segments, merged as they are recorded
+
+    A short segment extends the previous segment if that is the same app;
+    otherwise it is held and grows with the next short segments of that app
+    until it is long enough to record, or is taken in by the next segment of
+    that app. Only a short segment of another app between two segments is
+    dropped, and when those two merge the gap is counted in their duration.
+    Durations stay fractional; the sender rounds them.
+
+    Args:
+        maxlen: Segments kept; the oldest are dropped first
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self.segments = deque(maxlen=maxlen)
+        self.strings = {}  # intern table, reset with the buffer
+        self.last_key = None
+        self.last_start = self.last_end = None
+        self.pending = None  # [app, title, exe, started, ended] of a short segment
+        self.stats = {'recorded': 0, 'merged': 0, 'folded': 0, 'dropped': 0}
+
+    def _intern(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        return self.strings.setdefault(value, value)
+
+    def record(self, app_name: str, title: str, exe_path: Optional[str],
+               started: datetime, ended: datetime) -> bool:
+        """
+        Add a finished segment
+
+        Returns:
+            False if it was dropped
+        """
+        pending = self.pending
+        if (ended - started).total_seconds() < MIN_SEGMENT_SECONDS:
+            if (self.segments and (app_name, exe_path) == self.last_key[::2]
+                    and (started - self.last_end).total_seconds() <= MERGE_GAP_SECONDS):
+                # Another title of the app just recorded: count it there
+                self._extend(ended)
+                self.stats['folded'] += 1
+                return True
+            if (pending and (app_name, exe_path) == (pending[0], pending[2])
+                    and (started - pending[4]).total_seconds() <= MERGE_GAP_SECONDS):
+                pending[1], pending[4] = title, ended
+                self.stats['folded'] += 1
+            else:
+                if pending:
+                    self.stats['dropped'] += 1
+                self.pending = pending = [app_name, title, exe_path, started, ended]
+            if (pending[4] - pending[3]).total_seconds() < MIN_SEGMENT_SECONDS:
+                return True
+            # Long enough now, under its latest title
+            self.pending = None
+            app_name, title, exe_path, started, ended = pending
+        elif pending:
+            self.pending = None
+            if ((app_name, exe_path) == (pending[0], pending[2])
+                    and (started - pending[4]).total_seconds() <= MERGE_GAP_SECONDS):
+                started = pending[3]  # it led up to this segment
+                self.stats['folded'] += 1
+            else:
+                self.stats['dropped'] += 1
+
+        key = (app_name, title, exe_path)
+        if (self.segments and key == self.last_key
+                and (started - self.last_end).total_seconds() <= MERGE_GAP_SECONDS):
+            # Same app and title as the previous segment: extend it over the gap
+            self._extend(ended)
+            self.stats['merged'] += 1
+            return True
+
+        self.segments.append({
+            'app_name': self._intern(app_name),
+            'window_title': self._intern(title or ''),
+            'executable_path': self._intern(exe_path),
+            'started_at': started.isoformat(),
+            'ended_at': ended.isoformat(),
+            'duration_seconds': (ended - started).total_seconds(),
+        })
+        self.last_key = key
+        self.last_start, self.last_end = started, ended
+        self.stats['recorded'] += 1
+        return True
+
+    def _extend(self, ended: datetime):
+        """Move the end of the last segment"""
+        last = self.segments[-1]
+        last['ended_at'] = ended.isoformat()
+        last['duration_seconds'] = (ended - self.last_start).total_seconds()
+        self.last_end = ended
+
+    def get(self, clear: bool = False) -> List[dict]:
+        """
+        The buffered segments, oldest first
+
+        Args:
+            clear: Empty the buffer in the same call, so no merge made
+                between reading and clearing is lost (a short segment still
+                being held is kept)
+        """
+        segments = list(self.segments)
+        if clear:
+            self.segments.clear()
+            self.strings = {}
+            self.last_key = None
+            self.last_start = self.last_end = None
+        return segments
+
+    def restore(self, segments: List[dict]):
+        """Put segments taken with get(clear=True) back in front, e.g. after a failed send"""
+        # Segments recorded since stay last; beyond maxlen the oldest go
+        self.segments = deque(list(segments) + list(self.segments), maxlen=self.segments.maxlen)
+
+    def __len__(self):
+        return len(self.segments)
+
+
+if __name__ == "__main__":
+    from datetime import timedelta
+
+    normalizer = TitleNormalizer()
+    for title in ['(3) Inbox - Gmail - Google Chrome', '● main.py - agent - Visual Studio Code',
+                  'Inbox - 4 unread messages - Outlook', '*Untitled - Notepad', 'Report.docx - Word']:
+        print(f"{title:45} -> {normalizer.normalize(title)}")
+
+    log = SessionLog()
+    now = datetime.now()
+    timeline = [
+        ('chrome.exe', '(3) Inbox - Gmail - Google Chrome', 40),
+        ('chrome.exe', '(4) Inbox - Gmail - Google Chrome', 20),
+        ('Code.exe', '● main.py - agent - Visual Studio Code', 300),
+        ('explorer.exe', 'Downloads', 0.4),
+        ('Code.exe', 'main.py - agent - Visual Studio Code', 120),
+        ('WINWORD.EXE', 'Report.docx - Word', 600),
+    ]
+    for app, title, seconds in timeline:
+        ended = now + timedelta(seconds=seconds)
+        log.record(app, normalizer.normalize(title), None, now, ended)
+        now = ended
+    for segment in log.get():
+        print(f"  {segment['app_name']:12} {segment['duration_seconds']:7.1f}s  {segment['window_title']}")
+    print(log.stats)
@@ -0,0 +1,339 @@
+"""
+Aggregate Rules - Threshold alerts over sliding windows ("N events in T")
+Count, sum and distinct-count per group, backed by bucketed counters and HyperLogLog
+"""
+
+import hashlib
+import math
+from datetime import datetime
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Callable, Tuple
+
+try:
+    from .correlation_engine import get_event_field
+except ImportError:
+    from correlation_engine import get_event_field
+
+
+@dataclass
+class AggregateRule:
+    """Fires when an aggregate over a sliding window reaches a threshold"""
+    rule_id: str
+    name: str
+    description: str
+    category: str
+    severity: str
+    condition: Callable  # Which events feed the aggregate
+    function: str = 'count'  # count, sum, distinct
+    threshold: float = 10  # Fires when the aggregate is >= threshold
+    window_seconds: int = 300
+    group_by: Tuple[str, ...] = ()  # One aggregate per distinct group key
+    value_field: Optional[str] = None  # Summed (sum) or counted (distinct) field
+    cooldown_seconds: int = 600  # Coalescing window for the resulting alert
+    enabled: bool = True
+    buckets: int = 30  # Window resolution for count/sum
+    risk_key: Optional[str] = None  # RiskScorer weight prefix (defaults to category)
+
+
+class SlidingWindowCounter:
+    """Ring of time buckets; memory is fixed regardless of event rate"""
+
+    __slots__ = ('bucket_seconds', 'values', 'epochs')
+
+    def __init__(self, window_seconds: float, num_buckets: int = 30):
+        self.bucket_seconds = window_seconds / num_buckets
+        self.values = [0.0] * num_buckets
+        self.epochs = [-1] * num_buckets
+
+    def add(self, ts: float, value: float = 1.0):
+        """Add a value at a timestamp"""
+        epoch = int(ts // self.bucket_seconds)
+        i = epoch % len(self.values)
+        if self.epochs[i] != epoch:
+            self.epochs[i] = epoch
+            self.values[i] = 0.0
+        self.values[i] += value
+
+    def total(self, ts: float) -> float:
+        """Sum of the buckets still inside the window"""
+        epoch = int(ts // self.bucket_seconds)
+        oldest = epoch - len(self.values) + 1
+        return sum(v for v, e in zip(self.values, self.epochs) if oldest <= e <= epoch)
+
+
+class SlidingHyperLogLog:
+    """
+    HyperLogLog over a sliding window
+
+    Each register keeps a short list of (timestamp, rank) pairs that can still be
+    the register maximum for some future window, so expired items drop out
+    without storing them. Lists are bounded by the number of possible ranks.
+    """
+
+    __slots__ = ('precision', 'm', 'alpha', 'registers')
+
+    def __init__(self, precision: int = 8):
+        self.precision = precision
+        self.m = 1 << precision
+        self.alpha = 0.7213 / (1 + 1.079 / self.m)
+        self.registers = {}  # register index -> [(ts, rank), ...] with ranks decreasing
+
+    def add(self, value, ts: float):
+        """Record a value seen at a timestamp"""
+        h = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+
+        entries = self.registers.get(index)
+        if entries is None:
+            self.registers[index] = [(ts, rank)]
+            return
+        # Older entries with rank <= this one can never be the maximum again
+        while entries and entries[-1][1] <= rank:
+            entries.pop()
+        entries.append((ts, rank))
+
+    def estimate(self, ts: float, window_seconds: float) -> float:
+        """Estimate the number of distinct values seen inside the window"""
+        cutoff = ts - window_seconds
+        total = 0.0
+        zeros = self.m
+        for index in list(self.registers):
+            entries = self.registers[index]
+            # Entries are in time order; drop the expired head
+            drop = 0
+            while drop < len(entries) and entries[drop][0] <= cutoff:
+                drop += 1
+            if drop:
+                del entries[:drop]
+            if not entries:
+                del self.registers[index]
+                continue
+            zeros -= 1
+            total += 2.0 ** -entries[0][1]
+
+        total += zeros  # 2^-0 for empty registers
+        estimate = self.alpha * self.m * self.m / total
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return estimate
+
+
+class GroupState:
+    """Aggregate state for one rule and group key"""
+
+    __slots__ = ('counter', 'hll', 'armed')
+
+    def __init__(self, rule: AggregateRule):
+        # For distinct rules the counter tracks raw adds, an upper bound on the estimate
+        self.counter = SlidingWindowCounter(rule.window_seconds, rule.buckets)
+        self.hll = SlidingHyperLogLog() if rule.function == 'distinct' else None
+        self.armed = True
+
+
+class AggregateEvaluator:
+    """Maintains sliding-window aggregates per rule and group"""
+
+    FUNCTIONS = ('count', 'sum', 'distinct')
+
+    def __init__(self, max_groups_per_rule: int = 1000):
+        self.max_groups_per_rule = max_groups_per_rule
+        self.rules: Dict[str, AggregateRule] = {}
+        self.groups: Dict[str, OrderedDict] = {}  # rule_id -> group key -> GroupState
+
+        self.stats = {
+            'events_aggregated': 0,
+            'thresholds_crossed': 0,
+            'groups_evicted': 0,
+        }
+
+        self._init_default_rules()
+
+    def _init_default_rules(self):
+        """Initialize default aggregate rules"""
+        default_rules = [
+            AggregateRule(
+                rule_id='multiple_failed_logins',
+                name='Multiple Failed Login Attempts',
+                description='10 or more failed login attempts for a user within 5 minutes',
+                category='security',
+                severity='high',
+                risk_key='failed_login',
+                condition=lambda e: e.get('type') == 'login' and e.get('event_type') == 'login_failed',
+                function='count',
+                threshold=10,
+                window_seconds=300,
+                group_by=('user',),
+            ),
+            AggregateRule(
+                rule_id='excessive_printing',
+                name='Excessive Printing',
+                description='More than 200 pages printed by a user within an hour',
+                category='policy',
+                severity='medium',
+                risk_key='excessive_printing',
+                condition=lambda e: e.get('type') == 'print',
+                function='sum',
+                value_field='pages',
+                threshold=201,
+                window_seconds=3600,
+                group_by=('user',),
+            ),
+            AggregateRule(
+                rule_id='mass_file_access',
+                name='Mass File Access',
+                description='500 or more distinct files touched within 10 minutes',
+                category='behavior',
+                severity='medium',
+                risk_key='anomaly_detected',
+                condition=lambda e: e.get('type') == 'file',
+                function='distinct',
+                value_field='filepath',
+                threshold=500,
+                window_seconds=600,
+            ),
+        ]
+
+        for rule in default_rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule: AggregateRule):
+        """Add an aggregate rule"""
+        if rule.function not in self.FUNCTIONS:
+            raise ValueError(f"Unknown aggregate function: {rule.function}")
+        if rule.function in ('sum', 'distinct') and not rule.value_field:
+            raise ValueError(f"Aggregate '{rule.function}' needs a value_field")
+        self.rules[rule.rule_id] = rule
+        self.groups[rule.rule_id] = OrderedDict()
+
+    def remove_rule(self, rule_id: str):
+        """Remove an aggregate rule and its state"""
+        self.rules.pop(rule_id, None)
+        self.groups.pop(rule_id, None)
+
+    def process(self, event: dict, now: datetime = None) -> List[dict]:
+        """
+        Feed one event into every matching aggregate
+
+        Returns:
+            List of threshold crossings (rule, group key, aggregate value)
+        """
+        now_ts = (now or datetime.now()).timestamp()
+        crossings = []
+
+        for rule_id, rule in self.rules.items():
+            if not rule.enabled:
+                continue
+            try:
+                if not rule.condition(event):
+                    continue
+                crossing = self._update(rule, event, now_ts)
+                if crossing:
+                    crossings.append(crossing)
+            except Exception as e:
+                print(f"Error evaluating aggregate rule {rule_id}: {e}")
+
+        return crossings
+
+    def _update(self, rule: AggregateRule, event: dict, now_ts: float) -> Optional[dict]:
+        """Update one group's aggregate and report a threshold crossing"""
+        groups = self.groups[rule.rule_id]
+        key = tuple(str(get_event_field(event, f)) for f in rule.group_by)
+
+        state = groups.get(key)
+        if state is None:
+            state = GroupState(rule)
+            groups[key] = state
+            while len(groups) > self.max_groups_per_rule:
+                groups.popitem(last=False)
+                self.stats['groups_evicted'] += 1
+        else:
+            groups.move_to_end(key)
+
+        self.stats['events_aggregated'] += 1
+
+        if rule.function == 'distinct':
+            value = get_event_field(event, rule.value_field)
+            if value is None:
+                return None
+            state.hll.add(value, now_ts)
+            state.counter.add(now_ts)
+            # Distinct count can't exceed the raw count; skip the estimate when that's below threshold
+            current = state.counter.total(now_ts)
+            if current >= rule.threshold:
+                current = state.hll.estimate(now_ts, rule.window_seconds)
+        else:
+            if rule.function == 'sum':
+                try:
+                    amount = float(get_event_field(event, rule.value_field) or 0)
+                except (TypeError, ValueError):
+                    return None
+            else:
+                amount = 1.0
+            state.counter.add(now_ts, amount)
+            current = state.counter.total(now_ts)
+
+        # Fire once per crossing; re-arm after the aggregate falls back below
+        if current < rule.threshold:
+            state.armed = True
+            return None
+        if not state.armed:
+            return None
+
+        state.armed = False
+        self.stats['thresholds_crossed'] += 1
+        return {
+            'rule': rule,
+            'key': key,
+            'function': rule.function,
+            'value': round(current, 2),
+            'threshold': rule.threshold,
+            'window_seconds': rule.window_seconds,
+        }
+
+    def get_rules(self) -> List[dict]:
+        """Get all aggregate rules"""
+        return [
+            {
+                'rule_id': r.rule_id,
+                'name': r.name,
+                'description': r.description,
+                'category': r.category,
+                'severity': r.severity,
+                'enabled': r.enabled,
+                'cooldown_seconds': r.cooldown_seconds,
+                'function': r.function,
+                'threshold': r.threshold,
+                'window_seconds': r.window_seconds,
+                'group_by': list(r.group_by),
+            }
+            for r in self.rules.values()
+        ]
+
+    def get_stats(self) -> dict:
+        """Get aggregate statistics"""
+        return {
+            **self.stats,
+            'open_groups': sum(len(g) for g in self.groups.values()),
+        }
+
+
+if __name__ == "__main__":
+    evaluator = AggregateEvaluator()
+
+    print("Testing aggregate rules...\n")
+
+    base = datetime.now().timestamp()
+    for i in range(12):
+        event = {'type': 'login', 'event_type': 'login_failed', 'user': 'alice'}
+        for crossing in evaluator.process(event, datetime.fromtimestamp(base + i * 10)):
+            print(f"[CROSSED] {crossing['rule'].name}: {crossing['value']} >= {crossing['threshold']}")
+
+    for i in range(800):
+        event = {'type': 'file', 'filepath': f'C:\\Users\\alice\\Documents\\file{i}.docx'}
+        for crossing in evaluator.process(event, datetime.fromtimestamp(base + i * 0.1)):
+            print(f"[CROSSED] {crossing['rule'].name}: ~{crossing['value']} >= {crossing['threshold']}")
+
+    print(f"\nStats: {evaluator.get_stats()}")
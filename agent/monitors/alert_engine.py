@@ -6,11 +6,20 @@ Analyzes monitoring data and generates security/policy alerts
 import threading
 import time
 from datetime import datetime, timedelta
-from collections import deque, defaultdict
+from collections import deque, defaultdict, OrderedDict
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Tuple, Iterable
 import json
 
+try:
+    from .correlation_engine import CorrelationEngine, CorrelationRule, RemovableDrives, get_event_field
+    from .aggregate_rules import AggregateEvaluator, AggregateRule
+    from .alert_journal import AlertJournal
+except ImportError:
+    from correlation_engine import CorrelationEngine, CorrelationRule, RemovableDrives, get_event_field
+    from aggregate_rules import AggregateEvaluator, AggregateRule
+    from alert_journal import AlertJournal
+
 
 @dataclass
 class AlertRule:
@@ -21,8 +30,10 @@ class AlertRule:
     category: str  # security, policy, productivity, behavior
     severity: str  # critical, high, medium, low, info
     condition: Callable
-    cooldown_seconds: int = 300  # Minimum time between repeated alerts
+    cooldown_seconds: int = 300  # Window in which repeated alerts are coalesced
     enabled: bool = True
+    group_by: Tuple[str, ...] = ()  # Event fields that distinguish coalesced alerts
+    risk_key: Optional[str] = None  # RiskScorer weight prefix (defaults to category)
 
 
 class RiskScorer:
@@ -48,15 +59,22 @@ class RiskScorer:
         self.event_counts = defaultdict(int)
         self.score_history = deque(maxlen=1000)
 
+        # Optional AlertJournal so counts survive restarts
+        self.journal = None
+
     def add_event(self, event_type: str, severity: str = 'medium'):
         """Record an event for risk scoring"""
         weight_key = f"{event_type}_{severity}" if severity else event_type
-        if weight_key in self.weights:
-            self.event_counts[weight_key] += 1
-        elif event_type in self.weights:
-            self.event_counts[event_type] += 1
+        if weight_key not in self.weights:
+            if event_type not in self.weights:
+                return
+            weight_key = event_type
 
-    def calculate_score(self) -> dict:
+        self.event_counts[weight_key] += 1
+        if self.journal:
+            self.journal.append('risk', key=weight_key)
+
+    def calculate_score(self, now: datetime = None) -> dict:
         """Calculate current risk score"""
         total_score = 0
         breakdown = {}
@@ -90,7 +108,7 @@ class RiskScorer:
             'score': normalized_score,
             'risk_level': risk_level,
             'breakdown': breakdown,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': (now or datetime.now()).isoformat()
         }
 
         self.score_history.append(result)
@@ -117,6 +135,8 @@ class RiskScorer:
     def reset_daily(self):
         """Reset daily counters"""
         self.event_counts.clear()
+        if self.journal:
+            self.journal.append('risk_reset')
 
 
 class AnomalyDetector:
@@ -214,19 +234,107 @@ class AnomalyDetector:
         return result
 
 
+class AlertCoalescer:
+    """Merges repeated alerts for the same rule and key fields into one alert"""
+
+    def __init__(self, max_samples: int = 5, max_open_groups: int = 1000):
+        self.max_samples = max_samples
+        self.max_open_groups = max_open_groups
+
+        # (rule_id, key values...) -> [alert, window_start_ts, window_seconds]
+        self.open_groups = OrderedDict()
+        # alert_id -> pending delta, flushed by the engine
+        self.pending_updates = OrderedDict()
+
+    def make_key(self, rule, event: dict) -> tuple:
+        """Build the coalescing key for an event matched by a rule"""
+        return (rule.rule_id,) + tuple(str(get_event_field(event, f)) for f in rule.group_by)
+
+    def merge(self, key: tuple, event: dict, now: datetime) -> Optional[dict]:
+        """Merge an event into an open alert, returning the alert or None"""
+        entry = self.open_groups.get(key)
+        if entry is None:
+            return None
+
+        alert, window_start, window = entry
+        if now.timestamp() - window_start >= window:
+            del self.open_groups[key]
+            return None
+
+        alert['count'] += 1
+        alert['last_seen'] = now.isoformat()
+        new_sample = len(alert['samples']) < self.max_samples
+        if new_sample:
+            alert['samples'].append(event)
+
+        delta = self.pending_updates.get(alert['alert_id'])
+        if delta is None:
+            delta = {
+                'alert_id': alert['alert_id'],
+                'rule_id': alert['rule_id'],
+                'rule_name': alert['rule_name'],
+                'category': alert['category'],
+                'severity': alert['severity'],
+                'count_delta': 0,
+                'new_samples': [],
+            }
+            self.pending_updates[alert['alert_id']] = delta
+        delta['count'] = alert['count']
+        delta['count_delta'] += 1
+        delta['last_seen'] = alert['last_seen']
+        if new_sample:
+            delta['new_samples'].append(event)
+
+        self.open_groups.move_to_end(key)
+        return alert
+
+    def open(self, key: tuple, alert: dict, now: datetime, window: int):
+        """Start a coalescing window for a newly raised alert"""
+        if window <= 0:
+            return
+        self.open_groups[key] = [alert, now.timestamp(), window]
+        self.open_groups.move_to_end(key)
+        while len(self.open_groups) > self.max_open_groups:
+            self.open_groups.popitem(last=False)
+
+    def expire(self, now: datetime):
+        """Close windows that have run out"""
+        now_ts = now.timestamp()
+        expired = [k for k, (_, start, window) in self.open_groups.items()
+                   if now_ts - start >= window]
+        for key in expired:
+            del self.open_groups[key]
+
+    def flush_updates(self) -> List[dict]:
+        """Return and clear deltas accumulated since the last flush"""
+        updates = list(self.pending_updates.values())
+        self.pending_updates.clear()
+        return updates
+
+
 class AlertEngine:
     """Main alert engine that coordinates risk scoring and anomaly detection"""
 
-    def __init__(self, on_alert_callback=None):
+    def __init__(self, on_alert_callback=None, on_alert_update_callback=None,
+                 update_interval: int = 10, journal_dir: str = None,
+                 max_undelivered: int = 5000):
         self.on_alert = on_alert_callback
+        self.on_alert_update = on_alert_update_callback
+        self.update_interval = update_interval
         self.running = False
         self.thread = None
 
         self.risk_scorer = RiskScorer()
         self.anomaly_detector = AnomalyDetector()
+        self.coalescer = AlertCoalescer()
+        self.correlator = CorrelationEngine()
+        self.aggregator = AggregateEvaluator()
 
         self.alerts = deque(maxlen=2000)
-        self.alert_history = defaultdict(list)  # rule_id -> list of timestamps
+        self.replaying = False
+        self.undelivered = OrderedDict()  # alert_id -> alert not yet acknowledged by the server
+        self.max_undelivered = max_undelivered
+        self.alert_history = defaultdict(lambda: deque(maxlen=100))  # rule_id -> recent timestamps
         self.lock = threading.Lock()
 
         # Built-in alert rules
@@ -238,8 +346,16 @@ class AlertEngine:
             'total_alerts': 0,
             'alerts_by_severity': defaultdict(int),
             'alerts_by_category': defaultdict(int),
+            'events_coalesced': 0,
+            'undelivered_dropped': 0,
         }
 
+        # Crash-safe persistence of alerts and risk counts
+        self.journal = None
+        if journal_dir:
+            self.journal = AlertJournal(journal_dir)
+            self._restore_from_journal()
+
     def _init_default_rules(self):
         """Initialize default alert rules"""
         default_rules = [
@@ -249,8 +365,10 @@ class AlertEngine:
                 description='Critical sensitive data detected (SSN, credit card, private key)',
                 category='security',
                 severity='critical',
+                risk_key='dlp',
                 condition=lambda e: e.get('type') == 'dlp' and e.get('severity') == 'critical',
                 cooldown_seconds=60,
+                group_by=('source', 'description'),
             ),
             AlertRule(
                 rule_id='blocked_device',
@@ -258,17 +376,10 @@ class AlertEngine:
                 description='Unauthorized device connection attempt',
                 category='security',
                 severity='high',
+                risk_key='blocked_device',
                 condition=lambda e: e.get('type') == 'device' and e.get('blocked') == True,
                 cooldown_seconds=300,
-            ),
-            AlertRule(
-                rule_id='multiple_failed_logins',
-                name='Multiple Failed Login Attempts',
-                description='Multiple failed login attempts detected',
-                category='security',
-                severity='high',
-                condition=lambda e: e.get('type') == 'login' and e.get('event_type') == 'login_failed',
-                cooldown_seconds=600,
+                group_by=('device.serial_number', 'device.device_id'),
             ),
             AlertRule(
                 rule_id='blocked_app_launch',
@@ -276,8 +387,10 @@ class AlertEngine:
                 description='Attempt to launch blocked application',
                 category='policy',
                 severity='medium',
+                risk_key='blocked_app',
                 condition=lambda e: e.get('type') == 'app_blocked',
                 cooldown_seconds=300,
+                group_by=('name',),
             ),
             AlertRule(
                 rule_id='blocked_website',
@@ -285,8 +398,10 @@ class AlertEngine:
                 description='Attempt to access blocked website',
                 category='policy',
                 severity='medium',
+                risk_key='blocked_website',
                 condition=lambda e: e.get('type') == 'website_blocked',
                 cooldown_seconds=300,
+                group_by=('domain',),
             ),
             AlertRule(
                 rule_id='sensitive_file',
@@ -294,8 +409,10 @@ class AlertEngine:
                 description='Activity on potentially sensitive file',
                 category='security',
                 severity='medium',
+                risk_key='sensitive_file_access',
                 condition=lambda e: e.get('type') == 'file' and e.get('is_sensitive') == True,
                 cooldown_seconds=180,
+                group_by=('filepath',),
             ),
             AlertRule(
                 rule_id='excessive_idle',
@@ -312,6 +429,7 @@ class AlertEngine:
                 description='Significant activity outside normal work hours',
                 category='behavior',
                 severity='info',
+                risk_key='after_hours_activity',
                 condition=lambda e: e.get('type') == 'anomaly' and e.get('anomaly_type') == 'after_hours_activity',
                 cooldown_seconds=7200,
             ),
@@ -321,8 +439,10 @@ class AlertEngine:
                 description='Unusually large print job detected',
                 category='policy',
                 severity='medium',
+                risk_key='excessive_printing',
                 condition=lambda e: e.get('type') == 'print' and e.get('pages', 0) > 50,
                 cooldown_seconds=600,
+                group_by=('printer',),
             ),
             AlertRule(
                 rule_id='usb_storage',
@@ -330,8 +450,10 @@ class AlertEngine:
                 description='USB storage device connected',
                 category='security',
                 severity='info',
+                risk_key='usb_activity',
                 condition=lambda e: e.get('type') == 'device' and e.get('device_type') == 'usb_storage',
                 cooldown_seconds=300,
+                group_by=('device_id',),
             ),
         ]
 
@@ -347,64 +469,258 @@ class AlertEngine:
         if rule_id in self.rules:
             del self.rules[rule_id]
 
+    def add_correlation_rule(self, rule: CorrelationRule):
+        """Add a multi-event sequence rule"""
+        with self.lock:
+            self.correlator.add_rule(rule)
+
+    def add_aggregate_rule(self, rule: AggregateRule):
+        """Add a threshold rule over a sliding-window aggregate"""
+        with self.lock:
+            self.aggregator.add_rule(rule)
+
     def enable_rule(self, rule_id: str, enabled: bool = True):
         """Enable or disable a rule"""
         if rule_id in self.rules:
             self.rules[rule_id].enabled = enabled
 
-    def process_event(self, event: dict):
-        """Process an event through alert rules"""
-        now = datetime.now()
+    def process_event(self, event: dict, now: datetime = None):
+        """Process an event through alert rules and correlation rules"""
+        now = now or datetime.now()
         triggered_alerts = []
 
         for rule_id, rule in self.rules.items():
             if not rule.enabled:
                 continue
 
-            # Check cooldown
-            if rule_id in self.alert_history:
-                last_alert = self.alert_history[rule_id]
-                if last_alert:
-                    last_time = datetime.fromisoformat(last_alert[-1])
-                    if (now - last_time).total_seconds() < rule.cooldown_seconds:
-                        continue
-
             # Check condition
             try:
                 if rule.condition(event):
-                    alert = {
-                        'alert_id': f"{rule_id}_{now.timestamp()}",
-                        'rule_id': rule_id,
-                        'rule_name': rule.name,
-                        'description': rule.description,
-                        'category': rule.category,
-                        'severity': rule.severity,
-                        'timestamp': now.isoformat(),
-                        'event': event,
-                    }
-
-                    triggered_alerts.append(alert)
-
-                    with self.lock:
-                        self.alerts.append(alert)
-                        self.alert_history[rule_id].append(now.isoformat())
-                        self.stats['total_alerts'] += 1
-                        self.stats['alerts_by_severity'][rule.severity] += 1
-                        self.stats['alerts_by_category'][rule.category] += 1
+                    key = self.coalescer.make_key(rule, event)
+                    alert = self._raise_alert(rule, key, event, now)
+                    if alert:
+                        triggered_alerts.append(alert)
 
-                    # Update risk score
-                    self.risk_scorer.add_event(rule.category, rule.severity)
-
-                    if self.on_alert:
-                        self.on_alert(alert)
+            except Exception as e:
+                print(f"Error evaluating rule {rule_id}: {e}")
 
-                    print(f"[ALERT-{rule.severity.upper()}] {rule.name}")
+        # Sliding-window thresholds; the windows are shared by every event source thread
+        with self.lock:
+            crossings = self.aggregator.process(event, now)
+        for crossing in crossings:
+            rule = crossing['rule']
+            try:
+                key = (rule.rule_id,) + crossing['key']
+                aggregate = {k: v for k, v in crossing.items() if k not in ('rule', 'key')}
+                aggregate['group'] = dict(zip(rule.group_by, crossing['key']))
+                alert = self._raise_alert(rule, key, event, now, aggregate=aggregate)
+                if alert:
+                    triggered_alerts.append(alert)
+            except Exception as e:
+                print(f"Error raising aggregate alert {rule.rule_id}: {e}")
 
+        # Multi-event sequences; partial matches are shared with flush_alert_updates
+        with self.lock:
+            matches = self.correlator.process(event, now)
+        for match in matches:
+            rule = match['rule']
+            try:
+                key = (rule.rule_id,) + match['key']
+                correlation = {k: v for k, v in match.items() if k != 'rule'}
+                alert = self._raise_alert(rule, key, event, now, correlation=correlation)
+                if alert:
+                    triggered_alerts.append(alert)
             except Exception as e:
-                print(f"Error evaluating rule {rule_id}: {e}")
+                print(f"Error raising correlation alert {rule.rule_id}: {e}")
 
         return triggered_alerts
 
+    def _raise_alert(self, rule, key: tuple, event: dict, now: datetime,
+                     correlation: dict = None, aggregate: dict = None) -> Optional[dict]:
+        """Create an alert, or merge it into the open alert for the same key"""
+        # Repeats inside the rule's window merge into the open alert
+        with self.lock:
+            merged = self.coalescer.merge(key, event, now)
+            if merged:
+                self.stats['events_coalesced'] += 1
+                return None
+
+        alert = {
+            'alert_id': f"{rule.rule_id}_{now.timestamp()}",
+            'rule_id': rule.rule_id,
+            'rule_name': rule.name,
+            'description': rule.description,
+            'category': rule.category,
+            'severity': rule.severity,
+            'timestamp': now.isoformat(),
+            'event': event,
+            'count': 1,
+            'first_seen': now.isoformat(),
+            'last_seen': now.isoformat(),
+            'samples': [event],
+        }
+        if correlation:
+            alert['correlation'] = correlation
+            alert['samples'] = list(correlation['events'])
+        if aggregate:
+            alert['aggregate'] = aggregate
+
+        with self.lock:
+            self._store_alert(alert)
+            self.alert_history[rule.rule_id].append(now.isoformat())
+            self.coalescer.open(key, alert, now, rule.cooldown_seconds)
+            if self.journal:
+                self.journal.append('alert', alert=alert)
+
+            # Update risk score
+            self.risk_scorer.add_event(rule.risk_key or rule.category, rule.severity)
+
+        if self.on_alert:
+            self.on_alert(alert)
+
+        if not self.replaying:
+            print(f"[ALERT-{rule.severity.upper()}] {rule.name}")
+        return alert
+
+    def _store_alert(self, alert: dict):
+        """Add an alert to the buffers and statistics (caller holds the lock)"""
+        self.alerts.append(alert)
+        if not self.replaying:
+            self.undelivered[alert['alert_id']] = alert
+        while len(self.undelivered) > self.max_undelivered:
+            self.undelivered.popitem(last=False)
+            self.stats['undelivered_dropped'] += 1
+
+        self.stats['total_alerts'] += 1
+        self.stats['alerts_by_severity'][alert['severity']] += 1
+        self.stats['alerts_by_category'][alert['category']] += 1
+
+    def flush_alert_updates(self) -> List[dict]:
+        """Send count/sample deltas for coalesced alerts"""
+        now = datetime.now()
+        with self.lock:
+            self.coalescer.expire(now)
+            updates = self.coalescer.flush_updates()
+            if self.journal:
+                for update in updates:
+                    self.journal.append('update', alert_id=update['alert_id'],
+                                        count=update['count'], last_seen=update['last_seen'],
+                                        new_samples=update['new_samples'])
+            self.correlator.expire(now)
+
+        if self.on_alert_update:
+            for update in updates:
+                try:
+                    self.on_alert_update(update)
+                except Exception as e:
+                    print(f"Error sending alert update: {e}")
+
+        return updates
+
+    @staticmethod
+    def _event_time(event: dict, timestamp_field: str) -> Optional[datetime]:
+        """Parse an event timestamp (ISO string, datetime or epoch seconds)"""
+        value = event.get(timestamp_field)
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                return None
+        return None
+
+    def replay(self, events: Iterable[dict], timestamp_field: str = 'timestamp',
+               period_seconds: int = 86400, removable_mountpoints: Iterable[str] = ()) -> dict:
+        """
+        Run a time-ordered event history through the rules, for backtesting
+
+        Event timestamps drive cooldowns, correlation and aggregate windows.
+        Callbacks, the journal and the delivery queue are bypassed. Risk is
+        scored and reset once per period (daily by default), like reset_daily.
+        Nothing is read from the live system, so a replay is repeatable; the
+        removable drives rules check against are given instead.
+        Use a fresh engine configured with the rules and weights under test.
+
+        Args:
+            events: Events in time order
+            timestamp_field: Event field holding the event time
+            period_seconds: Length of each risk scoring period
+            removable_mountpoints: Mount points treated as removable drives
+
+        Returns:
+            Alerts raised, per-period risk scores and replay statistics
+        """
+        if self.running:
+            raise RuntimeError("Cannot replay while the alert engine is running")
+
+        saved = (self.on_alert, self.on_alert_update, self.journal, self.risk_scorer.journal,
+                 self.correlator.removable_drives)
+        self.on_alert = self.on_alert_update = self.journal = self.risk_scorer.journal = None
+        self.correlator.removable_drives = RemovableDrives(mountpoints=removable_mountpoints)
+        self.replaying = True
+
+        alerts = []
+        periods = []
+        processed = skipped = 0
+        period_start = None
+        last_time = None
+        started = time.time()
+
+        def close_period(end: datetime):
+            score = self.risk_scorer.calculate_score(now=end)
+            periods.append({
+                'start': period_start.isoformat(),
+                'end': end.isoformat(),
+                'score': score['score'],
+                'risk_level': score['risk_level'],
+                'breakdown': score['breakdown'],
+            })
+            self.risk_scorer.reset_daily()
+            # Drop windows that closed so memory stays flat over long replays
+            self.coalescer.expire(end)
+            self.coalescer.flush_updates()
+            self.correlator.expire(end)
+
+        try:
+            for event in events:
+                event_time = self._event_time(event, timestamp_field)
+                if event_time is None:
+                    skipped += 1
+                    continue
+
+                if period_start is None:
+                    period_start = datetime.fromtimestamp(
+                        event_time.timestamp() // period_seconds * period_seconds)
+                while event_time.timestamp() >= period_start.timestamp() + period_seconds:
+                    period_end = datetime.fromtimestamp(period_start.timestamp() + period_seconds)
+                    close_period(period_end)
+                    period_start = period_end
+
+                alerts.extend(self.process_event(event, now=event_time))
+                last_time = event_time
+                processed += 1
+
+            if period_start is not None:
+                close_period(last_time)
+        finally:
+            (self.on_alert, self.on_alert_update, self.journal, self.risk_scorer.journal,
+             self.correlator.removable_drives) = saved
+            self.replaying = False
+
+        elapsed = time.time() - started
+        return {
+            'events_processed': processed,
+            'events_skipped': skipped,
+            'alerts': alerts,
+            'periods': periods,
+            'peak_score': max((p['score'] for p in periods), default=0),
+            'elapsed_seconds': round(elapsed, 3),
+            'events_per_second': round(processed / elapsed) if elapsed else processed,
+        }
+
     def record_activity(self, activity_type: str, value: float = 1.0):
         """Record activity for anomaly detection"""
         self.anomaly_detector.record_metric(activity_type, value)
@@ -440,6 +756,121 @@ class AlertEngine:
 
             return alerts[-limit:]
 
+    def get_undelivered_alerts(self, limit: int = 100) -> List[dict]:
+        """Get the oldest alerts not yet acknowledged by the server"""
+        with self.lock:
+            return list(self.undelivered.values())[:limit]
+
+    def mark_delivered(self, alert_ids: List[str]):
+        """Record that the server has stored these alerts"""
+        with self.lock:
+            delivered = [a for a in alert_ids if self.undelivered.pop(a, None) is not None]
+            if self.journal and delivered:
+                self.journal.append('delivered', alert_ids=delivered)
+
+    def _apply_journal_record(self, record: dict):
+        """Replay one journal record into in-memory state"""
+        op = record['op']
+        if op == 'alert':
+            self._store_alert(record['alert'])
+        elif op == 'update':
+            alert = self.undelivered.get(record['alert_id'])
+            if alert is None:
+                alert = next((a for a in reversed(self.alerts)
+                              if a['alert_id'] == record['alert_id']), None)
+            if alert:
+                alert['count'] = record['count']
+                alert['last_seen'] = record['last_seen']
+                room = max(self.coalescer.max_samples - len(alert.get('samples', [])), 0)
+                alert.setdefault('samples', []).extend(record.get('new_samples', [])[:room])
+        elif op == 'delivered':
+            for alert_id in record['alert_ids']:
+                self.undelivered.pop(alert_id, None)
+        elif op == 'risk':
+            self.risk_scorer.event_counts[record['key']] += 1
+        elif op == 'risk_reset':
+            self.risk_scorer.event_counts.clear()
+
+    def _snapshot_state(self) -> dict:
+        """Compact state for a journal snapshot (caller holds the lock)"""
+        return {
+            'stats': {
+                'total_alerts': self.stats['total_alerts'],
+                'alerts_by_severity': dict(self.stats['alerts_by_severity']),
+                'alerts_by_category': dict(self.stats['alerts_by_category']),
+                'events_coalesced': self.stats['events_coalesced'],
+                'undelivered_dropped': self.stats['undelivered_dropped'],
+            },
+            'risk_counts': dict(self.risk_scorer.event_counts),
+            'undelivered': list(self.undelivered.values()),
+        }
+
+    def _apply_snapshot(self, state: dict):
+        """Restore in-memory state from a journal snapshot"""
+        stats = state.get('stats', {})
+        self.stats['total_alerts'] = stats.get('total_alerts', 0)
+        self.stats['alerts_by_severity'].update(stats.get('alerts_by_severity', {}))
+        self.stats['alerts_by_category'].update(stats.get('alerts_by_category', {}))
+        self.stats['events_coalesced'] = stats.get('events_coalesced', 0)
+        self.stats['undelivered_dropped'] = stats.get('undelivered_dropped', 0)
+
+        self.risk_scorer.event_counts.update(state.get('risk_counts', {}))
+
+        for alert in state.get('undelivered', []):
+            self.alerts.append(alert)
+            self.undelivered[alert['alert_id']] = alert
+
+    def _restore_from_journal(self):
+        """Load the last snapshot and replay the journal written since"""
+        with self.lock:
+            self.journal.load(self._apply_snapshot, self._apply_journal_record)
+            self.risk_scorer.journal = self.journal
+            # Rewrite a clean snapshot so a torn tail is never appended to
+            # (unless records were deferred: the journal is their only copy)
+            self.journal.compact(self._snapshot_state())
+            restored_risk = dict(self.risk_scorer.event_counts)
+
+        if self.journal.pending is not None:
+            threading.Thread(target=self._replay_deferred, args=(restored_risk,),
+                             daemon=True).start()
+
+        journal_stats = self.journal.get_stats()
+        print(f"Alert journal restored: {len(self.undelivered)} undelivered alerts, "
+              f"{journal_stats['records_replayed']} records in {journal_stats['load_seconds']}s")
+
+    def _replay_deferred(self, restored_risk: dict):
+        """Finish a journal replay that ran past its startup time budget"""
+        restored_risk = defaultdict(int, restored_risk)
+
+        def apply(record):
+            if record['op'] == 'risk':
+                restored_risk[record['key']] += 1
+            elif record['op'] == 'risk_reset':
+                # Clear only what was counted before the reset, not events since the restart
+                counts = self.risk_scorer.event_counts
+                for key, count in restored_risk.items():
+                    counts[key] -= count
+                    if counts[key] <= 0:
+                        del counts[key]
+                restored_risk.clear()
+                return
+            self._apply_journal_record(record)
+
+        try:
+            replayed = self.journal.replay_pending(apply, lock=self.lock)
+            with self.lock:
+                self.journal.compact(self._snapshot_state())
+            print(f"Alert journal deferred replay done: {replayed} records")
+        except Exception as e:
+            print(f"Error replaying deferred alert records: {e}")
+
+    def checkpoint(self):
+        """Write a snapshot and truncate the journal"""
+        if not self.journal:
+            return
+        with self.lock:
+            self.journal.compact(self._snapshot_state())
+
     def get_critical_alerts(self, clear: bool = False) -> List[dict]:
         """Get critical severity alerts"""
         return self.get_alerts(clear=clear, severity_filter='critical')
@@ -456,6 +887,10 @@ class AlertEngine:
                 'risk_score': self.risk_scorer.calculate_score(),
                 'risk_trend': self.risk_scorer.get_trend(),
                 'anomalies_detected': len(self.anomaly_detector.anomalies),
+                'correlation': self.correlator.get_stats(),
+                'aggregates': self.aggregator.get_stats(),
+                'undelivered_alerts': len(self.undelivered),
+                'journal': self.journal.get_stats() if self.journal else None,
             }
 
     def get_rules(self) -> List[dict]:
@@ -469,19 +904,29 @@ class AlertEngine:
                 'severity': r.severity,
                 'enabled': r.enabled,
                 'cooldown_seconds': r.cooldown_seconds,
+                'group_by': list(r.group_by),
             }
             for r in self.rules.values()
-        ]
+        ] + self.correlator.get_rules() + self.aggregator.get_rules()
 
     def monitor_loop(self):
-        """Background monitoring loop for anomaly detection"""
+        """Background loop for alert update deltas and anomaly detection"""
+        last_anomaly_check = 0
         while self.running:
             try:
-                self.check_for_anomalies()
-                time.sleep(60)  # Check every minute
+                self.flush_alert_updates()
+
+                if time.time() - last_anomaly_check >= 60:  # Check every minute
+                    last_anomaly_check = time.time()
+                    self.check_for_anomalies()
+
+                if self.journal and self.journal.needs_compaction():
+                    self.checkpoint()
+
+                time.sleep(self.update_interval)
             except Exception as e:
                 print(f"Alert engine error: {e}")
-                time.sleep(60)
+                time.sleep(self.update_interval)
 
     def start(self):
         """Start alert engine background processing"""
@@ -498,6 +943,9 @@ class AlertEngine:
         self.running = False
         if self.thread:
             self.thread.join(timeout=5)
+        if self.journal:
+            self.checkpoint()
+            self.journal.close()
         print("Alert engine stopped")
 
 
@@ -523,9 +971,28 @@ if __name__ == "__main__":
         print(f"\nProcessing event: {event['type']}")
         engine.process_event(event)
 
+    # Repeated device re-enumeration coalesces into the open alert
+    for _ in range(5):
+        engine.process_event({'type': 'device', 'device_type': 'usb_storage', 'device_id': 'USB1'})
+    for update in engine.flush_alert_updates():
+        print(f"Update: {update['rule_name']} count={update['count']} (+{update['count_delta']})")
+
     print(f"\n\nRisk Score: {engine.get_risk_score()}")
     print(f"\nStats: {engine.get_stats()}")
 
+    # Backtest a weight change against a short history
+    backtest = AlertEngine()
+    backtest.risk_scorer.weights['blocked_app'] = 40
+    start = datetime.now() - timedelta(days=2)
+    history = [
+        {'type': 'app_blocked', 'name': 'steam.exe',
+         'timestamp': (start + timedelta(minutes=10 * i)).isoformat()}
+        for i in range(300)
+    ]
+    result = backtest.replay(history)
+    print(f"\nReplay: {result['events_processed']} events, {len(result['alerts'])} alerts, "
+          f"peak score {result['peak_score']}, {result['events_per_second']} events/s")
+
     print("\n\nAlert Rules:")
     for rule in engine.get_rules():
         status = "ON" if rule['enabled'] else "OFF"
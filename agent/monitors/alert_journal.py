@@ -0,0 +1,270 @@
+"""
+Alert Journal - Append-only, checksummed log of alert and risk state
+Periodic compact snapshots let AlertEngine survive restarts without losing risk or unsent alerts
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Callable, Optional
+
+
+class AlertJournal:
+    """
+    Write-ahead journal plus snapshot for AlertEngine state
+
+    Each journal line is "<crc32 hex> <json record>". Records carry a sequence
+    number; a snapshot stores the last sequence it covers, so records written
+    before a crash between snapshot and truncation are skipped on replay.
+    Records that do not fit in load()'s time budget are deferred, and the
+    journal is not truncated until replay_pending() has applied them.
+    """
+
+    JOURNAL_FILE = 'alerts.journal'
+    SNAPSHOT_FILE = 'alerts.snapshot'
+
+    def __init__(self, directory: str, compact_every: int = 1000):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.journal_path = os.path.join(directory, self.JOURNAL_FILE)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.pending = None  # (offset, end) of records deferred by load()
+        self.records_since_snapshot = 0
+        self.file = None
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'records_written': 0,
+            'records_replayed': 0,
+            'records_corrupt': 0,
+            'records_deferred': 0,
+            'snapshots_written': 0,
+            'load_seconds': 0.0,
+        }
+
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _encode(record: dict) -> str:
+        payload = json.dumps(record, separators=(',', ':'), default=str)
+        return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n"
+
+    @staticmethod
+    def _decode(line: str) -> Optional[dict]:
+        """Decode a journal line, returning None if it is torn or corrupt"""
+        if len(line) < 10 or line[8] != ' ' or not line.endswith('\n'):
+            return None
+        payload = line[9:-1]
+        try:
+            if int(line[:8], 16) != zlib.crc32(payload.encode('utf-8')):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def _replay_line(self, line: bytes, apply_record: Callable):
+        """Decode and apply one journal line written after the snapshot"""
+        record = self._decode(line.decode('utf-8', errors='replace'))
+        if record is None:
+            self.stats['records_corrupt'] += 1
+            return
+
+        seq = record.get('seq', 0)
+        if seq <= self.snapshot_seq:
+            return
+        self.seq = max(self.seq, seq)
+
+        try:
+            apply_record(record)
+            self.stats['records_replayed'] += 1
+        except Exception as e:
+            print(f"Error replaying alert record {seq}: {e}")
+
+    def _last_seq(self, end: int) -> int:
+        """Sequence number of the last intact record before offset end"""
+        window = 65536
+        with open(self.journal_path, 'rb') as f:
+            while True:
+                start = max(0, end - window)
+                f.seek(start)
+                lines = f.read(end - start).split(b'\n')
+                # The last piece is empty or torn; the first may be cut by the seek
+                for line in reversed(lines[:-1]):
+                    record = self._decode(line.decode('utf-8', errors='replace') + '\n')
+                    if record is not None:
+                        return record.get('seq', 0)
+                if start == 0:
+                    return 0
+                window *= 4
+
+    def load(self, apply_snapshot: Callable, apply_record: Callable,
+             time_budget: float = 2.0) -> bool:
+        """
+        Load the snapshot and replay journal records written after it
+
+        Args:
+            apply_snapshot: Called with the snapshot state, if there is one
+            apply_record: Called with each later journal record, in order
+            time_budget: Seconds allowed for replay; remaining records are
+                deferred to replay_pending()
+
+        Returns:
+            True if a valid snapshot was loaded
+        """
+        started = time.time()
+        snapshot = None
+        snapshot_seq = 0
+
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = self._decode(f.read())
+                if snapshot is None:
+                    print("Alert snapshot failed checksum, ignoring it")
+                    self.stats['records_corrupt'] += 1
+                else:
+                    snapshot_seq = snapshot.get('seq', 0)
+                    apply_snapshot(snapshot.get('state') or {})
+            except Exception as e:
+                print(f"Error reading alert snapshot: {e}")
+                snapshot = None
+
+        self.seq = self.snapshot_seq = snapshot_seq
+        self.pending = None
+        if os.path.exists(self.journal_path):
+            try:
+                with open(self.journal_path, 'rb') as f:
+                    end = os.fstat(f.fileno()).st_size
+                    while f.tell() < end:
+                        if time.time() - started > time_budget:
+                            self.pending = (f.tell(), end)
+                            break
+                        self._replay_line(f.readline(), apply_record)
+                if self.pending:
+                    self._defer(end)
+            except Exception as e:
+                print(f"Error reading alert journal: {e}")
+
+        self.records_since_snapshot = self.stats['records_replayed']
+        self.stats['load_seconds'] = round(time.time() - started, 3)
+        return snapshot is not None
+
+    def _defer(self, end: int):
+        """Continue numbering after the deferred records and keep appends off a torn tail"""
+        self.seq = max(self.seq, self._last_seq(end))
+        with open(self.journal_path, 'rb') as f:
+            f.seek(end - 1)
+            torn = f.read(1) != b'\n'
+        self.file = open(self.journal_path, 'a', encoding='utf-8', newline='\n')
+        if torn:
+            self.file.write('\n')
+            self.file.flush()
+        print(f"Alert journal replay hit its time budget, deferring "
+              f"{(end - self.pending[0]) // 1024} KB of records")
+
+    def replay_pending(self, apply_record: Callable, lock=None, batch: int = 500) -> int:
+        """
+        Replay the records load() deferred, then allow compaction again
+
+        Args:
+            apply_record: Called with each deferred record, in order
+            lock: Held while each batch is applied (the owner's state lock)
+            batch: Records applied per lock acquisition
+
+        Returns:
+            Number of records replayed
+        """
+        if self.pending is None:
+            return 0
+        offset, end = self.pending
+        replayed = self.stats['records_replayed']
+        with open(self.journal_path, 'rb') as f:
+            f.seek(offset)
+            while f.tell() < end:
+                lines = []
+                while f.tell() < end and len(lines) < batch:
+                    lines.append(f.readline())
+                if lock is not None:
+                    with lock:
+                        for line in lines:
+                            self._replay_line(line, apply_record)
+                else:
+                    for line in lines:
+                        self._replay_line(line, apply_record)
+        replayed = self.stats['records_replayed'] - replayed
+        self.stats['records_deferred'] += replayed
+        self.records_since_snapshot += replayed
+        self.pending = None
+        return replayed
+
+    def append(self, op: str, **fields):
+        """Append one record to the journal"""
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.journal_path, 'a', encoding='utf-8', newline='\n')
+
+            self.seq += 1
+            record = {'seq': self.seq, 'op': op, 'ts': time.time(), **fields}
+            self.file.write(self._encode(record))
+            self.file.flush()
+
+            self.stats['records_written'] += 1
+            self.records_since_snapshot += 1
+
+    def needs_compaction(self) -> bool:
+        """Whether enough records have accumulated to warrant a snapshot"""
+        return self.pending is None and self.records_since_snapshot >= self.compact_every
+
+    def compact(self, state: dict):
+        """
+        Write a snapshot of the full state, then truncate the journal
+
+        Returns:
+            False if deferred records are still waiting to be replayed (the
+            journal is their only copy, so nothing is written)
+        """
+        with self.lock:
+            if self.pending is not None:
+                return False
+
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(self._encode({'seq': self.seq, 'state': state}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            # Records up to self.seq are now covered by the snapshot
+            if self.file:
+                self.file.close()
+            self.file = open(self.journal_path, 'w', encoding='utf-8', newline='\n')
+
+            self.records_since_snapshot = 0
+            self.stats['snapshots_written'] += 1
+            return True
+
+    def close(self):
+        """Flush and close the journal"""
+        with self.lock:
+            if self.file:
+                try:
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                except OSError:
+                    pass
+                self.file.close()
+                self.file = None
+
+    def get_stats(self) -> dict:
+        """Get journal statistics"""
+        return {
+            **self.stats,
+            'seq': self.seq,
+            'replay_pending': self.pending is not None,
+            'records_since_snapshot': self.records_since_snapshot,
+        }
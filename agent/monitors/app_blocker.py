@@ -5,6 +5,7 @@ Application Blocker - Monitors and blocks specified applications
 import threading
 import time
 import os
+import queue
 from datetime import datetime
 from collections import deque, defaultdict
 
@@ -14,6 +15,11 @@ import win32process
 import win32con
 import win32api
 
+try:
+    from .process_table import get_process_table
+except ImportError:
+    from process_table import get_process_table
+
 
 # Default app categories
 APP_CATEGORIES = {
@@ -43,17 +49,147 @@ APP_CATEGORIES = {
 }
 
 
+
+
+def _build_category_index():
+    """Lowercase app name -> category; an app listed twice keeps its first category"""
+    index = {}
+    for category, apps in APP_CATEGORIES.items():
+        for app in apps:
+            index.setdefault(app.lower(), category)
+    return index
+
+
+CATEGORY_INDEX = _build_category_index()
+
+SCAN_INTERVAL = 0.5  # seconds between process table refreshes while blocking
+KILL_GRACE_SECONDS = 0.5  # between terminate() and kill()
+
+
+class ProcessKiller:
+    """
+    Terminates processes on its own thread, escalating to kill
+
+    terminate() is sent as soon as a process is submitted; one still running
+    after the grace period is killed. Grace periods run concurrently, so
+    neither the caller nor other kills wait on them.
+
+    Args:
+        grace: Seconds between terminate and kill
+    """
+
+    def __init__(self, grace=KILL_GRACE_SECONDS):
+        self.grace = grace
+        self.queue = queue.Queue()
+        self.pending = {}  # (pid, create_time) -> (proc, deadline, app_name, on_done)
+        self.thread = None
+        self.stats = {'terminated': 0, 'killed': 0, 'failed': 0}
+
+    def submit(self, pid, app_name, create_time=None, on_done=None):
+        """
+        Queue a process for termination
+
+        Args:
+            create_time: If given, a different process reusing the pid is left alone
+            on_done: Optional callable(success), called on the killer thread
+        """
+        self.queue.put((pid, create_time, app_name, on_done))
+
+    @staticmethod
+    def _done(on_done, success):
+        if on_done:
+            try:
+                on_done(success)
+            except Exception as e:
+                print(f"Kill callback error: {e}")
+
+    def _terminate(self, pid, create_time, app_name, on_done):
+        key = (pid, create_time)
+        if key in self.pending:
+            return
+        try:
+            proc = psutil.Process(pid)
+            if create_time is not None and proc.create_time() != create_time:
+                self._done(on_done, True)  # That process is gone; the pid was reused
+                return
+            proc.terminate()
+        except psutil.NoSuchProcess:
+            self._done(on_done, True)  # Already gone
+            return
+        except psutil.AccessDenied:
+            print(f"Cannot kill {app_name}: Access denied (may need admin)")
+            self.stats['failed'] += 1
+            self._done(on_done, False)
+            return
+        except Exception as e:
+            print(f"Error killing {app_name}: {e}")
+            self.stats['failed'] += 1
+            self._done(on_done, False)
+            return
+        self.stats['terminated'] += 1
+        self.pending[key] = (proc, time.monotonic() + self.grace, app_name, on_done)
+
+    def _escalate(self):
+        """Kill processes whose grace period is over and are still running"""
+        now = time.monotonic()
+        for key, (proc, deadline, app_name, on_done) in list(self.pending.items()):
+            if deadline > now:
+                continue
+            del self.pending[key]
+            try:
+                if proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE:
+                    proc.kill()
+                    self.stats['killed'] += 1
+            except psutil.NoSuchProcess:
+                pass
+            except Exception as e:
+                print(f"Error killing {app_name}: {e}")
+                self.stats['failed'] += 1
+                self._done(on_done, False)
+                continue
+            print(f"Blocked app terminated: {app_name} (PID: {proc.pid})")
+            self._done(on_done, True)
+
+    def _loop(self):
+        while True:
+            timeout = None
+            if self.pending:
+                deadline = min(entry[1] for entry in self.pending.values())
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self._terminate(*item)
+            self._escalate()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=2)
+            self.thread = None
+
+
 class AppBlocker:
-    def __init__(self, on_block_callback=None, on_app_launch_callback=None):
+    def __init__(self, on_block_callback=None, on_app_launch_callback=None, process_table=None):
         self.running = False
-        self.thread = None
         self.on_block = on_block_callback
         self.on_app_launch = on_app_launch_callback
+        self.process_table = process_table or get_process_table()
 
         # Blocking rules
         self.blocked_apps = set()  # App names to block
         self.blocked_categories = set()  # Categories to block
         self.whitelist = set()  # Never block these
+        self._rules_changed()
 
         # Tracking
         self.running_apps = {}  # pid -> app_info
@@ -62,139 +198,122 @@ class AppBlocker:
         self.app_time = defaultdict(int)  # app_name -> seconds
 
         self.lock = threading.Lock()
+        self.killer = ProcessKiller()
+
+    def _rules_changed(self):
+        """Rebuild the normalized rule indexes and forget memoized verdicts"""
+        # One tuple, swapped whole, so a check never mixes old and new rules
+        self.rules = (
+            frozenset(w.lower() for w in self.whitelist),
+            frozenset(b.lower() for b in self.blocked_apps),
+            frozenset(self.blocked_categories),
+            {},  # app name -> verdict
+        )
+
+    @staticmethod
+    def _app_info(record):
+        """App info dict for a process table record"""
+        return {
+            'pid': record.pid,
+            'name': record.name,
+            'exe': record.exe,
+            'create_time': datetime.fromtimestamp(record.create_time).isoformat()
+        }
 
     def get_running_apps(self):
         """Get list of currently running applications"""
-        apps = {}
-
-        for proc in psutil.process_iter(['pid', 'name', 'exe', 'create_time']):
-            try:
-                info = proc.info
-                if info['exe']:  # Only apps with executables
-                    apps[info['pid']] = {
-                        'pid': info['pid'],
-                        'name': info['name'],
-                        'exe': info['exe'],
-                        'create_time': datetime.fromtimestamp(info['create_time']).isoformat()
-                    }
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-
-        return apps
+        return {
+            record.pid: self._app_info(record)
+            for record in self.process_table.snapshot(max_age=2)
+            if record.exe  # Only apps with executables
+        }
 
     def categorize_app(self, app_name):
         """Get category for an application"""
-        app_lower = app_name.lower()
-
-        for category, apps in APP_CATEGORIES.items():
-            if app_lower in [a.lower() for a in apps]:
-                return category
-
-        return 'other'
+        return CATEGORY_INDEX.get(app_name.lower(), 'other')
 
     def is_app_blocked(self, app_name):
-        """Check if an app should be blocked"""
-        app_lower = app_name.lower()
-
-        # Check whitelist first
-        if app_lower in [w.lower() for w in self.whitelist]:
-            return False
-
-        # Check direct block list
-        if app_lower in [b.lower() for b in self.blocked_apps]:
-            return True
-
-        # Check category blocks
-        category = self.categorize_app(app_name)
-        if category in self.blocked_categories:
-            return True
+        """Check if an app should be blocked (memoized until the rules change)"""
+        whitelist, blocked_apps, blocked_categories, verdicts = self.rules
+        verdict = verdicts.get(app_name)
+        if verdict is None:
+            app_lower = app_name.lower()
+            verdict = app_lower not in whitelist and (
+                app_lower in blocked_apps
+                or CATEGORY_INDEX.get(app_lower, 'other') in blocked_categories)
+            verdicts[app_name] = verdict
+        return verdict
+
+    def kill_process(self, pid, app_name, create_time=None, on_done=None):
+        """
+        Queue a process for termination (terminate, then kill if still running)
+
+        Args:
+            create_time: Process create time, so a reused pid is not killed
+            on_done: Optional callable(success), called once the process is gone
+        """
+        self.killer.submit(pid, app_name, create_time, on_done)
+
+    def _on_killed(self, blocked_event, success):
+        if not success:
+            return
+        with self.lock:
+            self.blocked_attempts.append(blocked_event)
 
-        return False
+        if self.on_block:
+            self.on_block(blocked_event)
 
-    def kill_process(self, pid, app_name):
-        """Kill a process by PID"""
-        try:
-            proc = psutil.Process(pid)
-            proc.terminate()
+    def on_processes_changed(self, started, exited):
+        """Process table callback: track launches and exits, block what is blocked"""
+        if not self.running:
+            return
+        for record in exited:
+            self.running_apps.pop(record.pid, None)
 
-            # Wait a bit then force kill if still running
-            time.sleep(0.5)
-            if proc.is_running():
-                proc.kill()
+        for record in started:
+            if not record.exe:  # Only apps with executables
+                continue
+            try:
+                # New app launched
+                pid = record.pid
+                app_info = self._app_info(record)
+                self.running_apps[pid] = app_info
+                app_name = app_info['name']
+                category = self.categorize_app(app_name)
+
+                # Check if should be blocked; the kill is queued before anything else runs
+                if self.is_app_blocked(app_name):
+                    blocked_event = {
+                        'timestamp': datetime.now().isoformat(),
+                        'pid': pid,
+                        'name': app_name,
+                        'category': category,
+                        'action': 'blocked'
+                    }
+                    self.kill_process(pid, app_name, record.create_time,
+                                      lambda success, event=blocked_event: self._on_killed(event, success))
 
-            print(f"Blocked app terminated: {app_name} (PID: {pid})")
-            return True
+                launch_event = {
+                    'timestamp': datetime.now().isoformat(),
+                    'pid': pid,
+                    'name': app_name,
+                    'exe': app_info['exe'],
+                    'category': category
+                }
 
-        except psutil.NoSuchProcess:
-            return True  # Already gone
-        except psutil.AccessDenied:
-            print(f"Cannot kill {app_name}: Access denied (may need admin)")
-            return False
-        except Exception as e:
-            print(f"Error killing {app_name}: {e}")
-            return False
+                with self.lock:
+                    self.app_launches.append(launch_event)
 
-    def monitor_loop(self):
-        """Main monitoring loop"""
-        while self.running:
-            try:
-                current_apps = self.get_running_apps()
-
-                # Detect new apps
-                for pid, app_info in current_apps.items():
-                    if pid not in self.running_apps:
-                        # New app launched
-                        app_name = app_info['name']
-                        category = self.categorize_app(app_name)
-
-                        launch_event = {
-                            'timestamp': datetime.now().isoformat(),
-                            'pid': pid,
-                            'name': app_name,
-                            'exe': app_info['exe'],
-                            'category': category
-                        }
-
-                        with self.lock:
-                            self.app_launches.append(launch_event)
-
-                        if self.on_app_launch:
-                            self.on_app_launch(launch_event)
-
-                        # Check if should be blocked
-                        if self.is_app_blocked(app_name):
-                            blocked_event = {
-                                'timestamp': datetime.now().isoformat(),
-                                'pid': pid,
-                                'name': app_name,
-                                'category': category,
-                                'action': 'blocked'
-                            }
-
-                            if self.kill_process(pid, app_name):
-                                with self.lock:
-                                    self.blocked_attempts.append(blocked_event)
-
-                                if self.on_block:
-                                    self.on_block(blocked_event)
-
-                # Detect closed apps
-                closed_pids = set(self.running_apps.keys()) - set(current_apps.keys())
-                for pid in closed_pids:
-                    del self.running_apps[pid]
-
-                # Update running apps
-                self.running_apps = current_apps
-
-                time.sleep(2)  # Check every 2 seconds
+                if self.on_app_launch:
+                    self.on_app_launch(launch_event)
 
             except Exception as e:
                 print(f"App blocker error: {e}")
-                time.sleep(2)
 
     def block_app(self, app_name):
         """Add app to block list"""
         self.blocked_apps.add(app_name.lower())
+        self._rules_changed()
         print(f"App blocked: {app_name}")
 
         # Kill if currently running
@@ -203,32 +322,38 @@ class AppBlocker:
     def unblock_app(self, app_name):
         """Remove app from block list"""
         self.blocked_apps.discard(app_name.lower())
+        self._rules_changed()
         print(f"App unblocked: {app_name}")
 
     def block_category(self, category):
         """Block all apps in a category"""
         self.blocked_categories.add(category)
+        self._rules_changed()
         print(f"Category blocked: {category}")
         self._kill_blocked_apps()
 
     def unblock_category(self, category):
         """Unblock all apps in a category"""
         self.blocked_categories.discard(category)
+        self._rules_changed()
         print(f"Category unblocked: {category}")
 
     def add_to_whitelist(self, app_name):
         """Add app to whitelist (never block)"""
         self.whitelist.add(app_name.lower())
+        self._rules_changed()
 
     def remove_from_whitelist(self, app_name):
         """Remove app from whitelist"""
         self.whitelist.discard(app_name.lower())
+        self._rules_changed()
 
     def _kill_blocked_apps(self):
         """Kill any currently running blocked apps"""
         for pid, app_info in list(self.running_apps.items()):
             if self.is_app_blocked(app_info['name']):
-                self.kill_process(pid, app_info['name'])
+                record = self.process_table.get(pid)
+                self.kill_process(pid, app_info['name'], record.create_time if record else None)
 
     def get_app_launches(self, clear=False):
         """Get app launch history"""
@@ -265,7 +390,8 @@ class AppBlocker:
             'whitelist': list(self.whitelist),
             'running_apps_count': len(self.running_apps),
             'total_launches': len(self.app_launches),
-            'total_blocks': len(self.blocked_attempts)
+            'total_blocks': len(self.blocked_attempts),
+            'kills': dict(self.killer.stats),
         }
 
     def start(self):
@@ -274,16 +400,21 @@ class AppBlocker:
             return
 
         self.running = True
+        self.killer.start()
+        # Subscribe before taking the snapshot, so a process started in between is still blocked
+        self.process_table.subscribe(self.on_processes_changed)
+        self.process_table.start(SCAN_INTERVAL)
         self.running_apps = self.get_running_apps()
-        self.thread = threading.Thread(target=self.monitor_loop, daemon=True)
-        self.thread.start()
         print("App blocker started")
 
     def stop(self):
         """Stop app monitoring/blocking"""
+        if not self.running:
+            return
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=3)
+        self.process_table.unsubscribe(self.on_processes_changed)
+        self.process_table.stop(SCAN_INTERVAL)
+        self.killer.stop()
         print("App blocker stopped")
 
 
@@ -10,11 +10,15 @@ import re
 from datetime import datetime
 from collections import deque, defaultdict
 
-import psutil
-import win32gui
-import win32process
 import win32api
 
+try:
+    from .window_sampler import get_window_sampler
+    from .process_table import get_process_table
+except ImportError:
+    from window_sampler import get_window_sampler
+    from process_table import get_process_table
+
 
 # Communication application patterns
 COMMUNICATION_APPS = {
@@ -65,10 +69,12 @@ MEETING_TITLE_PATTERNS = [
 
 
 class CommunicationMonitor:
-    def __init__(self, on_comm_event_callback=None):
+    def __init__(self, on_comm_event_callback=None, sampler=None, process_table=None):
         self.running = False
         self.thread = None
         self.on_comm_event = on_comm_event_callback
+        self.sampler = sampler or get_window_sampler()
+        self.process_table = process_table or get_process_table()
 
         # Tracking
         self.active_comm_apps = {}
@@ -104,36 +110,19 @@ class CommunicationMonitor:
             })
 
     def get_active_window_info(self):
-        """Get information about the currently active window"""
-        try:
-            hwnd = win32gui.GetForegroundWindow()
-            if not hwnd:
-                return None
-
-            # Get window title
-            window_title = win32gui.GetWindowText(hwnd)
-
-            # Get process info
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-
-            try:
-                proc = psutil.Process(pid)
-                exe_name = proc.name().lower()
-                exe_path = proc.exe()
-
-                return {
-                    'hwnd': hwnd,
-                    'title': window_title,
-                    'pid': pid,
-                    'exe_name': exe_name,
-                    'exe_path': exe_path,
-                }
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                return None
-
-        except Exception as e:
+        """Get information about the currently active window (from the shared sampler)"""
+        context = self.sampler.current()
+        if not context['hwnd'] or not context['app_name']:
             return None
 
+        return {
+            'hwnd': context['hwnd'],
+            'title': context['title'],
+            'pid': context['pid'],
+            'exe_name': context['app_name'].lower(),
+            'exe_path': context['exe_path'],
+        }
+
     def detect_communication_app(self, window_info):
         """Detect if window is a communication app"""
         if not window_info:
@@ -170,17 +159,14 @@ class CommunicationMonitor:
         """Get all currently running communication apps"""
         running = []
 
-        for proc in psutil.process_iter(['pid', 'name', 'exe']):
-            try:
-                exe_name = proc.info['name'].lower()
-                if exe_name in self.app_lookup:
-                    running.append({
-                        'pid': proc.info['pid'],
-                        'exe_name': exe_name,
-                        **self.app_lookup[exe_name]
-                    })
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
+        for record in self.process_table.snapshot(max_age=5):
+            exe_name = record.name.lower()
+            if exe_name in self.app_lookup:
+                running.append({
+                    'pid': record.pid,
+                    'exe_name': exe_name,
+                    **self.app_lookup[exe_name]
+                })
 
         return running
 
@@ -423,13 +409,17 @@ class CommunicationMonitor:
             return
 
         self.running = True
+        self.sampler.start()
         self.thread = threading.Thread(target=self.monitor_loop, daemon=True)
         self.thread.start()
         print("Communication monitor started")
 
     def stop(self):
         """Stop communication monitoring"""
+        if not self.running:
+            return
         self.running = False
+        self.sampler.stop()
         if self.thread:
             self.thread.join(timeout=3)
         print("Communication monitor stopped")
@@ -0,0 +1,407 @@
+"""
+Correlation Engine - Detects sequences of events within time windows
+Keeps keyed partial matches with bounded memory and expiry, on top of AlertEngine
+"""
+
+import os
+from datetime import datetime
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Callable, Tuple
+
+import psutil
+
+
+def get_event_field(event: dict, field_name: str):
+    """Read a possibly dotted field (e.g. 'device.serial_number') from an event"""
+    value = event
+    for part in field_name.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+@dataclass
+class SequenceStep:
+    """One step of a correlation sequence"""
+    name: str
+    condition: Callable  # condition(event) -> bool
+    min_count: int = 1  # Matching events needed before the sequence advances
+    where: Optional[Callable] = None  # where(event, captured_events) -> bool
+    key: Optional[Tuple[str, ...]] = None  # Overrides the rule key for this step
+
+
+@dataclass
+class CorrelationRule:
+    """Sequence rule: all steps must match, in order, inside the window"""
+    rule_id: str
+    name: str
+    description: str
+    category: str
+    severity: str
+    steps: List[SequenceStep]
+    window_seconds: int = 600
+    key: Tuple[str, ...] = ()  # Event fields that partition partial matches
+    cooldown_seconds: int = 600  # Coalescing window for the resulting alert
+    enabled: bool = True
+    group_by: Tuple[str, ...] = ()  # Coalescing is keyed by the partition key instead
+    risk_key: Optional[str] = None  # RiskScorer weight prefix (defaults to category)
+
+
+class PartialMatch:
+    """Progress of one keyed sequence"""
+
+    __slots__ = ('step_index', 'step_count', 'started', 'updated', 'captured', 'total_events')
+
+    def __init__(self, started: float):
+        self.step_index = 0
+        self.step_count = 0
+        self.started = started
+        self.updated = started
+        self.captured = []
+        self.total_events = 0
+
+
+class NoveltyTracker:
+    """Remembers values seen per key (e.g. login sources per user), bounded on both axes"""
+
+    def __init__(self, key_field: str, value_field: str, match: Callable = None,
+                 max_keys: int = 500, max_values: int = 50):
+        self.key_field = key_field
+        self.value_field = value_field
+        self.match = match or (lambda e: True)
+        self.max_keys = max_keys
+        self.max_values = max_values
+        self.seen = OrderedDict()  # key -> OrderedDict of values
+
+    def is_new(self, event: dict) -> bool:
+        """True if the event's value has not been seen for its key"""
+        value = get_event_field(event, self.value_field)
+        if value in (None, '', '-'):
+            return False
+        values = self.seen.get(get_event_field(event, self.key_field))
+        return values is None or value not in values
+
+    def observe(self, event: dict):
+        """Learn the value carried by an event"""
+        if not self.match(event):
+            return
+        value = get_event_field(event, self.value_field)
+        if value in (None, '', '-'):
+            return
+
+        key = get_event_field(event, self.key_field)
+        values = self.seen.get(key)
+        if values is None:
+            values = OrderedDict()
+            self.seen[key] = values
+            while len(self.seen) > self.max_keys:
+                self.seen.popitem(last=False)
+        self.seen.move_to_end(key)
+
+        values[value] = True
+        values.move_to_end(value)
+        while len(values) > self.max_values:
+            values.popitem(last=False)
+
+
+class RemovableDrives:
+    """
+    Cached set of removable mount points
+
+    Args:
+        refresh_seconds: Seconds between psutil lookups
+        mountpoints: Fixed mount points, never refreshed (for replays)
+    """
+
+    def __init__(self, refresh_seconds: int = 30, mountpoints: Optional[Iterable[str]] = None):
+        self.refresh_seconds = refresh_seconds
+        self.fixed = mountpoints is not None
+        self.mountpoints = tuple(os.path.normcase(mp) for mp in mountpoints or ())
+        self.last_refresh = 0.0
+
+    def contains(self, path: str, now: float) -> bool:
+        """Check whether a path lives on a removable drive"""
+        if not path:
+            return False
+        if not self.fixed and now - self.last_refresh >= self.refresh_seconds:
+            self.last_refresh = now
+            try:
+                self.mountpoints = tuple(
+                    os.path.normcase(p.mountpoint)
+                    for p in psutil.disk_partitions(all=False)
+                    if 'removable' in p.opts
+                )
+            except Exception:
+                self.mountpoints = ()
+        path = os.path.normcase(path)
+        return any(path.startswith(mp) for mp in self.mountpoints)
+
+
+class CorrelationEngine:
+    """Runs events through sequence rules and reports completed matches"""
+
+    def __init__(self, max_partials_per_rule: int = 500, max_captured: int = 5):
+        self.max_partials_per_rule = max_partials_per_rule
+        self.max_captured = max_captured
+
+        self.rules: Dict[str, CorrelationRule] = {}
+        self.partials: Dict[str, OrderedDict] = {}  # rule_id -> key -> PartialMatch
+        self.trackers: List[NoveltyTracker] = []
+
+        self.removable_drives = RemovableDrives()
+        self._clock = 0.0
+
+        self.stats = {
+            'events_processed': 0,
+            'matches': 0,
+            'partials_expired': 0,
+            'partials_evicted': 0,
+        }
+
+        self._init_default_rules()
+
+    def _init_default_rules(self):
+        """Initialize default correlation rules"""
+        login_sources = NoveltyTracker(
+            'user', 'source_ip',
+            match=lambda e: e.get('type') == 'login' and e.get('event_type') == 'login_success',
+        )
+        self.trackers.append(login_sources)
+
+        default_rules = [
+            CorrelationRule(
+                rule_id='usb_exfiltration',
+                name='Possible USB Exfiltration',
+                description='USB storage connected, many files written to removable drive, then critical DLP hit',
+                category='security',
+                severity='critical',
+                risk_key='anomaly_detected',
+                window_seconds=600,
+                steps=[
+                    SequenceStep('usb_storage_connected', self._is_usb_storage_connect),
+                    SequenceStep(
+                        'files_to_removable',
+                        lambda e: e.get('type') == 'file' and e.get('action') == 'created'
+                        and self.removable_drives.contains(e.get('filepath'), self._clock),
+                        min_count=20,
+                    ),
+                    SequenceStep(
+                        'dlp_critical',
+                        lambda e: e.get('type') == 'dlp' and e.get('severity') == 'critical',
+                    ),
+                ],
+            ),
+            CorrelationRule(
+                rule_id='failed_then_new_source_login',
+                name='Login From New Source After Failures',
+                description='Failed login attempts followed by a successful login from a new source',
+                category='security',
+                severity='high',
+                risk_key='anomaly_detected',
+                window_seconds=900,
+                key=('user',),
+                steps=[
+                    SequenceStep(
+                        'failed_logins',
+                        lambda e: e.get('type') == 'login' and e.get('event_type') == 'login_failed',
+                        min_count=3,
+                    ),
+                    SequenceStep(
+                        'new_source_login',
+                        lambda e: e.get('type') == 'login' and e.get('event_type') == 'login_success'
+                        and login_sources.is_new(e),
+                    ),
+                ],
+            ),
+        ]
+
+        for rule in default_rules:
+            self.add_rule(rule)
+
+    @staticmethod
+    def _is_usb_storage_connect(event: dict) -> bool:
+        """USB storage arrival, from either USBMonitor or DeviceControl"""
+        if event.get('type') != 'device' or event.get('action') != 'connected':
+            return False
+        return (event.get('device_type') == 'usb_storage'
+                or event.get('device_class') == 'storage'
+                or get_event_field(event, 'device.type') == 'usb_storage')
+
+    def add_rule(self, rule: CorrelationRule):
+        """Add a correlation rule"""
+        self.rules[rule.rule_id] = rule
+        self.partials[rule.rule_id] = OrderedDict()
+
+    def remove_rule(self, rule_id: str):
+        """Remove a correlation rule and its partial matches"""
+        self.rules.pop(rule_id, None)
+        self.partials.pop(rule_id, None)
+
+    def _partition_key(self, rule: CorrelationRule, step: SequenceStep, event: dict) -> tuple:
+        fields = step.key if step.key is not None else rule.key
+        return tuple(str(get_event_field(event, f)) for f in fields)
+
+    def process(self, event: dict, now: datetime = None) -> List[dict]:
+        """
+        Feed one event through all rules
+
+        Returns:
+            List of completed matches (rule, key, captured events, timing)
+        """
+        now = now or datetime.now()
+        now_ts = now.timestamp()
+        self._clock = now_ts
+        self.stats['events_processed'] += 1
+        completed = []
+
+        for rule_id, rule in self.rules.items():
+            if not rule.enabled:
+                continue
+            try:
+                match = self._advance(rule, event, now_ts)
+                if match:
+                    completed.append(match)
+            except Exception as e:
+                print(f"Error evaluating correlation rule {rule_id}: {e}")
+
+        for tracker in self.trackers:
+            tracker.observe(event)
+
+        return completed
+
+    def _advance(self, rule: CorrelationRule, event: dict, now_ts: float) -> Optional[dict]:
+        """Advance this rule's partial match for the event's key, if any"""
+        partials = self.partials[rule.rule_id]
+
+        # Continue an in-flight sequence for this key
+        for step_index in range(1, len(rule.steps)):
+            step = rule.steps[step_index]
+            key = self._partition_key(rule, step, event)
+            partial = partials.get(key)
+            if partial is None or partial.step_index != step_index:
+                continue
+
+            if now_ts - partial.started > rule.window_seconds:
+                del partials[key]
+                self.stats['partials_expired'] += 1
+                break
+
+            if not step.condition(event):
+                continue
+            if step.where and not step.where(event, partial.captured):
+                continue
+
+            return self._record_step(rule, partials, key, partial, event, now_ts)
+
+        # Otherwise see whether the event opens a new sequence
+        first = rule.steps[0]
+        if not first.condition(event):
+            return None
+        if first.where and not first.where(event, []):
+            return None
+
+        key = self._partition_key(rule, first, event)
+        partial = partials.get(key)
+        if partial is not None:
+            if now_ts - partial.started <= rule.window_seconds:
+                if partial.step_index == 0:
+                    return self._record_step(rule, partials, key, partial, event, now_ts)
+                return None
+            self.stats['partials_expired'] += 1
+
+        partial = PartialMatch(now_ts)
+        partials[key] = partial
+        while len(partials) > self.max_partials_per_rule:
+            partials.popitem(last=False)
+            self.stats['partials_evicted'] += 1
+
+        return self._record_step(rule, partials, key, partial, event, now_ts)
+
+    def _record_step(self, rule: CorrelationRule, partials: OrderedDict, key: tuple,
+                     partial: PartialMatch, event: dict, now_ts: float) -> Optional[dict]:
+        """Count an event towards the current step and complete the sequence if done"""
+        partial.step_count += 1
+        partial.total_events += 1
+        partial.updated = now_ts
+        if len(partial.captured) < self.max_captured:
+            partial.captured.append(event)
+        partials.move_to_end(key)
+
+        if partial.step_count < rule.steps[partial.step_index].min_count:
+            return None
+
+        partial.step_index += 1
+        partial.step_count = 0
+        if partial.step_index < len(rule.steps):
+            return None
+
+        del partials[key]
+        self.stats['matches'] += 1
+        return {
+            'rule': rule,
+            'key': key,
+            'started': datetime.fromtimestamp(partial.started).isoformat(),
+            'completed': datetime.fromtimestamp(now_ts).isoformat(),
+            'event_count': partial.total_events,
+            'events': partial.captured,
+        }
+
+    def expire(self, now: datetime = None):
+        """Drop partial matches whose window has passed"""
+        now_ts = (now or datetime.now()).timestamp()
+        for rule_id, partials in self.partials.items():
+            window = self.rules[rule_id].window_seconds
+            expired = [k for k, p in partials.items() if now_ts - p.started > window]
+            for key in expired:
+                del partials[key]
+            self.stats['partials_expired'] += len(expired)
+
+    def get_rules(self) -> List[dict]:
+        """Get all correlation rules"""
+        return [
+            {
+                'rule_id': r.rule_id,
+                'name': r.name,
+                'description': r.description,
+                'category': r.category,
+                'severity': r.severity,
+                'enabled': r.enabled,
+                'cooldown_seconds': r.cooldown_seconds,
+                'window_seconds': r.window_seconds,
+                'steps': [s.name for s in r.steps],
+            }
+            for r in self.rules.values()
+        ]
+
+    def get_stats(self) -> dict:
+        """Get correlation statistics"""
+        return {
+            **self.stats,
+            'open_partials': sum(len(p) for p in self.partials.values()),
+        }
+
+
+if __name__ == "__main__":
+    engine = CorrelationEngine()
+
+    print("Testing correlation engine...\n")
+
+    events = [
+        {'type': 'login', 'event_type': 'login_success', 'user': 'bob', 'source_ip': '10.0.0.5'},
+        {'type': 'login', 'event_type': 'login_failed', 'user': 'bob'},
+        {'type': 'login', 'event_type': 'login_failed', 'user': 'bob'},
+        {'type': 'login', 'event_type': 'login_failed', 'user': 'bob'},
+        {'type': 'login', 'event_type': 'login_success', 'user': 'bob', 'source_ip': '10.0.0.5'},
+        {'type': 'login', 'event_type': 'login_failed', 'user': 'bob'},
+        {'type': 'login', 'event_type': 'login_failed', 'user': 'bob'},
+        {'type': 'login', 'event_type': 'login_failed', 'user': 'bob'},
+        {'type': 'login', 'event_type': 'login_success', 'user': 'bob', 'source_ip': '203.0.113.9'},
+    ]
+
+    for event in events:
+        for match in engine.process(event):
+            print(f"[MATCH] {match['rule'].name} key={match['key']} events={match['event_count']}")
+
+    print(f"\nStats: {engine.get_stats()}")
@@ -0,0 +1,284 @@
+"""
+DLP Scan Cache - Remembers scan findings per file version and per content
+Autosave and editor churn re-fire file events for unchanged content; this skips the rescans.
+Files that only grew (logs, exports) are tracked so just the appended bytes get scanned.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ScanResultCache:
+    """
+    Bounded LRU of DLP findings
+
+    Entries are keyed by (path, size, mtime), which costs only a stat. When
+    that misses, a content hash is checked next, so a file rewritten with the
+    same bytes (autosave, touch, copy) is still a hit.
+
+    Findings are the masked alert fields only; raw matched values are never cached.
+    """
+
+    HASH_CHUNK = 1024 * 1024
+    MAX_PATHS_PER_DIGEST = 8
+
+    def __init__(self, max_entries: int = 2048, max_hash_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_hash_bytes = max_hash_bytes
+        self.by_version = OrderedDict()  # (path, size, mtime_ns) -> digest
+        self.by_digest = OrderedDict()  # digest -> {'findings': [...], 'paths': OrderedDict}
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'version_hits': 0,
+            'content_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'bytes_hashed': 0,
+        }
+
+    @staticmethod
+    def version_key(filepath: str) -> Tuple[str, int, int]:
+        """(path, size, mtime) for a file; raises OSError if it can't be stat'd"""
+        st = os.stat(filepath)
+        return (os.path.normcase(os.path.abspath(filepath)), st.st_size, st.st_mtime_ns)
+
+    def content_digest(self, filepath: str) -> str:
+        """BLAKE2b digest of the file's first max_hash_bytes"""
+        h = hashlib.blake2b(digest_size=16)
+        remaining = self.max_hash_bytes
+        with open(filepath, 'rb') as f:
+            while remaining > 0:
+                data = f.read(min(self.HASH_CHUNK, remaining))
+                if not data:
+                    break
+                h.update(data)
+                remaining -= len(data)
+        with self.lock:
+            self.stats['bytes_hashed'] += self.max_hash_bytes - remaining
+        return h.hexdigest()
+
+    def lookup(self, filepath: str, content: bool = True):
+        """
+        Look up cached findings for a file
+
+        Args:
+            content: Fall back to hashing the file when (path, size, mtime) misses
+
+        Returns:
+            (findings or None, token, seen_here). seen_here is True when this
+            path already produced the cached findings, i.e. nothing new to alert
+            on. On a miss, pass the token to store() with the fresh findings.
+        """
+        version = self.version_key(filepath)
+
+        with self.lock:
+            digest = self.by_version.get(version)
+            if digest is not None and digest in self.by_digest:
+                self.by_version.move_to_end(version)
+                self.by_digest.move_to_end(digest)
+                self.stats['version_hits'] += 1
+                return self.by_digest[digest]['findings'], (version, digest), True
+
+        if not content:
+            return None, None, False
+
+        digest = self.content_digest(filepath)
+
+        with self.lock:
+            entry = self.by_digest.get(digest)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None, (version, digest), False
+
+            self.by_digest.move_to_end(digest)
+            self._remember_version(version, digest)
+            seen_here = version[0] in entry['paths']
+            self._remember_path(entry, version[0])
+            self.stats['content_hits'] += 1
+            return entry['findings'], (version, digest), seen_here
+
+    def store(self, filepath: str, token: tuple, findings: list):
+        """Cache the findings of a fresh scan, unless the file changed during it"""
+        version, digest = token
+        try:
+            if self.version_key(filepath) != version:
+                return
+        except OSError:
+            return
+
+        with self.lock:
+            entry = self.by_digest.get(digest)
+            if entry is None:
+                entry = {'findings': findings, 'paths': OrderedDict()}
+                self.by_digest[digest] = entry
+            else:
+                entry['findings'] = findings
+                self.by_digest.move_to_end(digest)
+            self._remember_path(entry, version[0])
+            self._remember_version(version, digest)
+
+            while len(self.by_digest) > self.max_entries:
+                self.by_digest.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def _remember_version(self, version: tuple, digest: str):
+        self.by_version[version] = digest
+        self.by_version.move_to_end(version)
+        # Versions outnumber digests (many versions can share content); cap them separately
+        while len(self.by_version) > self.max_entries * 2:
+            self.by_version.popitem(last=False)
+
+    def _remember_path(self, entry: dict, path: str):
+        paths = entry['paths']
+        paths[path] = True
+        paths.move_to_end(path)
+        while len(paths) > self.MAX_PATHS_PER_DIGEST:
+            paths.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries (e.g. after the pattern set changes)"""
+        with self.lock:
+            self.by_version.clear()
+            self.by_digest.clear()
+
+    def get_stats(self) -> dict:
+        """Get cache statistics"""
+        with self.lock:
+            hits = self.stats['version_hits'] + self.stats['content_hits']
+            lookups = hits + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self.by_digest),
+                'versions': len(self.by_version),
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class AppendTracker:
+    """
+    Per-file state for scanning only what was appended
+
+    After a scan of a plain-text file, remembers its file ID, size, digests
+    of its first and last few KB, how many characters it decoded to, where
+    each pattern's last match ended and how many matches it has kept. If the file later has the same ID, is
+    larger, and both digests still match, only the bytes from just before the
+    old end are rescanned. Otherwise the caller does a full scan.
+    """
+
+    def __init__(self, max_files: int = 1024, check_bytes: int = 4096):
+        self.max_files = max_files
+        self.check_bytes = check_bytes
+        self.states = OrderedDict()  # path -> state dict
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'appends_scanned': 0,
+            'bytes_skipped': 0,
+            'prefix_changed': 0,
+        }
+
+    @staticmethod
+    def _file_id(st) -> tuple:
+        return (st.st_dev, st.st_ino)
+
+    def _edges(self, f, size: int) -> str:
+        """Digest of the first and last check_bytes before size"""
+        h = hashlib.blake2b(digest_size=16)
+        f.seek(0)
+        h.update(f.read(min(self.check_bytes, size)))
+        tail_start = max(size - self.check_bytes, 0)
+        f.seek(tail_start)
+        h.update(f.read(size - tail_start))
+        return h.hexdigest()
+
+    def resume_point(self, filepath: str, overlap_bytes: int) -> Optional[dict]:
+        """
+        Where to resume scanning if the file only grew since its last scan
+
+        Returns:
+            None for a full scan, {'unchanged': True} if the file is as last
+            scanned, else {'byte', 'char', 'contexts', 'last_end', 'kept'}:
+            byte/char offsets to resume from, the contexts found so far, where
+            each pattern's last reported match ended, and the matches each
+            pattern has kept against its cap
+        """
+        path = os.path.normcase(os.path.abspath(filepath))
+        with self.lock:
+            state = self.states.get(path)
+        if state is None:
+            return None
+
+        st = os.stat(filepath)
+        if self._file_id(st) != state['file_id'] or st.st_size < state['size']:
+            return None
+        if st.st_size == state['size'] and st.st_mtime_ns == state['mtime_ns']:
+            return {'unchanged': True}
+
+        with open(filepath, 'rb') as f:
+            if st.st_size == state['size'] or self._edges(f, state['size']) != state['edges']:
+                self.stats['prefix_changed'] += 1
+                return None
+
+            # Resume on a UTF-8 character boundary before the old end
+            start = max(state['size'] - overlap_bytes, 0)
+            f.seek(start)
+            overlap = f.read(state['size'] - start)
+            skip = 0
+            while skip < len(overlap) and 0x80 <= overlap[skip] < 0xC0:
+                skip += 1
+
+        overlap_chars = len(overlap[skip:].decode('utf-8', errors='ignore'))
+        self.stats['appends_scanned'] += 1
+        self.stats['bytes_skipped'] += start + skip
+        return {
+            'byte': start + skip,
+            'char': state['chars'] - overlap_chars,
+            'contexts': set(state['contexts']),
+            'last_end': dict(state['last_end']),
+            'kept': dict(state['kept']),
+        }
+
+    def update(self, filepath: str, size: int, chars: int, contexts: set, last_end: dict,
+               kept: Optional[dict] = None):
+        """Record the state after scanning a plain-text file through byte `size`"""
+        try:
+            st = os.stat(filepath)
+            with open(filepath, 'rb') as f:
+                edges = self._edges(f, size)
+        except OSError:
+            return
+
+        path = os.path.normcase(os.path.abspath(filepath))
+        with self.lock:
+            self.states[path] = {
+                'file_id': self._file_id(st),
+                'size': size,
+                'mtime_ns': st.st_mtime_ns,
+                'edges': edges,
+                'chars': chars,
+                'contexts': frozenset(contexts),
+                'last_end': dict(last_end),
+                'kept': dict(kept or {}),
+            }
+            self.states.move_to_end(path)
+            while len(self.states) > self.max_files:
+                self.states.popitem(last=False)
+
+    def forget(self, filepath: str):
+        """Drop a file's state so its next scan is a full one"""
+        with self.lock:
+            self.states.pop(os.path.normcase(os.path.abspath(filepath)), None)
+
+    def clear(self):
+        """Drop all state (e.g. after the pattern set changes)"""
+        with self.lock:
+            self.states.clear()
+
+    def get_stats(self) -> dict:
+        """Get append tracking statistics"""
+        with self.lock:
+            return {**self.stats, 'files': len(self.states)}
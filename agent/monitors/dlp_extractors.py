@@ -0,0 +1,465 @@
+"""
+DLP Text Extractors - Streaming text extraction from files for the DLP scanner
+Handles plain text, ZIP archives, Office Open XML / OpenDocument (ZIP of XML) and PDF
+content streams, within byte, decompression-ratio and time budgets
+"""
+
+import codecs
+import io
+import mmap
+import os
+import re
+import time
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+
+
+# Zip members decoded as plain text
+TEXT_MEMBER_EXTENSIONS = {
+    '.txt', '.csv', '.tsv', '.json', '.log', '.md', '.sql', '.ini', '.cfg', '.conf',
+    '.yaml', '.yml', '.html', '.htm', '.eml', '.env', '.properties',
+}
+
+# Zip members that are containers themselves (extracted recursively, in memory)
+NESTED_EXTENSIONS = {'.zip', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.pdf'}
+
+# OOXML/ODF parts with no user text
+SKIP_XML_PARTS = (
+    '[content_types].xml', 'styles.xml', 'fonttable.xml', 'settings.xml',
+    'websettings.xml', 'calcchain.xml', 'manifest.xml', 'meta.xml',
+)
+SKIP_XML_DIRS = ('/theme/', 'theme/', '/_rels/', '_rels/', 'customxml/', 'meta-inf/')
+
+# XML elements whose end separates text: paragraphs/rows -> newline, cells/tabs -> tab
+XML_LINE_TAGS = {'p', 'tr', 'row', 'si', 'br', 'cr', 'h', 'list-item', 'line-break'}
+XML_CELL_TAGS = {'c', 'tc', 'tab', 'table-cell', 's'}
+
+# PDF stream dictionaries that never hold page text
+PDF_SKIP_STREAMS = (b'/Image', b'/ObjStm', b'/XRef', b'/Length1', b'/Length2', b'/FontFile',
+                    b'/Metadata', b'/ICCBased', b'/EmbeddedFile')
+
+_PDF_STREAM = re.compile(rb'(?<!end)stream\r?\n')
+_PDF_TOKEN = re.compile(
+    rb'\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)'  # literal string (one level of nesting)
+    rb'|<[0-9A-Fa-f\s]*>'  # hex string
+    rb'|-?\d*\.?\d+'  # number (kerning inside TJ arrays)
+    rb'|\[|\]'
+    rb'|T[Jj*dDm]|ET|\'|"',
+    re.S,
+)
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                b'(': b'(', b')': b')', b'\\': b'\\'}
+_PDF_ESCAPE = re.compile(rb'\\([0-7]{1,3}|\r\n|[\r\n]|.)', re.S)
+
+
+class ExtractionLimit(Exception):
+    """Raised inside an extractor when a budget runs out"""
+
+
+class MemberLimit(ExtractionLimit):
+    """Raised when one zip member or PDF stream is over its limits; the rest is still read"""
+
+
+class TextExtractor:
+    """
+    Iterates the text of a file in chunks, whatever its container format
+
+    The format is picked from the file's magic bytes, not its extension.
+    Every extractor streams: ZIP members are read piecewise, XML goes through
+    a pull parser that discards elements as they close, and PDF streams are
+    found through mmap and inflated one at a time.
+
+    Budgets:
+        max_bytes: Text-producing bytes read or inflated, across the whole file
+        max_ratio: Inflated/compressed ratio above which a member is a bomb
+        max_members: Zip members looked at
+        max_nested_bytes: Largest nested container (or PDF stream) held in memory
+        max_depth: Container nesting depth
+        deadline: Epoch seconds after which extraction stops
+
+    A nonzero offset resumes a plain-text file at that byte (which must start
+    a UTF-8 character); containers can't be resumed.
+
+    After iteration, bytes_read, truncated, bomb and format describe what happened.
+    """
+
+    RATIO_GRACE = 1024 * 1024  # Inflated bytes allowed before the ratio check applies
+
+    def __init__(self, filepath: str, max_bytes: int = 256 * 1024 * 1024,
+                 chunk_size: int = 1024 * 1024, deadline: float = None,
+                 max_ratio: int = 100, max_members: int = 1000,
+                 max_nested_bytes: int = 32 * 1024 * 1024, max_depth: int = 2,
+                 offset: int = 0):
+        self.filepath = filepath
+        self.offset = offset
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.deadline = deadline
+        self.max_ratio = max_ratio
+        self.max_members = max_members
+        self.max_nested_bytes = max_nested_bytes
+        self.max_depth = max_depth
+
+        self.bytes_read = 0
+        self.members = 0
+        self.truncated = False
+        self.bomb = False
+        self.format = None
+
+    def __iter__(self):
+        try:
+            with open(self.filepath, 'rb') as f:
+                if self.offset:
+                    self.format = 'text'
+                    f.seek(self.offset)
+                    yield from self._iter_plain(f)
+                    return
+                magic = f.read(8)
+                f.seek(0)
+                if magic.startswith(b'PK\x03\x04'):
+                    self.format = 'zip'
+                    yield from self._iter_zip_file(f, depth=0)
+                elif magic.startswith(b'%PDF-'):
+                    self.format = 'pdf'
+                    yield from self._iter_pdf_file(f)
+                else:
+                    self.format = 'text'
+                    yield from self._iter_plain(f)
+        except ExtractionLimit:
+            self.truncated = True
+
+    # -- budgets --
+
+    def _take(self, n: int) -> int:
+        """Charge n bytes to the budget; returns how many may be used"""
+        if self.deadline and time.time() > self.deadline:
+            raise ExtractionLimit()
+        allowed = min(n, self.max_bytes - self.bytes_read)
+        if allowed <= 0:
+            raise ExtractionLimit()
+        self.bytes_read += allowed
+        return allowed
+
+    # -- plain text --
+
+    def _iter_plain(self, stream):
+        """Decode a byte stream as UTF-8 text"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        while True:
+            data = stream.read(self.chunk_size)
+            if not data:
+                break
+            allowed = self._take(len(data))
+            yield decoder.decode(data[:allowed])
+            if allowed < len(data):
+                raise ExtractionLimit()
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    # -- zip / OOXML / ODF --
+
+    def _iter_zip_file(self, fileobj, depth: int):
+        try:
+            archive = zipfile.ZipFile(fileobj)
+        except (zipfile.BadZipFile, OSError):
+            # Truncated or not really a zip: scan the raw bytes instead
+            fileobj.seek(0)
+            yield from self._iter_plain(fileobj)
+            return
+
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                self.members += 1
+                if self.members > self.max_members:
+                    raise ExtractionLimit()
+
+                name = info.filename.lower()
+                ext = os.path.splitext(name)[1]
+                if info.compress_size and info.file_size / info.compress_size > self.max_ratio \
+                        and info.file_size > self.RATIO_GRACE:
+                    self.bomb = self.truncated = True
+                    continue
+
+                try:
+                    if ext == '.xml':
+                        if name.rsplit('/', 1)[-1] in SKIP_XML_PARTS or any(d in name for d in SKIP_XML_DIRS):
+                            continue
+                        with archive.open(info) as member:
+                            yield from self._iter_xml(self._read_member(member, info))
+                    elif ext in TEXT_MEMBER_EXTENSIONS:
+                        with archive.open(info) as member:
+                            yield from self._iter_plain(_ChunkStream(self._read_member(member, info)))
+                    elif ext in NESTED_EXTENSIONS and depth < self.max_depth \
+                            and info.file_size <= self.max_nested_bytes:
+                        with archive.open(info) as member:
+                            data = self._read_nested(member, info)
+                        if data.startswith(b'%PDF-'):
+                            yield from self._iter_pdf(data)
+                        else:
+                            yield from self._iter_zip_file(io.BytesIO(data), depth + 1)
+                    else:
+                        continue
+                except MemberLimit:
+                    # Only this member is cut short; archive-wide budgets still end the scan
+                    self.truncated = True
+                except (RuntimeError, zipfile.BadZipFile, NotImplementedError, zlib.error, EOFError):
+                    # Encrypted, corrupt or unsupported member
+                    continue
+                yield '\n'
+
+    def _read_member(self, member, info):
+        """Read a zip member piecewise, stopping if it inflates like a bomb"""
+        inflated = 0
+        while True:
+            data = member.read(64 * 1024)
+            if not data:
+                return
+            inflated += len(data)
+            # Headers can lie; check the ratio against what actually came out
+            if inflated > self.RATIO_GRACE and inflated > self.max_ratio * max(info.compress_size, 1):
+                self.bomb = True
+                raise MemberLimit()
+            yield data
+
+    def _read_nested(self, member, info) -> bytes:
+        """Read a nested container into memory, within max_nested_bytes"""
+        pieces = []
+        size = 0
+        for data in self._read_member(member, info):
+            size += len(data)
+            if size > self.max_nested_bytes:
+                return b''
+            pieces.append(data)
+        return b''.join(pieces)
+
+    def _iter_xml(self, pieces):
+        """
+        Text nodes of an XML stream in document order, discarding elements as they close
+
+        Each event emits the text just before it: a start tag the parent's
+        text or the previous sibling's tail, an end tag the element's own text
+        or its last child's tail. That keeps ODF's mixed content
+        (<text:p>SSN <text:span>x</text:span> 123</text:p>) whole and in order.
+        """
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        stack = []  # [element, last closed child] per open element
+        checked = False
+
+        for data in pieces:
+            allowed = self._take(len(data))
+            exhausted = allowed < len(data)
+            data = data[:allowed]
+            if not checked:
+                # No DTDs in Office XML; refuse entity tricks outright
+                if b'<!DOCTYPE' in data[:4096] or b'<!ENTITY' in data[:4096]:
+                    return
+                checked = True
+            try:
+                parser.feed(data)
+                events = list(parser.read_events())
+            except ET.ParseError:
+                return
+
+            out = []
+            for event, elem in events:
+                if event == 'start':
+                    if stack:
+                        parent, previous = stack[-1]
+                        text = previous.tail if previous is not None else parent.text
+                        if text:
+                            out.append(text)
+                    stack.append([elem, None])
+                    continue
+                _, previous = stack.pop()
+                text = previous.tail if previous is not None else elem.text
+                if text:
+                    out.append(text)
+                tag = elem.tag.rsplit('}', 1)[-1] if isinstance(elem.tag, str) else ''
+                if tag in XML_LINE_TAGS:
+                    out.append('\n')
+                elif tag in XML_CELL_TAGS:
+                    out.append('\t')
+                if stack:
+                    # The previous child's tail has been read; only this one's is still to come.
+                    # Drop the closed children to keep memory flat
+                    del stack[-1][0][:]
+                    stack[-1][1] = elem
+            if out:
+                yield ''.join(out)
+            if exhausted:
+                raise ExtractionLimit()
+
+    # -- PDF --
+
+    def _iter_pdf_file(self, f):
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield from self._iter_pdf(buf)
+
+    def _iter_pdf(self, buf):
+        """Text shown by the content streams of a PDF (bytes or mmap)"""
+        pos = 0
+        while True:
+            m = _PDF_STREAM.search(buf, pos)
+            if not m:
+                return
+            start = m.end()
+            end = buf.find(b'endstream', start)
+            if end < 0:
+                return
+            pos = end + 9
+
+            header = bytes(buf[max(0, m.start() - 1024):m.start()])
+            header = header[header.rfind(b'<<'):] if b'<<' in header else b''
+            if any(marker in header for marker in PDF_SKIP_STREAMS):
+                continue
+
+            if b'/FlateDecode' in header or b'/Fl ' in header or b'/Fl]' in header:
+                try:
+                    content = self._inflate(buf, start, end)
+                except MemberLimit:
+                    self.truncated = True
+                    continue
+            elif b'/Filter' not in header:
+                content = bytes(buf[start:end])
+                self._take(len(content))
+            else:
+                continue  # Other filters (images, fonts) carry no text we can read
+
+            if content:
+                text = _pdf_text(content)
+                if text:
+                    yield text + '\n'
+
+    def _inflate(self, buf, start: int, end: int) -> bytes:
+        """Inflate one Flate stream within the byte, ratio and size budgets"""
+        inflater = zlib.decompressobj()
+        compressed = max(end - start, 1)
+        out = []
+        total = 0
+        try:
+            for offset in range(start, end, 64 * 1024):
+                piece = inflater.decompress(buf[offset:min(offset + 64 * 1024, end)],
+                                            self.max_nested_bytes - total + 1)
+                total += len(piece)
+                if total > self.RATIO_GRACE and total > self.max_ratio * compressed:
+                    self.bomb = True
+                    raise MemberLimit()
+                if total > self.max_nested_bytes:
+                    self.truncated = True
+                    break
+                self._take(len(piece))
+                out.append(piece)
+        except zlib.error:
+            pass  # Damaged stream: keep what inflated cleanly
+        return b''.join(out)
+
+
+class _ChunkStream:
+    """File-like read() over an iterator of byte chunks"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    def read(self, size=-1):
+        return next(self.pieces, b'')
+
+
+def _pdf_string(token: bytes) -> bytes:
+    """Decode a PDF literal or hex string token"""
+    if token.startswith(b'<'):
+        digits = re.sub(rb'\s', b'', token[1:-1])
+        if len(digits) % 2:
+            digits += b'0'
+        data = bytes.fromhex(digits.decode('ascii'))
+        # Two-byte glyph ids need the font's CMap; keep only plain text
+        return data if all(32 <= b < 127 or b in (9, 10, 13) for b in data) else b''
+
+    def unescape(m):
+        esc = m.group(1)
+        if esc[:1].isdigit():
+            return bytes([int(esc, 8) & 0xFF])
+        if esc in (b'\r\n', b'\r', b'\n'):
+            return b''
+        return _PDF_ESCAPES.get(esc, esc)
+
+    return _PDF_ESCAPE.sub(unescape, token[1:-1])
+
+
+def _pdf_text(content: bytes) -> str:
+    """Pull shown strings out of a content stream, approximating layout with spaces/newlines"""
+    out = []
+    pending = []
+    in_array = False
+
+    for m in _PDF_TOKEN.finditer(content):
+        token = m.group()
+        first = token[:1]
+        if first in (b'(', b'<'):
+            pending.append(_pdf_string(token))
+        elif first == b'[':
+            in_array = True
+        elif first == b']':
+            in_array = False
+        elif first in b'-.0123456789':
+            # Large negative kerning inside TJ is how PDFs space words
+            if in_array and pending:
+                try:
+                    if float(token) < -250:
+                        pending.append(b' ')
+                except ValueError:
+                    pass
+        else:
+            if token in (b'Tj', b'TJ', b"'", b'"'):
+                if token in (b"'", b'"'):
+                    out.append(b'\n')
+                out.extend(pending)
+            elif token in (b'T*', b'ET'):
+                out.append(b'\n')
+            elif token in (b'Td', b'TD', b'Tm'):
+                out.append(b' ')
+            pending = []
+
+    return b''.join(out).decode('latin-1').strip()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    # Mixed-content ODF: text before, inside and after child elements
+    odt = io.BytesIO()
+    with zipfile.ZipFile(odt, 'w') as z:
+        z.writestr('mimetype', 'application/vnd.oasis.opendocument.text')
+        z.writestr('content.xml',
+                   '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+                   'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"><office:body><office:text>'
+                   '<text:p>SSN is <text:span>secret</text:span> 123-45-6789 for John</text:p>'
+                   '<text:p>Card<text:s/>4111 1111 1111 1111</text:p>'
+                   '</office:text></office:body></office:document-content>')
+    # OOXML: text only in leaf w:t elements
+    docx = io.BytesIO()
+    with zipfile.ZipFile(docx, 'w') as z:
+        z.writestr('word/document.xml',
+                   '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+                   '<w:p><w:r><w:t>Account </w:t></w:r><w:r><w:t>12345678</w:t></w:r></w:p>'
+                   '</w:body></w:document>')
+
+    for suffix, data, expected in [
+        ('.odt', odt, 'SSN is secret 123-45-6789 for John\nCard\t4111 1111 1111 1111\n\n'),
+        ('.docx', docx, 'Account 12345678\n\n'),
+    ]:
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data.getvalue())
+            extractor = TextExtractor(path)
+            text = ''.join(extractor)
+        finally:
+            os.remove(path)
+        print(f"{suffix:6} {extractor.format:5} {'OK' if text == expected else 'MISMATCH'} {text!r}")
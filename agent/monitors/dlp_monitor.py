@@ -5,82 +5,144 @@ Detects sensitive data patterns in clipboard, files, and screen text
 
 import re
 import threading
-import time
 from datetime import datetime
 from collections import deque
 
+try:
+    from .dlp_scanner import PatternScanner, ScanBudget, DEFAULT_LEAD, DEFAULT_TAIL
+    from .dlp_patterns import PatternCompiler, UnsafePatternError
+    from .dlp_cache import ScanResultCache, AppendTracker
+    from .dlp_workers import ScanWorkerPool
+    from .dlp_extractors import TextExtractor
+    from .dlp_edm import EDMIndex, EDMMatcher
+    from .dlp_fingerprint import FingerprintIndex, DocumentMatcher
+except ImportError:
+    from dlp_scanner import PatternScanner, ScanBudget, DEFAULT_LEAD, DEFAULT_TAIL
+    from dlp_patterns import PatternCompiler, UnsafePatternError
+    from dlp_cache import ScanResultCache, AppendTracker
+    from dlp_workers import ScanWorkerPool
+    from dlp_extractors import TextExtractor
+    from dlp_edm import EDMIndex, EDMMatcher
+    from dlp_fingerprint import FingerprintIndex, DocumentMatcher
+
 
 # Sensitive data patterns
+# Anchors: literals every match contains (case-insensitive). 'numeric' patterns only
+# match from a digit with no word char before it, and are scanned together in one pass.
+# lead/tail bound how far a match extends before/after its anchor (see dlp_scanner).
 PATTERNS = {
     'credit_card': {
-        'pattern': r'\b(?:4[0-9]{12}(?:[0-9]{3})?|5[1-5][0-9]{14}|3[47][0-9]{13}|6(?:011|5[0-9]{2})[0-9]{12})\b',
+        # Leading \b is written as a lookbehind after the first digit, so the regex
+        # engine can skip ahead to candidate digits (same matches as a leading \b).
+        # Numbers are also matched in groups split by single spaces or hyphens.
+        'pattern': r'(?:4(?<!\w4)[0-9]{12}(?:[0-9]{3})?|5(?<!\w5)[1-5][0-9]{14}|3(?<!\w3)[47][0-9]{13}|6(?<!\w6)(?:011|5[0-9]{2})[0-9]{12}'
+                   r'|(?:4(?<!\w4)[0-9]{3}|5(?<!\w5)[1-5][0-9]{2}|6(?<!\w6)(?:011|5[0-9]{2}))(?:(?: [0-9]{4}){3}|(?:-[0-9]{4}){3})'
+                   r'|3(?<!\w3)[47][0-9]{2}(?: [0-9]{6} [0-9]{5}|-[0-9]{6}-[0-9]{5}))\b',
         'description': 'Credit Card Number',
         'severity': 'critical',
+        'numeric': True,
+        'lead': 3,
+        'tail': 16,
     },
     'ssn': {
-        'pattern': r'\b(?!000|666|9\d{2})\d{3}-(?!00)\d{2}-(?!0000)\d{4}\b',
+        'pattern': r'\d\d{2}(?<!\w\d{3})(?<!000|666)(?<!9\d\d)-(?!00)\d{2}-(?!0000)\d{4}\b',
         'description': 'Social Security Number',
         'severity': 'critical',
+        'numeric': True,
+        'lead': 7,
+        'tail': 8,
     },
     'email': {
-        'pattern': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        # Local part bounded to its RFC 5321 length: an unbounded run is rescanned
+        # from every start position, which is quadratic on long dotted tokens
+        'pattern': r'\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
         'description': 'Email Address',
         'severity': 'low',
+        'anchors': ['@'],
+        'lead': 64,
+        'tail': 255,
     },
     'phone': {
         'pattern': r'\b(?:\+?1[-.\s]?)?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}\b',
         'description': 'Phone Number',
         'severity': 'low',
+        'numeric': True,
+        'lead': 6,
+        'tail': 18,
     },
     'ip_address': {
         'pattern': r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b',
         'description': 'IP Address',
         'severity': 'medium',
+        'numeric': True,
+        'lead': 12,
+        'tail': 15,
     },
     'aws_key': {
         'pattern': r'(?:A3T[A-Z0-9]|AKIA|AGPA|AROA|AIPA|ANPA|ANVA|ASIA)[A-Z0-9]{16}',
         'description': 'AWS Access Key',
         'severity': 'critical',
+        'anchors': ['A3T', 'AKIA', 'AGPA', 'AROA', 'AIPA', 'ANPA', 'ANVA', 'ASIA'],
+        'tail': 20,
     },
     'aws_secret': {
         'pattern': r'(?i)aws(.{0,20})?[\'"][0-9a-zA-Z\/+]{40}[\'"]',
         'description': 'AWS Secret Key',
         'severity': 'critical',
+        'anchors': ['aws'],
+        'tail': 70,
     },
     'private_key': {
         'pattern': r'-----BEGIN (?:RSA |DSA |EC |OPENSSH )?PRIVATE KEY-----',
         'description': 'Private Key',
         'severity': 'critical',
+        'anchors': ['-----BEGIN '],
+        'tail': 40,
     },
     'api_key': {
-        'pattern': r'(?i)(?:api[_-]?key|apikey|api_secret)[\'"\s:=]+[\'"]?[a-zA-Z0-9_\-]{20,}[\'"]?',
+        # Separator and value bounded so a match always fits in the scan overlap;
+        # a longer value still matches, cut at 256 chars
+        'pattern': r'(?i)(?:api[_-]?key|apikey|api_secret)[\'"\s:=]{1,16}[\'"]?[a-zA-Z0-9_\-]{20,256}[\'"]?',
         'description': 'API Key',
         'severity': 'high',
+        'anchors': ['api'],
+        'tail': 284,
     },
     'password_field': {
-        'pattern': r'(?i)(?:password|passwd|pwd)[\'"\s:=]+[\'"]?[^\s\'",]{6,}[\'"]?',
+        # Bounded like api_key; a longer value still matches, cut at 128 chars
+        'pattern': r'(?i)(?:password|passwd|pwd)[\'"\s:=]{1,16}[\'"]?[^\s\'",]{6,128}[\'"]?',
         'description': 'Password in Text',
         'severity': 'high',
+        'anchors': ['pass', 'pwd'],
+        'tail': 154,
     },
     'jwt_token': {
         'pattern': r'eyJ[A-Za-z0-9-_]+\.eyJ[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+',
         'description': 'JWT Token',
         'severity': 'high',
+        'anchors': ['eyJ'],
+        'tail': 4096,
     },
     'github_token': {
         'pattern': r'(?:ghp|gho|ghu|ghs|ghr)_[A-Za-z0-9_]{36,}',
         'description': 'GitHub Token',
         'severity': 'critical',
+        'anchors': ['ghp_', 'gho_', 'ghu_', 'ghs_', 'ghr_'],
     },
     'slack_token': {
         'pattern': r'xox[baprs]-[0-9]{10,13}-[0-9]{10,13}-[a-zA-Z0-9]{24}',
         'description': 'Slack Token',
         'severity': 'critical',
+        'anchors': ['xox'],
+        'tail': 64,
     },
     'bank_account': {
-        'pattern': r'\b[0-9]{8,17}\b',  # Basic pattern, often needs context
+        'pattern': r'[0-9](?<!\w[0-9])[0-9]{7,16}\b',  # Basic pattern, often needs context
         'description': 'Potential Bank Account',
         'severity': 'medium',
+        'numeric': True,
+        'lead': 3,
+        'tail': 0,
         'requires_context': True,  # Only flag if near banking keywords
     },
 }
@@ -93,28 +155,98 @@ CONTEXT_KEYWORDS = {
 }
 
 
+# File scanning: bytes read per chunk, bytes scanned per file, matches kept per
+# pattern per file (the scan goes on, so a noisy pattern can't hide the others)
+CHUNK_SIZE = 1024 * 1024
+MAX_FILE_BYTES = 256 * 1024 * 1024
+MAX_PATTERN_MATCHES = 100
+
+# Wall-clock seconds one text scan / one file scan may take before returning partial results
+SCAN_BUDGET = 2.0
+FILE_SCAN_BUDGET = 60.0
+
+# Files whose findings are remembered, so unchanged content isn't rescanned
+CACHE_SIZE = 2048
+
+# Chars kept before each chunk so lookbehinds and \b see the real preceding text
+LEFT_CONTEXT = 64
+
+# Exact Data Match: records alerted on individually per scan (more become one bulk
+# alert), and token hits kept per file for co-occurrence scoring
+MAX_EDM_ALERTS = 25
+MAX_EDM_HITS = 100000
+
+
 class DLPMonitor:
-    def __init__(self, on_alert_callback=None):
+    def __init__(self, on_alert_callback=None, max_file_bytes=MAX_FILE_BYTES,
+                 chunk_size=CHUNK_SIZE, max_pattern_matches=MAX_PATTERN_MATCHES,
+                 cache_size=CACHE_SIZE, worker_options=None, engine='re',
+                 scan_budget=SCAN_BUDGET, file_scan_budget=FILE_SCAN_BUDGET,
+                 edm_index_path=None, fingerprint_index_path=None):
         self.on_alert = on_alert_callback
+        self.max_file_bytes = max_file_bytes
+        self.chunk_size = chunk_size
+        self.max_pattern_matches = max_pattern_matches
+        self.scan_budget = scan_budget
+        self.file_scan_budget = file_scan_budget
+
+        # File findings by version and content; 0 disables
+        self.cache = ScanResultCache(cache_size, max_hash_bytes=max_file_bytes) if cache_size else None
+        # Files that only grew get just their new bytes scanned
+        self.appends = AppendTracker() if cache_size else None
+
+        # Off-thread file scanning, started on first scan_file_async
+        self.workers = None
+        self.worker_options = worker_options or {}
+        self.custom_patterns = []  # add_custom_pattern arguments, replayed in workers
         self.alerts = deque(maxlen=1000)
         self.lock = threading.Lock()
 
-        # Compile regex patterns
+        # Compile regex patterns, rejecting any that could backtrack catastrophically
+        # ('regex' engine: the optional regex module, whose matches can time out).
+        # Built-ins are trusted: a slow probe on a busy machine only warns.
+        self.compiler = PatternCompiler(engine)
         self.compiled_patterns = {}
         for name, config in PATTERNS.items():
             try:
                 self.compiled_patterns[name] = {
-                    'regex': re.compile(config['pattern']),
+                    'regex': self.compiler.compile(config['pattern'], name, trusted=True),
+                    'pattern': config['pattern'],
                     'description': config['description'],
                     'severity': config['severity'],
                     'requires_context': config.get('requires_context', False),
+                    'anchors': config.get('anchors'),
+                    'numeric': config.get('numeric', False),
+                    'lead': config.get('lead', DEFAULT_LEAD),
+                    'tail': config.get('tail', DEFAULT_TAIL),
                 }
             except re.error as e:
                 print(f"Invalid pattern for {name}: {e}")
+            except UnsafePatternError as e:
+                print(f"Unsafe pattern for {name}: {e}")
+
+        # Single-pass scanner, rebuilt when patterns change
+        self._scanner = None
+
+        # Exact Data Match against the server's index of customer records
+        self.edm = None
+        self.edm_index_path = None
+        if edm_index_path:
+            self.load_edm_index(edm_index_path)
+
+        # Fingerprints of registered confidential documents
+        self.fingerprints = None
+        self.fingerprint_index_path = None
+        if fingerprint_index_path:
+            self.load_fingerprint_index(fingerprint_index_path)
 
         # Statistics
         self.scan_count = 0
         self.alert_count = 0
+        self.bytes_scanned = 0
+        self.files_truncated = 0
+        self.matches_capped = 0
+        self.scans_timed_out = 0
 
     def scan_text(self, text, source='unknown', context=None):
         """
@@ -132,47 +264,117 @@ class DLPMonitor:
             return []
 
         self.scan_count += 1
-        found_alerts = []
 
-        # Check for context keywords
-        text_lower = text.lower()
-        has_financial_context = any(kw in text_lower for kw in CONTEXT_KEYWORDS['financial'])
-        has_credential_context = any(kw in text_lower for kw in CONTEXT_KEYWORDS['credentials'])
+        budget = ScanBudget(self.scan_budget)
+        matches, contexts = self.scanner.scan(text, skip=self._skip_pattern, budget=budget)
+        records = self.edm.match(text, budget=budget) if self.edm else []
+        documents = self.fingerprints.match_text(text) if self.fingerprints else []
+        extra = None
+        if budget.exhausted:
+            with self.lock:
+                self.scans_timed_out += 1
+            print(f"DLP: scan of {source} ran out of time, results are partial")
+            extra = {'truncated': True}
+        return self._report(matches, contexts, source, context, extra, records, documents)
 
-        for name, config in self.compiled_patterns.items():
-            # Skip patterns that require context if no context present
-            if config['requires_context']:
-                if name == 'bank_account' and not has_financial_context:
-                    continue
+    def _report(self, matches, contexts, source, context, extra=None, records=None, documents=None):
+        """Turn scanner matches into alerts, store them and notify"""
+        found_alerts = []
+        has_context = 'credentials' in contexts or 'financial' in contexts
+
+        for name, start, end, match in matches:
+            config = self.compiled_patterns[name]
+
+            # Mask the sensitive data
+            masked = self._mask_data(match, name)
+
+            alert = {
+                'timestamp': datetime.now().isoformat(),
+                'type': name,
+                'description': config['description'],
+                'severity': config['severity'],
+                'source': source,
+                'context': context,
+                'masked_value': masked,
+                'original_length': len(match),
+                'offset': start,
+            }
+            if extra:
+                alert.update(extra)
 
-            matches = config['regex'].findall(text)
+            # Increase severity based on context
+            if config['severity'] == 'medium' and has_context:
+                alert['severity'] = 'high'
 
-            for match in matches:
-                # Mask the sensitive data
-                if isinstance(match, tuple):
-                    match = match[0]
+            found_alerts.append(alert)
 
-                masked = self._mask_data(match, name)
+        if records:
+            found_alerts.extend(self._record_alerts(records, source, context, extra))
+        if documents:
+            found_alerts.extend(self._document_alerts(documents, source, context, extra))
 
-                alert = {
-                    'timestamp': datetime.now().isoformat(),
-                    'type': name,
-                    'description': config['description'],
-                    'severity': config['severity'],
-                    'source': source,
-                    'context': context,
-                    'masked_value': masked,
-                    'original_length': len(match),
-                }
+        self._publish(found_alerts)
+        return found_alerts
 
-                # Increase severity based on context
-                if config['severity'] == 'medium':
-                    if has_credential_context or has_financial_context:
-                        alert['severity'] = 'high'
+    def _record_alerts(self, records, source, context, extra=None):
+        """Alerts for EDM record matches; values stay masked as the matched field names"""
+        alerts = []
+        for record in records[:MAX_EDM_ALERTS]:
+            alerts.append({
+                'timestamp': datetime.now().isoformat(),
+                'type': 'edm_match',
+                'description': 'Customer Record Data',
+                'severity': 'critical',
+                'source': source,
+                'context': context,
+                'masked_value': '[' + ', '.join(record['fields']) + ']',
+                'original_length': record['end'] - record['start'],
+                'offset': record['start'],
+                'record': record['row'],
+                'fields': record['fields'],
+                'score': record['score'],
+            })
+        if len(records) > MAX_EDM_ALERTS:
+            alerts.append({
+                'timestamp': datetime.now().isoformat(),
+                'type': 'edm_bulk',
+                'description': 'Bulk Customer Record Data',
+                'severity': 'critical',
+                'source': source,
+                'context': context,
+                'masked_value': f'[{len(records)} records]',
+                'original_length': records[-1]['end'] - records[0]['start'],
+                'offset': records[0]['start'],
+                'records_matched': len(records),
+            })
+        if extra:
+            for alert in alerts:
+                alert.update(extra)
+        return alerts
 
-                found_alerts.append(alert)
+    def _document_alerts(self, documents, source, context, extra=None):
+        """Alerts for text matching registered confidential documents"""
+        alerts = []
+        for document in documents:
+            alert = {
+                'timestamp': datetime.now().isoformat(),
+                'type': 'document_match',
+                'description': 'Confidential Document Content',
+                'severity': document['severity'],
+                'source': source,
+                'context': context,
+                'masked_value': document['name'],
+                'document': document['name'],
+                'containment': document['containment'],
+                'coverage': document['coverage'],
+            }
+            if extra:
+                alert.update(extra)
+            alerts.append(alert)
+        return alerts
 
-        # Store alerts
+    def _publish(self, found_alerts):
+        """Store alerts and notify"""
         if found_alerts:
             with self.lock:
                 for alert in found_alerts:
@@ -182,7 +384,83 @@ class DLPMonitor:
                     if self.on_alert:
                         self.on_alert(alert)
 
-        return found_alerts
+    @property
+    def scanner(self):
+        """Single-pass scanner over the current pattern set"""
+        if self._scanner is None:
+            self._scanner = PatternScanner(
+                self.compiled_patterns, CONTEXT_KEYWORDS,
+                lambda pattern: self.compiler.compile(pattern, 'numeric patterns', trusted=True))
+        return self._scanner
+
+    def load_edm_index(self, path):
+        """
+        Load an Exact Data Match index (see dlp_edm), replacing the current one
+
+        Returns:
+            True if loaded; on failure the current index is kept
+        """
+        try:
+            matcher = EDMMatcher(EDMIndex.load(path))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading EDM index {path}: {e}")
+            return False
+
+        self.edm = matcher
+        self.edm_index_path = path
+        self._detection_changed()
+        return True
+
+    def clear_edm_index(self):
+        """Stop Exact Data Matching"""
+        if self.edm:
+            self.edm = None
+            self.edm_index_path = None
+            self._detection_changed()
+
+    def load_fingerprint_index(self, path):
+        """
+        Load a document fingerprint index (see dlp_fingerprint), replacing the current one
+
+        Returns:
+            True if loaded; on failure the current index is kept
+        """
+        try:
+            matcher = DocumentMatcher(FingerprintIndex.load(path))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading fingerprint index {path}: {e}")
+            return False
+
+        self.fingerprints = matcher
+        self.fingerprint_index_path = path
+        self._detection_changed()
+        return True
+
+    def clear_fingerprint_index(self):
+        """Stop document fingerprint matching"""
+        if self.fingerprints:
+            self.fingerprints = None
+            self.fingerprint_index_path = None
+            self._detection_changed()
+
+    def _detection_changed(self):
+        """Forget findings made with the previous patterns or index"""
+        if self.cache:
+            self.cache.clear()
+            self.appends.clear()
+        if self.workers:
+            self.workers.reset()
+
+    def _overlap(self):
+        """Chars the longest match or EDM token can span"""
+        return max(self.scanner.max_span, self.edm.max_token if self.edm else 0)
+
+    def _skip_pattern(self, name, contexts):
+        """Skip patterns that require context if no context present"""
+        if self.compiled_patterns[name]['requires_context']:
+            if name == 'bank_account' and 'financial' not in contexts:
+                return True
+        return False
 
     def _mask_data(self, data, data_type):
         """Mask sensitive data for logging"""
@@ -225,24 +503,243 @@ class DLPMonitor:
             return '*' * length
 
     def scan_file(self, filepath):
-        """Scan a file for sensitive data"""
+        """
+        Scan a file for sensitive data
+
+        The file is read as a stream of chunks, so memory stays constant
+        regardless of file size. Only the first max_file_bytes are scanned.
+        Content already scanned is answered from the cache: unchanged content
+        at the same path is not alerted on again, while the same content at a
+        new path is alerted on without rescanning. A text file that was only
+        appended to has just its new bytes scanned.
+        """
         try:
-            # Check file size (skip very large files)
-            import os
-            size = os.path.getsize(filepath)
-            if size > 10 * 1024 * 1024:  # 10MB limit
-                return []
-
-            # Read file
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-
-            return self.scan_text(content, source=f'file:{filepath}')
-
+            alerts, token, resume = self._cached_result(filepath)
+            if alerts is not None:
+                return alerts
+            result = self._scan_stream(filepath, resume=resume)
         except Exception as e:
             print(f"Error scanning file {filepath}: {e}")
             return []
 
+        return self._finish_scan(filepath, token, *result)
+
+    def scan_file_async(self, filepath, sensitive=False, callback=None):
+        """
+        Queue a file scan on the worker pool and return immediately
+
+        Args:
+            sensitive: Scan ahead of ordinary files
+            callback: Optional callable(filepath, alerts) run when the scan is done
+        """
+        if self.workers is None:
+            self.workers = ScanWorkerPool(self, **self.worker_options)
+        self.workers.submit(filepath, sensitive=sensitive, callback=callback)
+
+    def _cached_result(self, filepath):
+        """
+        Answer a file scan from the cache if possible
+
+        The stat-only version check runs first, then the append check, and
+        only then the content hash, so a growing file is never read in full.
+
+        Returns:
+            (alerts or None on a miss, cache token for _finish_scan,
+             resume point for _scan_stream or None for a full scan)
+        """
+        if self.cache is None:
+            return None, None, None
+
+        findings, token, seen_here = self.cache.lookup(filepath, content=False)
+        if findings is None:
+            resume = self.appends.resume_point(filepath, self._append_overlap())
+            if resume and resume.get('unchanged'):
+                return [], None, None
+            if resume:
+                return None, None, resume
+            findings, token, seen_here = self.cache.lookup(filepath)
+        if findings is None:
+            return None, token, None
+
+        alerts = [{**f, 'timestamp': datetime.now().isoformat(), 'source': f'file:{filepath}',
+                   'context': None, 'cached': True} for f in findings]
+        if not seen_here:
+            self._publish(alerts)
+        return alerts, token, None
+
+    def _append_overlap(self):
+        """Bytes rescanned before the old end of a grown file"""
+        # A match can span _overlap() chars of up to 4 UTF-8 bytes each
+        return 4 * (self._overlap() + LEFT_CONTEXT)
+
+    def _finish_scan(self, filepath, token, matches, contexts, info):
+        """Alert on a finished stream scan and cache its findings"""
+        with self.lock:
+            self.scan_count += 1
+            self.bytes_scanned += info['bytes_scanned']
+            if info['truncated']:
+                self.files_truncated += 1
+            self.matches_capped += info.get('capped', 0)
+            if info.get('timed_out'):
+                self.scans_timed_out += 1
+
+        # Context is judged over the whole file, as for a single text scan
+        matches = [m for m in matches if not self._skip_pattern(m[0], contexts)]
+        extra = {'truncated': True} if info['truncated'] else None
+        if info.get('bomb'):
+            print(f"DLP: {filepath} looks like a decompression bomb, scanned partially")
+        alerts = self._report(matches, contexts, f'file:{filepath}', None, extra,
+                              info.get('records'), info.get('documents'))
+
+        if self.appends:
+            # Match-capped scans still read to the end, so they can be resumed;
+            # only a byte-limit or time-budget cut forces the next full scan
+            if info['format'] == 'text' and not info['truncated']:
+                self.appends.update(filepath, info['start_byte'] + info['bytes_scanned'],
+                                    info['chars'], contexts, info['last_end'], info['kept'])
+            else:
+                self.appends.forget(filepath)
+
+        if token is not None:
+            # Masked fields only; the per-scan ones are filled in on a hit
+            self.cache.store(filepath, token, [
+                {k: v for k, v in alert.items() if k not in ('timestamp', 'source', 'context')}
+                for alert in alerts
+            ])
+        return alerts
+
+    def worker_settings(self):
+        """Settings a worker process needs to scan like this monitor"""
+        return {
+            'max_file_bytes': self.max_file_bytes,
+            'chunk_size': self.chunk_size,
+            'max_pattern_matches': self.max_pattern_matches,
+            'engine': self.compiler.engine,
+            'scan_budget': self.scan_budget,
+            'file_scan_budget': self.file_scan_budget,
+            'edm_index_path': self.edm_index_path,
+            'fingerprint_index_path': self.fingerprint_index_path,
+        }
+
+    def stop(self):
+        """Stop the scan workers"""
+        if self.workers:
+            self.workers.stop()
+
+    def _scan_stream(self, filepath, deadline=None, resume=None):
+        """
+        Scan a file's text in overlapping chunks
+
+        Text comes from TextExtractor, so Office documents, ZIP archives and
+        PDFs are scanned by their content rather than their raw bytes. Each
+        round scans the buffer and reports matches that start before the last
+        `overlap` chars. Those chars (plus a little left context for
+        lookbehinds and word boundaries) carry over into the next round, so a
+        match split across chunks is still found whole. Offsets are character
+        offsets into the extracted text. Each pattern keeps at most
+        max_pattern_matches matches (the rest are only counted, info['capped']),
+        but scanning goes on to the end of the file; it stops early (truncated)
+        only at max_file_bytes or once the optional deadline (epoch seconds) or
+        file_scan_budget runs out.
+
+        With a resume point from AppendTracker, reading starts just before the
+        old end of a grown text file. Its contexts and per-pattern match ends
+        are carried over, so only matches past what was already reported come
+        back, at their offsets in the whole file, and each pattern's cap counts
+        the matches it kept before.
+
+        With an EDM index loaded, each round's tokens are also looked up, and
+        the hits are scored into record matches (info['records']) at the end.
+        Hits from before a resume point are not kept, so a record split
+        across an append boundary can be missed. Likewise the text is fed to
+        a document fingerprinter round by round and matched at the end
+        (info['documents']); after a resume, only the appended text counts.
+
+        Returns:
+            (matches as (name, offset, end, value), contexts found, info dict)
+        """
+        scanner = self.scanner
+        edm = self.edm
+        fingerprinter = self.fingerprints.fingerprinter() if self.fingerprints else None
+        overlap = self._overlap()
+        budget = ScanBudget(self.file_scan_budget, deadline)
+        start_byte = resume['byte'] if resume else 0
+        extractor = TextExtractor(filepath, max_bytes=self.max_file_bytes,
+                                  chunk_size=self.chunk_size, deadline=budget.deadline,
+                                  offset=start_byte)
+        chunks = iter(extractor)
+
+        buffer = ''
+        base = resume['char'] if resume else 0  # absolute offset of buffer[0]
+        # matches before this were reported by an earlier round (or scan)
+        report_from = base + LEFT_CONTEXT if start_byte else base
+        # pattern -> end of its last match, to keep findall's non-overlap
+        last_end = dict(resume['last_end']) if resume else {}
+        matches = []
+        kept = dict(resume['kept']) if resume else {}  # pattern -> matches kept
+        capped = 0
+        edm_hits = []
+        contexts = set(resume['contexts']) if resume else set()
+        truncated = False
+
+        try:
+            while True:
+                text = next(chunks, None)
+                final = text is None
+                if not final:
+                    buffer += text
+                    if len(buffer) - (report_from - base) < overlap + self.chunk_size // 2:
+                        continue  # Collect more before scanning, so rounds stay chunk-sized
+
+                cut = len(buffer) if final else len(buffer) - overlap
+                found, ctx = scanner.scan(buffer, report_from - base, budget=budget)
+                contexts |= ctx
+
+                for name, start, end, value in found:
+                    if start >= cut or start + base < last_end.get(name, 0):
+                        continue
+                    last_end[name] = end + base
+                    if kept.get(name, 0) >= self.max_pattern_matches:
+                        capped += 1
+                        continue
+                    kept[name] = kept.get(name, 0) + 1
+                    matches.append((name, start + base, end + base, value))
+
+                if edm and len(edm_hits) < MAX_EDM_HITS:
+                    for start, end, field, row in edm.find(buffer, report_from - base, budget=budget):
+                        if start < cut:
+                            edm_hits.append((start + base, end + base, field, row))
+
+                if fingerprinter:
+                    fingerprinter.feed(buffer[report_from - base:cut])
+
+                if final or budget.expired():
+                    truncated = not final or budget.exhausted
+                    break
+
+                # Carry the overlap and some left context into the next round
+                keep = max(cut - LEFT_CONTEXT, 0)
+                buffer = buffer[keep:]
+                base += keep
+                report_from = base + (cut - keep)
+        finally:
+            chunks.close()
+
+        return matches, contexts, {
+            'bytes_scanned': extractor.bytes_read,
+            'capped': capped,
+            'kept': kept,
+            'truncated': truncated or extractor.truncated,
+            'format': extractor.format,
+            'bomb': extractor.bomb,
+            'timed_out': budget.exhausted,
+            'start_byte': start_byte,
+            'chars': base + len(buffer),
+            'last_end': last_end,
+            'records': edm.score(edm_hits) if edm else [],
+            'documents': self.fingerprints.match(fingerprinter) if fingerprinter else [],
+        }
+
     def get_alerts(self, clear=False, severity_filter=None):
         """Get DLP alerts"""
         with self.lock:
@@ -272,22 +769,55 @@ class DLPMonitor:
         return {
             'total_scans': self.scan_count,
             'total_alerts': self.alert_count,
+            'bytes_scanned': self.bytes_scanned,
+            'files_truncated': self.files_truncated,
+            'matches_capped': self.matches_capped,
+            'scans_timed_out': self.scans_timed_out,
+            'appends': self.appends.get_stats() if self.appends else None,
+            'cache': self.cache.get_stats() if self.cache else None,
+            'workers': self.workers.get_stats() if self.workers else None,
+            'patterns': self.compiler.get_stats(),
+            'patterns_omitted': sorted(set(PATTERNS) - set(self.compiled_patterns)),
+            'edm': self.edm.index.get_stats() if self.edm else None,
+            'fingerprints': self.fingerprints.index.get_stats() if self.fingerprints else None,
             'alerts_by_severity': severity_counts
         }
 
-    def add_custom_pattern(self, name, pattern, description, severity='medium'):
-        """Add a custom detection pattern"""
+    def add_custom_pattern(self, name, pattern, description, severity='medium', anchors=None):
+        """
+        Add a custom detection pattern
+
+        Args:
+            anchors: Optional literals every match contains; without them the
+                pattern is scanned over the full text
+
+        Patterns that could backtrack catastrophically are rejected (see PatternCompiler).
+        """
         try:
             self.compiled_patterns[name] = {
-                'regex': re.compile(pattern),
+                'regex': self.compiler.compile(pattern, name),
+                'pattern': pattern,
                 'description': description,
                 'severity': severity,
                 'requires_context': False,
+                'anchors': anchors,
+                'numeric': False,
+                'lead': DEFAULT_LEAD,
+                'tail': DEFAULT_TAIL,
             }
+            self._scanner = None
+            self.custom_patterns.append({
+                'name': name, 'pattern': pattern, 'description': description,
+                'severity': severity, 'anchors': anchors,
+            })
+            self._detection_changed()
             return True
         except re.error as e:
             print(f"Invalid pattern: {e}")
             return False
+        except UnsafePatternError as e:
+            print(f"Rejected unsafe pattern {name}: {e}")
+            return False
 
 
 # Convenience function for one-off scans
@@ -0,0 +1,426 @@
+"""
+DLP Pattern Compiler - Guards DLP regexes against catastrophic backtracking
+Patterns are checked for nested and ambiguous repeats, rewritten where a
+cheaper form matches the same text, and timed against adversarial input
+before they are used
+"""
+
+import re
+import time
+from typing import Dict, List, Optional
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants, _compiler as sre_compile
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+    import sre_compile
+
+try:
+    import regex  # Optional: supports match timeouts
+except ImportError:
+    regex = None
+
+
+REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+CHAR_OPS = {sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.ANY, sre_constants.IN}
+ZERO_WIDTH = {sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT,
+              sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS}
+UNBOUNDED = sre_constants.MAXREPEAT
+
+# Repeats allowing more than this many iterations count as "large" for the
+# overlapping-alternatives check; any repeat of 2+ counts for nested repeats
+SMALL_REPEAT = 16
+
+# Chars used to compare character sets (Latin, punctuation and common separators)
+ALPHABET = [chr(c) for c in range(0x250)] + list('  　０٣')
+
+# Input repeated to build adversarial probes, besides pieces of the pattern itself
+GENERIC_PUMPS = ['a', '0', ' ', 'a.', 'a0', '-', '"', "'", '=', 'A', '\t', '@a']
+
+# Probe lengths; each probe must stay under the budget at every length
+PROBE_SIZES = (16, 256, 4096)
+PROBE_BUDGET = 0.025
+
+# Going 16x longer may cost at most this much more (linear is 16x, quadratic 256x),
+# once the longer probe takes measurable time
+MAX_GROWTH = 64
+GROWTH_FLOOR = 0.002
+
+# (engine, source) -> compiled pattern, so monitors and workers don't re-time patterns
+_compiled_cache = {}
+
+
+class UnsafePatternError(ValueError):
+    """Raised when a pattern could backtrack catastrophically"""
+
+
+class PatternCompiler:
+    """
+    Compiles DLP regexes that are safe to run on untrusted text
+
+    1. The pattern is parsed and rejected if it nests a variable repeat that
+       can span a whole outer repeat (e.g. (a+)+, (\\w+\\s?)*), or repeats
+       alternatives that can start with the same char (e.g. (a|ab)*).
+    2. With the re engine, redundant pieces that only add backtracking are
+       dropped: an optional around a repeat that already allows zero, e.g.
+       (.{0,20})?, and an optional next to an unbounded repeat of the same
+       chars, e.g. ['"\\s:=]+['"]?. Matches are unchanged.
+    3. The compiled pattern is timed on adversarial probes built from its own
+       prefixes and repeated pieces, and rejected if a probe exceeds the
+       budget or its cost grows faster than linearly. Timing depends on how
+       busy the machine is, so trusted (built-in) patterns only get a
+       warning here; step 1 still rejects them.
+
+    Args:
+        engine: 're', or 'regex' to compile with the optional regex module,
+            whose matches can be given a timeout
+        probe_budget: Seconds any single probe may take
+    """
+
+    def __init__(self, engine: str = 're', probe_budget: float = PROBE_BUDGET):
+        if engine == 'regex' and regex is None:
+            print("DLP: regex module not installed, using re")
+            engine = 're'
+        self.engine = engine
+        self.probe_budget = probe_budget
+
+        self.report = {}  # name -> {'rewrites': [...], 'worst_ms': float, 'probe': str}
+        self.rejected = {}  # name -> reason
+        self.warnings = {}  # name -> timing problem of a trusted pattern that was kept
+
+    def compile(self, pattern: str, name: Optional[str] = None, trusted: bool = False):
+        """
+        Check, rewrite and benchmark a pattern
+
+        Args:
+            trusted: Keep the pattern if only the timing check fails (for
+                built-in patterns, which the structural check covers)
+
+        Returns:
+            Compiled pattern (re or regex), with finditer(text, pos, endpos)
+
+        Raises:
+            re.error: Invalid pattern
+            UnsafePatternError: Pattern could backtrack catastrophically
+        """
+        name = name or pattern
+        key = (self.engine, pattern, self.probe_budget, trusted)
+        cached = _compiled_cache.get(key)
+        if cached is not None:
+            self.report[name] = cached[1]
+            if cached[1].get('warning'):
+                self.warnings[name] = cached[1]['warning']
+            return cached[0]
+
+        try:
+            tree = sre_parse.parse(pattern)
+            problem = self._analyze(tree.data, tree.state)
+            if problem:
+                raise UnsafePatternError(problem)
+
+            rewrites = []
+            if self.engine == 'regex':
+                compiled = regex.compile(pattern, regex.V0)
+            else:
+                self._rewrite(tree.data, tree.state, rewrites)
+                compiled = sre_compile.compile(tree, 0) if rewrites else re.compile(pattern)
+
+            worst, probe, warning = self._benchmark(compiled, tree, strict=not trusted)
+        except UnsafePatternError as e:
+            self.rejected[name] = str(e)
+            raise
+
+        info = {'rewrites': rewrites, 'worst_ms': round(worst * 1000, 3), 'probe': probe}
+        if warning:
+            info['warning'] = warning
+            self.warnings[name] = warning
+            print(f"DLP: pattern {name} was slow on probes, kept as trusted: {warning}")
+        self.report[name] = info
+        _compiled_cache[key] = (compiled, info)
+        return compiled
+
+    # -- static analysis --
+
+    def _analyze(self, items, state) -> Optional[str]:
+        """First catastrophic construct found, or None"""
+        for op, av in items:
+            if op in REPEATS:
+                lo, hi, body = av
+                if hi >= 2:
+                    if self._spans(body.data):
+                        return 'nested repeat can match the whole of its enclosing repeat'
+                    if hi > SMALL_REPEAT and self._overlapping_branches(body.data, state):
+                        return 'repeated alternatives can start with the same character'
+                problem = self._analyze(body.data, state)
+            elif op == sre_constants.SUBPATTERN:
+                problem = self._analyze(av[-1].data, state)
+            elif op == sre_constants.BRANCH:
+                problem = next(filter(None, (self._analyze(b.data, state) for b in av[1])), None)
+            elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+                problem = self._analyze(av[1].data, state)
+            elif op == sre_constants.GROUPREF_EXISTS:
+                problem = next(filter(None, (self._analyze(b.data, state)
+                                             for b in av[1:] if b is not None)), None)
+            else:
+                problem = None
+            if problem:
+                return problem
+        return None
+
+    def _nullable(self, items) -> bool:
+        """Can this sequence match the empty string?"""
+        for op, av in items:
+            if op in ZERO_WIDTH:
+                continue
+            if op in REPEATS:
+                if av[0] > 0 and not self._nullable(av[2].data):
+                    return False
+            elif op == sre_constants.SUBPATTERN:
+                if not self._nullable(av[-1].data):
+                    return False
+            elif op == getattr(sre_constants, 'ATOMIC_GROUP', None):
+                if not self._nullable(av.data):
+                    return False
+            elif op == sre_constants.BRANCH:
+                if not any(self._nullable(b.data) for b in av[1]):
+                    return False
+            else:
+                return False
+        return True
+
+    def _spans(self, items) -> bool:
+        """Does a variable repeat in this sequence cover it, the rest being optional?"""
+        for i, (op, av) in enumerate(items):
+            if op in REPEATS and av[1] != av[0] and av[1] >= 2:
+                inner = True
+            elif op == sre_constants.SUBPATTERN:
+                inner = self._spans(av[-1].data)
+            elif op == sre_constants.BRANCH:
+                inner = any(self._spans(b.data) for b in av[1])
+            else:
+                inner = False
+            if inner and self._nullable(items[:i]) and self._nullable(items[i + 1:]):
+                return True
+        return False
+
+    def _overlapping_branches(self, items, state) -> bool:
+        """Does an alternation in this sequence have branches sharing a first char?"""
+        for op, av in items:
+            if op == sre_constants.SUBPATTERN:
+                if self._overlapping_branches(av[-1].data, state):
+                    return True
+            elif op == sre_constants.BRANCH:
+                seen = set()
+                for branch in av[1]:
+                    first = self._first_chars(branch.data, state)
+                    if seen & first:
+                        return True
+                    seen |= first
+        return False
+
+    def _first_chars(self, items, state) -> set:
+        """Chars (from ALPHABET) a match of this sequence can start with"""
+        chars = set()
+        for op, av in items:
+            if op in ZERO_WIDTH:
+                continue
+            if op in CHAR_OPS:
+                return chars | self._char_set((op, av), state)
+            if op in REPEATS:
+                chars |= self._first_chars(av[2].data, state)
+                if av[0] > 0 and not self._nullable(av[2].data):
+                    return chars
+            elif op == sre_constants.SUBPATTERN:
+                chars |= self._first_chars(av[-1].data, state)
+                if not self._nullable(av[-1].data):
+                    return chars
+            elif op == sre_constants.BRANCH:
+                for branch in av[1]:
+                    chars |= self._first_chars(branch.data, state)
+                if not self._nullable([(op, av)]):
+                    return chars
+            else:
+                return set(ALPHABET)
+        return chars
+
+    @staticmethod
+    def _char_set(item, state) -> frozenset:
+        """Chars (from ALPHABET) a single-char item matches"""
+        matcher = sre_compile.compile(sre_parse.SubPattern(state, [item]), 0)
+        return frozenset(ch for ch in ALPHABET if matcher.fullmatch(ch))
+
+    # -- rewriting (re engine) --
+
+    def _rewrite(self, items, state, rewrites: List[str]):
+        """Drop pieces that add backtracking but can't change a match, in place"""
+        i = 0
+        while i < len(items):
+            op, av = items[i]
+            if op in REPEATS and av[0] == 0 and av[1] == 1 and self._nullable(av[2].data):
+                # (X)? where X already matches empty: the ? only doubles the paths
+                items[i:i + 1] = av[2].data
+                rewrites.append('optional around a repeat that allows zero')
+                continue
+            if op in REPEATS:
+                self._rewrite(av[2].data, state, rewrites)
+            elif op == sre_constants.SUBPATTERN:
+                self._rewrite(av[-1].data, state, rewrites)
+            elif op == sre_constants.BRANCH:
+                for branch in av[1]:
+                    self._rewrite(branch.data, state, rewrites)
+            i += 1
+
+        i = 0
+        while i + 1 < len(items):
+            # X+ Y? / Y? X+ with Y's chars among X's: Y is absorbed by X
+            for keep, drop in ((i, i + 1), (i + 1, i)):
+                if self._absorbs(items[keep], items[drop], state):
+                    del items[drop]
+                    rewrites.append('optional next to an unbounded repeat of the same chars')
+                    break
+            else:
+                i += 1
+
+    def _absorbs(self, big, small, state) -> bool:
+        if big[0] != sre_constants.MAX_REPEAT or small[0] != sre_constants.MAX_REPEAT:
+            return False
+        (_, big_hi, big_body), (small_lo, _, small_body) = big[1], small[1]
+        if big_hi != UNBOUNDED or small_lo != 0:
+            return False
+        if len(big_body.data) != 1 or len(small_body.data) != 1:
+            return False
+        if big_body.data[0][0] not in CHAR_OPS or small_body.data[0][0] not in CHAR_OPS:
+            return False
+        return self._char_set(small_body.data[0], state) <= self._char_set(big_body.data[0], state)
+
+    # -- benchmarking --
+
+    def _example(self, items) -> str:
+        """A short string shaped like the sequence (not necessarily matching)"""
+        out = []
+        for op, av in items:
+            if op == sre_constants.LITERAL:
+                out.append(chr(av))
+            elif op in CHAR_OPS:
+                out.append(self._sample_char((op, av)))
+            elif op in REPEATS:
+                out.append(self._example(av[2].data) * max(av[0], 1))
+            elif op == sre_constants.SUBPATTERN:
+                out.append(self._example(av[-1].data))
+            elif op == sre_constants.BRANCH:
+                out.append(self._example(av[1][0].data))
+        return ''.join(out)
+
+    @staticmethod
+    def _sample_char(item) -> str:
+        op, av = item
+        if op == sre_constants.NOT_LITERAL or op == sre_constants.ANY:
+            return 'a' if av != ord('a') else 'b'
+        for ch in 'a0A .-_@"\'=:/+':
+            if sre_compile.compile(sre_parse.SubPattern(sre_parse.State(), [item]), 0).fullmatch(ch):
+                return ch
+        return 'a'
+
+    def _pumps(self, items, prefix: str, out: set):
+        """(prefix, repeated piece) pairs for every repeat in the pattern"""
+        for i, (op, av) in enumerate(items):
+            before = prefix + self._example(items[:i])
+            if op in REPEATS:
+                piece = self._example(av[2].data)
+                if piece:
+                    out.add((before, piece))
+                self._pumps(av[2].data, before, out)
+            elif op == sre_constants.SUBPATTERN:
+                self._pumps(av[-1].data, before, out)
+            elif op == sre_constants.BRANCH:
+                for branch in av[1]:
+                    self._pumps(branch.data, before, out)
+
+    def _benchmark(self, compiled, tree, strict: bool = True):
+        """
+        Time the pattern on adversarial probes
+
+        Args:
+            strict: Raise UnsafePatternError on a slow probe; otherwise stop
+                timing and return the problem
+
+        Returns:
+            (worst seconds, probe, problem or None)
+        """
+        pumps = set()
+        self._pumps(tree.data, '', pumps)
+        lead = self._example(tree.data[:1])
+        for piece in GENERIC_PUMPS:
+            pumps.add(('', piece))
+            pumps.add((lead, piece))
+
+        worst, worst_probe = 0.0, ''
+        for prefix, piece in sorted(pumps):
+            previous = None
+            for size in PROBE_SIZES:
+                probe = prefix + piece * max(size // len(piece), 1) + '\x00'
+                problem = None
+                try:
+                    elapsed = self._time(compiled, probe)
+                    if self._too_slow(elapsed, previous):
+                        # Re-time before rejecting, so a scheduling hiccup doesn't count
+                        elapsed = min(elapsed, self._time(compiled, probe), self._time(compiled, probe))
+                except UnsafePatternError as e:
+                    elapsed, problem = self.probe_budget, str(e)
+
+                if problem is None and elapsed > self.probe_budget:
+                    problem = f'probe {probe[:24]!r}... took {elapsed * 1000:.0f}ms at {size} chars'
+                elif problem is None and self._too_slow(elapsed, previous):
+                    problem = f'probe {probe[:24]!r}... grows faster than linearly'
+                if elapsed > worst:
+                    worst, worst_probe = elapsed, prefix + piece
+                if problem:
+                    if strict:
+                        raise UnsafePatternError(problem)
+                    return worst, worst_probe, problem
+                previous = elapsed
+        return worst, worst_probe, None
+
+    def _time(self, compiled, probe: str) -> float:
+        """Seconds to find all matches in probe"""
+        started = time.perf_counter()
+        try:
+            if self.engine == 'regex':
+                for _ in compiled.finditer(probe, timeout=self.probe_budget):
+                    pass
+            else:
+                for _ in compiled.finditer(probe):
+                    pass
+        except TimeoutError:
+            raise UnsafePatternError(f'probe {probe[:24]!r}... timed out')
+        return time.perf_counter() - started
+
+    def _too_slow(self, elapsed: float, previous: Optional[float]) -> bool:
+        if elapsed > self.probe_budget:
+            return True
+        return previous is not None and elapsed > GROWTH_FLOOR and elapsed > previous * MAX_GROWTH
+
+    def get_stats(self) -> Dict:
+        """Get compiler statistics"""
+        slowest = max(self.report.items(), key=lambda kv: kv[1]['worst_ms'], default=(None, None))
+        return {
+            'engine': self.engine,
+            'compiled': len(self.report),
+            'rewritten': sum(1 for info in self.report.values() if info['rewrites']),
+            'rejected': dict(self.rejected),
+            'warnings': dict(self.warnings),
+            'slowest': {'name': slowest[0], 'worst_ms': slowest[1]['worst_ms']} if slowest[1] else None,
+        }
+
+
+if __name__ == "__main__":
+    compiler = PatternCompiler()
+    for source in [r'(?i)aws(.{0,20})?[\'"][0-9a-zA-Z\/+]{40}[\'"]',
+                   r'(?:password|pwd)[\'"\s:=]{1,16}[\'"]?[^\s\'",]{6,128}',
+                   r'(a+)+b', r'(\w+\s?)*$', r'(a|ab)*c', r'x\d+y']:
+        try:
+            compiler.compile(source)
+            print(f"OK       {source}  {compiler.report[source]}")
+        except UnsafePatternError as e:
+            print(f"REJECTED {source}  ({e})")
@@ -0,0 +1,420 @@
+"""
+DLP Scanner - Single-pass multi-pattern scanning engine
+One combined anchor pass locates literal prefixes and context keywords; the full
+pattern regexes then run only over the regions around those anchors. Numeric
+patterns (card, SSN, phone, IP, account) run together as one alternation.
+"""
+
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+# Numeric patterns only match from a digit with no word char before it; this
+# guard lets the combined alternation skip every other position cheaply
+NUMERIC_GUARD = r'(?=[0-9])(?<!\w)'
+
+_DIGITS = re.compile(r'[0-9]+')
+
+# How far a match can extend past its anchor when the pattern doesn't say
+DEFAULT_LEAD = 0
+DEFAULT_TAIL = 512
+
+# Windows closer than this are scanned as one region (one regex call instead of two)
+CLUSTER_GAP = 256
+
+# Text up to this size is scanned in full for any pattern with an anchor hit
+SMALL_TEXT = 4096
+
+# Above one anchor per this many chars a pattern is scanned in full
+DENSE_SPACING = 64
+
+# Windows are widened to whole whitespace-delimited tokens, up to this many chars
+TOKEN_LIMIT = 256
+
+_TOKEN_END = re.compile(r'\S{0,%d}' % TOKEN_LIMIT)
+
+
+class ScanBudget:
+    """
+    Wall-clock budget for one scan
+
+    Checked between patterns, regions and matches; patterns compiled with
+    the regex module also get the remaining time as a match timeout. Once
+    it runs out, exhausted is set and the scan returns what it has.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, deadline: Optional[float] = None):
+        if seconds is not None:
+            until = time.time() + seconds
+            deadline = until if deadline is None else min(deadline, until)
+        self.deadline = deadline  # epoch seconds, or None for no limit
+        self.exhausted = False
+
+    def expired(self) -> bool:
+        if not self.exhausted and self.deadline is not None and time.time() > self.deadline:
+            self.exhausted = True
+        return self.exhausted
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.time(), 0.0)
+
+
+def _finditer(regex, text: str, pos: int, endpos: int, budget: Optional[ScanBudget]):
+    """regex.finditer that stops early once the budget runs out"""
+    if budget is None:
+        yield from regex.finditer(text, pos, endpos)
+        return
+    if isinstance(regex, re.Pattern):
+        for m in regex.finditer(text, pos, endpos):
+            yield m
+            if budget.expired():
+                return
+        return
+    try:
+        # regex module: the match itself is interrupted
+        yield from regex.finditer(text, pos, endpos, timeout=budget.remaining())
+    except TimeoutError:
+        budget.exhausted = True
+
+
+def _trie_regex(literals):
+    """
+    Build a compact alternation from literals, sharing common prefixes
+
+    The top level is left as a bare alternation whose branches each start with
+    a literal character, which the regex engine can use to skip ahead.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for ch in literal:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        optional = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if optional:
+            # Longer literals first; the shorter one still matches if they fail
+            body = '(?:' + body + ')?'
+        return body
+
+    return '|'.join(re.escape(ch) + build(child) for ch, child in sorted(trie.items()) if ch)
+
+
+class PatternScanner:
+    """
+    Scans text for all DLP patterns and context keywords
+
+    One regex pass over the lowercased text finds every anchor: literal
+    prefixes and context keywords. The anchor regex is a plain alternation of
+    literals, so the regex engine can skip ahead on the first character
+    instead of trying every alternative at every position. Each pattern's own
+    regex then runs only over merged windows around its anchors, and patterns
+    with no anchors in the text are never run.
+
+    Digit anchors would fire on nearly every character of CSV files and logs,
+    so numeric patterns are not in the anchor pass. They run as one
+    named-group alternation instead, over windows around digit runs where
+    those are sparse, and in a single pass over the whole text otherwise. Where that finds a match, the
+    numeric patterns after it in the alternation are also tried at the same
+    place, so a number that is both, e.g. a phone and an account number, is
+    still reported as both.
+
+    Args:
+        patterns: name -> config with a compiled 'regex', plus optional 'anchors'
+            (literal strings every match contains, matched case-insensitively),
+            'lead' and 'tail' (how far a match can extend before and after its
+            anchor), and 'numeric' with the source 'pattern' (matches start at
+            a digit with no word char before it). Other patterns are scanned
+            in full.
+        context_keywords: group -> list of keywords, located in the same pass
+        compile: Compiles the combined numeric pattern (default re.compile)
+    """
+
+    def __init__(self, patterns: Dict[str, dict], context_keywords: Dict[str, List[str]],
+                 compile=None):
+        self.patterns = patterns
+        self.order = list(patterns)
+        self.compile = compile or re.compile
+
+        self.windows = {}  # pattern name -> (lead, tail)
+        self.unanchored = []  # patterns that need a full-text scan
+        self.numeric = []  # patterns run in the combined numeric pass
+        literal_patterns = defaultdict(set)
+        spans = []  # (lead, tail) of every windowed or numeric pattern
+
+        for name, config in patterns.items():
+            anchors = config.get('anchors') or []
+            if config.get('numeric') and config.get('pattern'):
+                self.numeric.append(name)
+                spans.append((config.get('lead', DEFAULT_LEAD), config.get('tail', DEFAULT_TAIL)))
+                continue
+            if not anchors:
+                self.unanchored.append(name)
+                continue
+            self.windows[name] = (config.get('lead', DEFAULT_LEAD), config.get('tail', DEFAULT_TAIL))
+            spans.append(self.windows[name])
+            for literal in anchors:
+                literal_patterns[literal.lower()].add(name)
+
+        literal_contexts = defaultdict(set)
+        for group, keywords in context_keywords.items():
+            for keyword in keywords:
+                literal_contexts[keyword.lower()].add(group)
+
+        self.literals = set(literal_patterns) | set(literal_contexts)
+
+        # A literal hit also stands for every literal it contains. The pass never
+        # overlaps hits, so anchors that could start inside a hit and run past it
+        # are checked directly at their offset.
+        self.hit_patterns = {}  # literal -> pattern names
+        self.hit_overlaps = {}  # literal -> [(offset, anchor, pattern names)]
+        self.hit_contexts = {}  # literal -> set of context groups
+        for literal in self.literals:
+            self.hit_patterns[literal] = sorted(set().union(
+                *(names for other, names in literal_patterns.items() if other in literal)))
+            self.hit_overlaps[literal] = [
+                (k, other, sorted(names))
+                for other, names in literal_patterns.items() if other not in literal
+                for k in range(1, len(literal))
+                if len(literal) - k < len(other) and literal[k:] == other[:len(literal) - k]
+            ]
+            self.hit_contexts[literal] = set().union(
+                *(groups for other, groups in literal_contexts.items() if other in literal))
+
+        self._regex_cache = {}
+        self._numeric_cache = {}
+        # One window around every digit run fits any numeric pattern
+        self.numeric_window = (
+            max((patterns[n].get('lead', DEFAULT_LEAD) for n in self.numeric), default=DEFAULT_LEAD),
+            max((patterns[n].get('tail', DEFAULT_TAIL) for n in self.numeric), default=DEFAULT_TAIL),
+        )
+
+        # Longest stretch a single match can cover, for callers that scan in chunks
+        longest_anchor = max((len(a) for a in literal_patterns), default=0)
+        self.max_span = max(
+            [lead + tail + longest_anchor for lead, tail in spans]
+            + [DEFAULT_LEAD + DEFAULT_TAIL]
+        ) + TOKEN_LIMIT
+
+    def _anchor_regex(self, found: frozenset, ignore_case: bool = False):
+        """
+        Anchor regex without the keywords of context groups already found
+
+        Keywords that only mark found groups are dropped, so repeated context
+        words stop costing a hit each once their group is known.
+        """
+        key = (found, ignore_case)
+        regex = self._regex_cache.get(key)
+        if regex is None and key not in self._regex_cache:
+            literals = [
+                literal for literal in self.literals
+                if self.hit_patterns[literal] or self.hit_overlaps[literal]
+                or not self.hit_contexts[literal] <= found
+            ]
+            regex = re.compile(_trie_regex(literals), re.IGNORECASE if ignore_case else 0) \
+                if literals else None
+            self._regex_cache[key] = regex
+        return regex
+
+    def _numeric_regex(self, names: tuple):
+        """
+        One alternation of the given numeric patterns, group g<i> for names[i]
+
+        Returns:
+            The compiled regex, or None if the combination doesn't compile
+            (the patterns are then run one by one)
+        """
+        if names not in self._numeric_cache:
+            source = NUMERIC_GUARD + '(?:' + '|'.join(
+                f'(?P<g{i}>{self.patterns[name]["pattern"]})' for i, name in enumerate(names)) + ')'
+            try:
+                self._numeric_cache[names] = self.compile(source)
+            except Exception as e:
+                print(f"DLP: numeric patterns can't be combined, scanning them one by one: {e}")
+                self._numeric_cache[names] = None
+        return self._numeric_cache[names]
+
+    def _numeric_regions(self, text: str, pos: int, endpos: int):
+        """Windows around the digit runs, or the whole text where they are dense"""
+        if endpos - pos <= SMALL_TEXT:
+            return [(pos, endpos)]
+        limit = (endpos - pos) // DENSE_SPACING
+        spans = []
+        for m in _DIGITS.finditer(text, pos, endpos):
+            spans.append(m.span())
+            if len(spans) > limit:
+                # Digits everywhere: one full pass beats many small ones
+                return [(pos, endpos)]
+        lead, tail = self.numeric_window
+        return self._regions(text, spans, lead, tail, pos, endpos) if spans else []
+
+    def _scan_numeric(self, names: list, text: str, pos: int, endpos: int,
+                      budget: Optional[ScanBudget]) -> Dict[str, list]:
+        """Matches of the numeric patterns, by name, from one pass over their regions"""
+        found = {name: [] for name in names}
+        names = tuple(names)
+        regex = self._numeric_regex(names)
+        regions = self._numeric_regions(text, pos, endpos)
+        if regex is None:
+            for name in names:
+                last = pos
+                for start, end in regions:
+                    for m in _finditer(self.patterns[name]['regex'], text, max(start, last), end, budget):
+                        found[name].append((name, m.start(), m.end(), m.group()))
+                        last = m.end()
+            return found
+
+        last_end = [pos] * len(names)  # keeps each pattern's own matches apart
+        last = pos
+        for start, end in regions:
+            if budget and budget.expired():
+                break
+            for m in _finditer(regex, text, max(start, last), end, budget):
+                first = int(m.lastgroup[1:])
+                at = m.start()
+                found[names[first]].append((names[first], at, m.end(), m.group()))
+                last = last_end[first] = m.end()
+                # Patterns before it in the alternation didn't match here; later ones may
+                for i in range(first + 1, len(names)):
+                    if at >= last_end[i]:
+                        other = self.patterns[names[i]]['regex'].match(text, at, end)
+                        if other:
+                            found[names[i]].append((names[i], at, other.end(), other.group()))
+                            last_end[i] = other.end()
+        return found
+
+    def find_anchors(self, text: str, pos: int = 0, endpos: int = None):
+        """
+        Locate anchor hits and context keywords in one pass
+
+        Returns:
+            (hits: pattern name -> sorted list of (start, end), contexts: set of group names)
+        """
+        endpos = len(text) if endpos is None else min(endpos, len(text))
+        hits = defaultdict(list)
+        contexts = set()
+
+        # Lowercasing first lets the anchor regex stay case-sensitive, which the
+        # engine can scan much faster; offsets only line up if no char expands
+        segment = text[pos:endpos]
+        lowered = segment.lower()
+        ignore_case = len(lowered) != len(segment)
+        if ignore_case:
+            lowered = segment
+
+        hit_patterns = self.hit_patterns
+        hit_overlaps = self.hit_overlaps
+        hit_contexts = self.hit_contexts
+        start_at = 0
+
+        while True:
+            regex = self._anchor_regex(frozenset(contexts), ignore_case)
+            if regex is None:
+                break
+            restart = None
+            for m in regex.finditer(lowered, start_at):
+                s, e = m.span()
+                literal = m.group()
+                if ignore_case:
+                    literal = literal.lower()
+                for name in hit_patterns[literal]:
+                    hits[name].append((s + pos, e + pos))
+                for k, anchor, names in hit_overlaps[literal]:
+                    if lowered.startswith(anchor, s + k):
+                        for name in names:
+                            hits[name].append((s + k + pos, s + k + len(anchor) + pos))
+                new_groups = hit_contexts[literal] - contexts
+                if new_groups:
+                    contexts |= new_groups
+                    restart = e
+                    break
+            if restart is None:
+                break
+            start_at = restart
+
+        return hits, contexts
+
+    def _regions(self, text: str, spans, lead: int, tail: int, pos: int, endpos: int):
+        """Merge anchor windows into regions widened to whole tokens"""
+        regions = []
+        for s, e in spans:
+            start = max(s - lead, pos)
+            end = min(e + tail, endpos)
+            if regions and start <= regions[-1][1] + CLUSTER_GAP:
+                if end > regions[-1][1]:
+                    regions[-1][1] = end
+            else:
+                regions.append([start, end])
+
+        for region in regions:
+            start, end = region
+            # Back up to the start of the token so a match isn't entered midway
+            floor = max(start - TOKEN_LIMIT, pos)
+            cut = max(text.rfind(ch, floor, start) for ch in ' \n\t')
+            region[0] = cut + 1 if cut >= 0 else floor
+            # Run to the end of the token so a match isn't cut short
+            region[1] = _TOKEN_END.match(text, end, endpos).end()
+        return regions
+
+    def scan(self, text: str, pos: int = 0, endpos: int = None,
+             skip=None, budget: Optional[ScanBudget] = None) -> Tuple[List[tuple], set]:
+        """
+        Find all pattern matches in text[pos:endpos]
+
+        Args:
+            skip: Optional callable(name, contexts) -> bool to skip a pattern
+            budget: Optional ScanBudget; when it runs out the matches found so
+                far are returned and budget.exhausted is set
+
+        Returns:
+            (matches: list of (name, start, end, value) in pattern order, contexts)
+        """
+        endpos = len(text) if endpos is None else min(endpos, len(text))
+        hits, contexts = self.find_anchors(text, pos, endpos)
+        matches = []
+
+        numeric = [name for name in self.numeric if not (skip and skip(name, contexts))]
+        numeric_found = self._scan_numeric(numeric, text, pos, endpos, budget) if numeric else {}
+
+        for name in self.order:
+            if name in numeric_found:
+                matches.extend(numeric_found[name])
+                continue
+            if budget and budget.expired():
+                break
+            if skip and skip(name, contexts):
+                continue
+            regex = self.patterns[name]['regex']
+
+            if name in self.windows:
+                spans = hits.get(name)
+                if not spans:
+                    continue
+                lead, tail = self.windows[name]
+                if endpos - pos <= SMALL_TEXT or len(spans) * DENSE_SPACING > endpos - pos:
+                    # Short text or anchors everywhere: one full pass beats many small ones
+                    regions = [(pos, endpos)]
+                else:
+                    regions = self._regions(text, spans, lead, tail, pos, endpos)
+                last_end = pos
+                for start, end in regions:
+                    if budget and budget.expired():
+                        break
+                    # Same non-overlapping order as a full findall
+                    for m in _finditer(regex, text, max(start, last_end), end, budget):
+                        matches.append((name, m.start(), m.end(), m.group()))
+                        last_end = m.end()
+            else:
+                for m in _finditer(regex, text, pos, endpos, budget):
+                    matches.append((name, m.start(), m.end(), m.group()))
+
+        return matches, contexts
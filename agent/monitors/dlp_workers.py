@@ -0,0 +1,330 @@
+"""
+DLP Scan Workers - Off-thread file scanning in a bounded process pool
+Jobs are prioritized (sensitive paths and small files first), carry deadlines,
+and are cancelled when a newer modify of the same file supersedes them
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+# Worker-process state: one scanner per process, built by the pool initializer
+_worker_monitor = None
+
+
+def _init_worker(settings: dict, custom_patterns: list):
+    """Build the DLP scanner inside a worker process"""
+    global _worker_monitor
+    try:
+        from .dlp_monitor import DLPMonitor
+    except ImportError:
+        from dlp_monitor import DLPMonitor
+
+    _worker_monitor = DLPMonitor(cache_size=0, **settings)
+    for spec in custom_patterns:
+        _worker_monitor.add_custom_pattern(**spec)
+
+
+def _scan_job(filepath: str, deadline: float, resume: Optional[dict] = None):
+    """Stream-scan one file (or its appended part) in a worker process"""
+    return _worker_monitor._scan_stream(filepath, deadline, resume)
+
+
+class ScanJob:
+    """One queued file scan"""
+
+    __slots__ = ('filepath', 'priority', 'seq', 'deadline', 'callback', 'cancelled', 'superseded')
+
+    def __init__(self, filepath, priority, seq, deadline, callback):
+        self.filepath = filepath
+        self.priority = priority
+        self.seq = seq
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self.superseded = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ScanWorkerPool:
+    """
+    Priority queue of file scans feeding a process pool
+
+    The watcher thread only enqueues; a dispatcher thread pops jobs in
+    priority order and hands each to a lookup thread, which does the cache
+    lookup (which may hash the file) and passes misses to worker processes.
+    Only a few jobs are in flight at once, so queue priority decides what
+    runs next rather than the executors' own FIFO.
+
+    Args:
+        monitor: DLPMonitor that owns the cache, alerting and settings
+        max_workers: Worker processes (default: CPU count - 1, at most 4)
+        max_pending: Queued jobs kept; beyond that the lowest priority is dropped
+        job_timeout: Seconds from enqueue until a job is dropped or cut short
+        small_file_bytes: Files up to this size jump ahead of larger ones
+    """
+
+    def __init__(self, monitor, max_workers: Optional[int] = None, max_pending: int = 1000,
+                 job_timeout: float = 120.0, small_file_bytes: int = 1024 * 1024):
+        self.monitor = monitor
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.max_pending = max_pending
+        self.job_timeout = job_timeout
+        self.small_file_bytes = small_file_bytes
+
+        self.queue = []  # heap of ScanJob
+        self.queued = {}  # filepath -> queued ScanJob
+        self.running = {}  # filepath -> ScanJob handed to a worker
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.slots = threading.Semaphore(self.max_workers * 2)
+
+        self.executor = None
+        self.lookups = None  # threads for cache lookups (and inline scans)
+        self.inline = False  # Set if worker processes can't be started
+        self.dispatcher = None
+        self.active = False
+
+        self.stats = {
+            'jobs_queued': 0,
+            'jobs_scanned': 0,
+            'jobs_cached': 0,
+            'jobs_superseded': 0,
+            'jobs_expired': 0,
+            'jobs_dropped': 0,
+            'jobs_failed': 0,
+            'scan_seconds': 0.0,
+        }
+
+    def _priority(self, filepath: str, sensitive: bool) -> tuple:
+        """Sensitive paths first, then small files, then by size"""
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            size = 0
+        return (0 if sensitive else 1, 0 if size <= self.small_file_bytes else 1, size)
+
+    def submit(self, filepath: str, sensitive: bool = False,
+               callback: Optional[Callable] = None):
+        """
+        Queue a file for scanning; returns immediately
+
+        Args:
+            callback: Called with (filepath, alerts) from a lookup thread when done
+        """
+        job = ScanJob(filepath, self._priority(filepath, sensitive), next(self.seq),
+                      time.time() + self.job_timeout, callback)
+
+        with self.cond:
+            # A newer modify supersedes any scan of the older content
+            old = self.queued.pop(filepath, None)
+            if old:
+                old.cancelled = True
+                self.stats['jobs_superseded'] += 1
+            running = self.running.get(filepath)
+            if running:
+                running.superseded = True
+
+            self.queued[filepath] = job
+            heapq.heappush(self.queue, job)
+            self.stats['jobs_queued'] += 1
+
+            if len(self.queued) > self.max_pending:
+                worst = max(self.queued.values())
+                worst.cancelled = True
+                del self.queued[worst.filepath]
+                self.stats['jobs_dropped'] += 1
+
+            self.cond.notify()
+
+        self._ensure_started()
+
+    def _ensure_started(self):
+        with self.cond:
+            if self.active:
+                return
+            self.active = True
+            if self.lookups is None:
+                self.lookups = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                  thread_name_prefix='dlp-lookup')
+            self.dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self.dispatcher.start()
+
+    def _next_job(self) -> Optional[ScanJob]:
+        """Pop the best live job, dropping cancelled and expired ones"""
+        with self.cond:
+            while self.active:
+                while self.queue:
+                    job = heapq.heappop(self.queue)
+                    if job.cancelled:
+                        continue
+                    del self.queued[job.filepath]
+                    if time.time() > job.deadline:
+                        self.stats['jobs_expired'] += 1
+                        continue
+                    self.running[job.filepath] = job
+                    return job
+                self.cond.wait()
+        return None
+
+    def _dispatch_loop(self):
+        """Feed queued jobs to the workers, keeping only a few in flight"""
+        while self.active:
+            self.slots.acquire()
+            job = self._next_job()
+            if job is None:
+                self.slots.release()
+                break
+            lookups = self.lookups
+            try:
+                lookups.submit(self._run_job, job)
+            except (AttributeError, RuntimeError):
+                # Lookup threads shut down by stop()
+                self._finish(job)
+                break
+
+    def _run_job(self, job: ScanJob):
+        """Answer a job from the cache, or scan it (on a lookup thread)"""
+        alerts = None
+        handed_off = False
+        try:
+            try:
+                alerts, token, resume = self.monitor._cached_result(job.filepath)
+            except OSError:
+                return
+            if alerts is not None:
+                self._count('jobs_cached')
+                return
+
+            started = time.time()
+            future = self._submit_scan(job, resume)
+            if future is None:
+                # Inline fallback: scan on this thread
+                result = self.monitor._scan_stream(job.filepath, job.deadline, resume)
+                alerts = self._complete(job, token, started, result)
+                return
+            future.add_done_callback(
+                lambda f, job=job, token=token, started=started: self._on_done(f, job, token, started))
+            handed_off = True
+        except Exception as e:
+            print(f"Error scanning file {job.filepath}: {e}")
+            self._count('jobs_failed')
+            alerts = None
+        finally:
+            # Every job is finished exactly once, here or by _collect
+            if not handed_off:
+                self._finish(job, alerts)
+
+    def _count(self, key: str, amount=1):
+        """Update a statistic (dispatcher, lookup and pool threads all count)"""
+        with self.cond:
+            self.stats[key] += amount
+
+    def _submit_scan(self, job: ScanJob, resume: Optional[dict] = None):
+        """Hand a job to the process pool, or return None to scan inline"""
+        if self.inline:
+            return None
+        try:
+            with self.cond:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        initializer=_init_worker,
+                        initargs=(self.monitor.worker_settings(), list(self.monitor.custom_patterns)),
+                    )
+                executor = self.executor
+            return executor.submit(_scan_job, job.filepath, job.deadline, resume)
+        except Exception as e:
+            print(f"DLP worker processes unavailable, scanning in-process: {e}")
+            self.inline = True
+            return None
+
+    def _on_done(self, future, job: ScanJob, token, started: float):
+        """Pool callback: collect the result on a lookup thread, not the pool's own"""
+        try:
+            self.lookups.submit(self._collect, future, job, token, started)
+        except Exception:
+            # Lookup threads shut down by stop()
+            self._finish(job)
+
+    def _collect(self, future, job: ScanJob, token, started: float):
+        """Alert on a worker's result (on a lookup thread)"""
+        alerts = None
+        try:
+            alerts = self._complete(job, token, started, future.result())
+        except Exception as e:
+            print(f"Error scanning file {job.filepath}: {e}")
+            self._count('jobs_failed')
+            alerts = None
+        finally:
+            self._finish(job, alerts)
+
+    def _complete(self, job: ScanJob, token, started: float, result):
+        """
+        Record a scan result and raise its alerts
+
+        Returns:
+            The alerts, or None if a newer modify superseded the scan
+        """
+        with self.cond:
+            self.stats['jobs_scanned'] += 1
+            self.stats['scan_seconds'] += time.time() - started
+        if job.superseded:
+            # The newer queued job rescans the current content
+            self._count('jobs_superseded')
+            return None
+        return self.monitor._finish_scan(job.filepath, token, *result)
+
+    def _finish(self, job: ScanJob, alerts=None):
+        """Free the job's slot and call its callback"""
+        try:
+            with self.cond:
+                if self.running.get(job.filepath) is job:
+                    del self.running[job.filepath]
+        finally:
+            self.slots.release()
+        if job.callback and alerts is not None:
+            try:
+                job.callback(job.filepath, alerts)
+            except Exception as e:
+                print(f"DLP scan callback error: {e}")
+
+    def reset(self):
+        """Restart workers so they pick up a changed pattern set"""
+        with self.cond:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        """Stop dispatching and shut the workers down"""
+        with self.cond:
+            self.active = False
+            for job in self.queued.values():
+                job.cancelled = True
+            self.queued.clear()
+            self.queue.clear()
+            self.cond.notify_all()
+        self.slots.release()
+        self.reset()
+        lookups, self.lookups = self.lookups, None
+        if lookups:
+            lookups.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        """Get worker pool statistics"""
+        with self.cond:
+            return {
+                **self.stats,
+                'scan_seconds': round(self.stats['scan_seconds'], 2),
+                'pending': len(self.queued),
+                'in_flight': len(self.running),
+                'workers': 0 if self.inline else self.max_workers,
+            }
@@ -167,11 +167,15 @@ class EmployeeDashboard:
 
             elif data_type == 'files' and 'file' in self.data_providers:
                 if self.transparency_level == 'full':
-                    result['data'] = self.data_providers['file'].get_events()[-limit:]
+                    result['data'] = self.data_providers['file'].get_events(limit=limit)
                 else:
                     # Summary only
                     result['data'] = self.data_providers['file'].get_stats()
 
+            elif data_type == 'folders' and 'file' in self.data_providers:
+                # Activity per folder (counts only, no file names)
+                result['data'] = self.data_providers['file'].get_folder_rollup(limit=limit)
+
             elif data_type == 'time' and 'time' in self.data_providers:
                 result['data'] = self.data_providers['time'].get_time_entries(limit=limit)
 
@@ -0,0 +1,279 @@
+"""
+File Event Coalescing - Collapses bursts of raw file notifications into semantic events
+A single save in Office produces a burst of modified, renamed and attribute
+notifications (and overlapping watch paths can deliver each twice). Each path's
+notifications are merged until it has been quiet for a debounce window.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+# Pending action + new raw action -> merged action (None: the burst cancels out)
+MERGE = {
+    (None, 'created'): 'created',
+    (None, 'modified'): 'modified',
+    (None, 'deleted'): 'deleted',
+    ('created', 'created'): 'created',
+    ('created', 'modified'): 'created',
+    ('created', 'deleted'): None,  # a temporary file
+    ('modified', 'created'): 'modified',
+    ('modified', 'modified'): 'modified',
+    ('modified', 'deleted'): 'deleted',
+    ('deleted', 'created'): 'modified',  # replaced, e.g. by a save-via-temp-file
+    ('deleted', 'modified'): 'modified',
+    ('deleted', 'deleted'): 'deleted',
+    ('renamed', 'created'): 'renamed',
+    ('renamed', 'modified'): 'renamed',
+    # ('renamed', 'deleted') becomes a delete of the original path
+}
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel of per-key deadlines
+
+    Scheduling is O(1) and re-scheduling a key that fires later (the common
+    case for a debounce) only updates its deadline; the key moves to its new
+    slot when its old one comes round. advance() touches one slot per tick.
+    """
+
+    def __init__(self, tick: float = 0.05, slots: int = 256):
+        self.tick = tick
+        self.slots = slots
+        self.wheel = [[] for _ in range(slots)]
+        self.deadlines: Dict[object, float] = {}
+        self.placed: Dict[object, int] = {}  # key -> tick number of the slot holding it
+        self.current: Optional[int] = None  # last tick number processed
+
+    def schedule(self, key, deadline: float, now: Optional[float] = None):
+        """Fire key at deadline (epoch seconds), replacing any earlier schedule"""
+        self.deadlines[key] = deadline
+        if self.current is None:
+            self.current = int((time.time() if now is None else now) / self.tick) - 1
+        tick = max(int(deadline / self.tick), self.current + 1)
+        placed = self.placed.get(key)
+        if placed is None or tick < placed:
+            self._place(key, tick)
+
+    def cancel(self, key):
+        self.deadlines.pop(key, None)
+        self.placed.pop(key, None)
+
+    def _place(self, key, tick: int):
+        self.placed[key] = tick
+        self.wheel[tick % self.slots].append(key)
+
+    def advance(self, now: float) -> List:
+        """Keys whose deadlines have passed, in slot order"""
+        if self.current is None:
+            return []
+        target = int(now / self.tick)
+        steps = min(target - self.current, self.slots)  # after a long stall, visit each slot once
+        expired = []
+        for tick in range(target - steps + 1, target + 1):
+            index = tick % self.slots
+            bucket, self.wheel[index] = self.wheel[index], []
+            for key in bucket:
+                if key not in self.deadlines or self.placed.get(key) is None:
+                    continue
+                if self.placed[key] % self.slots != index:
+                    continue  # stale copy, rescheduled earlier into another slot
+                deadline = self.deadlines[key]
+                if deadline <= now:
+                    expired.append(key)
+                    del self.deadlines[key]
+                    del self.placed[key]
+                else:
+                    self._place(key, max(int(deadline / self.tick), target + 1))
+        self.current = max(self.current, target)
+        return expired
+
+    def __len__(self):
+        return len(self.deadlines)
+
+
+class EventCoalescer:
+    """
+    Per-path state machines that merge raw file notifications
+
+    Args:
+        on_event: Called with (action, filepath, info) once a path has been
+            quiet for `debounce` seconds; action is created, modified, deleted
+            or renamed, and info has old_filepath and modified (renames: whether
+            the content changed too), source (the watch path) and raw_events
+            (notifications merged)
+        debounce: Quiet time before a path's event is emitted
+        max_delay: Emit anyway after this long, so a file written continuously
+            (a log) still reports periodically
+        is_ignored: Optional callable(filepath); such paths (temp files) never
+            emit, but renames to and from them still count, so a save through
+            a temp file comes out as one 'modified'
+    """
+
+    def __init__(self, on_event: Callable, debounce: float = 0.5, max_delay: float = 5.0,
+                 is_ignored: Optional[Callable] = None, tick: float = 0.05):
+        self.on_event = on_event
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.is_ignored = is_ignored or (lambda path: False)
+        self.timers = TimerWheel(tick)
+        self.pending: Dict[str, dict] = {}  # path key -> state
+        self.renaming: Dict[str, tuple] = {}  # source -> (old path, time) awaiting its renamed_to
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'raw_events': 0,
+            'emitted': 0,
+            'cancelled': 0,
+        }
+
+    @staticmethod
+    def _key(filepath: str) -> str:
+        return os.path.normcase(os.path.abspath(filepath))
+
+    def add(self, action: str, filepath: str, source: Optional[str] = None, now: Optional[float] = None):
+        """
+        Record one raw notification
+
+        Args:
+            action: created, modified, deleted, renamed_from or renamed_to
+            source: The watch path it came from; pairs renamed_from with renamed_to
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self.stats['raw_events'] += 1
+            old = self.renaming.pop(source, None)
+            if action == 'renamed_to' and old:
+                self._rename(old[0], filepath, source, now)
+                return
+            if old:
+                # Renamed out of the watched tree
+                self._apply(old[0], 'deleted', source, now)
+
+            if action == 'renamed_from':
+                self.renaming[source] = (filepath, now)
+            elif action == 'renamed_to':
+                self._apply(filepath, 'created', source, now)  # renamed in from outside
+            elif action in ('created', 'modified', 'deleted'):
+                self._apply(filepath, action, source, now)
+
+    def _state(self, filepath: str, source, now: float) -> dict:
+        key = self._key(filepath)
+        state = self.pending.get(key)
+        if state is None:
+            state = {'action': None, 'filepath': filepath, 'old_filepath': None, 'modified': False,
+                     'source': source, 'first_seen': now, 'raw_events': 0}
+            self.pending[key] = state
+        state['filepath'] = filepath
+        return state
+
+    def _apply(self, filepath: str, action: str, source, now: float, raw: int = 1):
+        state = self._state(filepath, source, now)
+        state['raw_events'] += raw
+        if state['action'] == 'renamed' and action == 'deleted':
+            # Renamed then deleted: what is gone is the original
+            origin = state['old_filepath']
+            self._drop(filepath)
+            self._apply(origin, 'deleted', source, now, state['raw_events'])
+            return
+        merged = MERGE[(state['action'], action)]
+        if merged is None:
+            # Cancelled out; nothing to report for this path
+            self._drop(filepath)
+            self.stats['cancelled'] += 1
+            return
+        if merged == 'renamed':
+            state['modified'] = True  # written to after the rename
+        state['action'] = merged
+        self._arm(filepath, state, now)
+
+    def _rename(self, old_path: str, new_path: str, source, now: float):
+        old_key = self._key(old_path)
+        old_state = self.pending.get(old_key)
+
+        if self.is_ignored(new_path):
+            # Moved to a temp name: the original is gone (for now)
+            self._apply(old_path, 'deleted', source, now, 2)
+            return
+
+        self._drop(old_path)
+        raw = (old_state['raw_events'] if old_state else 0) + 2
+        if self.is_ignored(old_path) or (old_state and old_state['action'] == 'created'):
+            # A temp file (or one created in this burst) became the new path
+            self._apply(new_path, 'created', source, now, raw)
+            return
+
+        origin = old_state['old_filepath'] if old_state and old_state['old_filepath'] else old_path
+        modified = bool(old_state and (old_state['action'] == 'modified' or old_state['modified']))
+        state = self._state(new_path, source, now)
+        state['raw_events'] += raw
+        if state['action'] in ('deleted', 'modified') or self._key(origin) == self._key(new_path):
+            # Renamed over an existing file, or away and back
+            state['action'] = 'modified'
+            state['old_filepath'] = None
+        else:
+            state['action'] = 'renamed'
+            state['old_filepath'] = origin
+            state['modified'] = modified
+        self._arm(new_path, state, now)
+
+    def _arm(self, filepath: str, state: dict, now: float):
+        deadline = min(now + self.debounce, state['first_seen'] + self.max_delay)
+        self.timers.schedule(self._key(filepath), deadline, now)
+
+    def _drop(self, filepath: str):
+        key = self._key(filepath)
+        self.pending.pop(key, None)
+        self.timers.cancel(key)
+
+    def flush_due(self, now: Optional[float] = None) -> int:
+        """Emit every path whose debounce has expired; returns how many were emitted"""
+        now = time.time() if now is None else now
+        with self.lock:
+            for source, (old_path, seen) in list(self.renaming.items()):
+                if now - seen >= self.debounce:
+                    del self.renaming[source]
+                    self._apply(old_path, 'deleted', source, seen)
+            ready = [self.pending.pop(key) for key in self.timers.advance(now) if key in self.pending]
+        return self._emit(ready)
+
+    def flush_all(self) -> int:
+        """Emit everything pending now (e.g. on stop)"""
+        with self.lock:
+            for source, (old_path, seen) in list(self.renaming.items()):
+                self._apply(old_path, 'deleted', source, seen)
+            self.renaming.clear()
+            ready = list(self.pending.values())
+            self.pending.clear()
+            for key in list(self.timers.deadlines):
+                self.timers.cancel(key)
+        return self._emit(ready)
+
+    def _emit(self, ready: List[dict]) -> int:
+        emitted = 0
+        for state in ready:
+            if not state['action'] or self.is_ignored(state['filepath']):
+                continue
+            emitted += 1
+            self.on_event(state['action'], state['filepath'], {
+                'old_filepath': state['old_filepath'],
+                'modified': state['modified'],
+                'source': state['source'],
+                'raw_events': state['raw_events'],
+            })
+        with self.lock:
+            self.stats['emitted'] += emitted
+        return emitted
+
+    def get_stats(self) -> dict:
+        """Get coalescing statistics"""
+        with self.lock:
+            raw, emitted = self.stats['raw_events'], self.stats['emitted']
+            return {
+                **self.stats,
+                'pending': len(self.pending),
+                'burst_factor': round(raw / emitted, 2) if emitted else None,
+            }
@@ -0,0 +1,285 @@
+"""
+File Event Index - Buffered file events indexed by folder
+Events are kept in arrival order under a trie of their directories. Each trie
+node lists its own events and keeps counters for its whole subtree, updated as
+events arrive and age out, so "everything under Documents/Finance in the last
+hour" and per-folder rollups cost time in the answer, not in the buffer.
+"""
+
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+
+class _Node:
+    """One directory: its own events (by sequence number) and subtree counters"""
+
+    __slots__ = ('name', 'parent', 'children', 'seqs', 'count', 'bytes', 'sensitive', 'actions')
+
+    def __init__(self, name: str, parent: Optional['_Node']):
+        self.name = name  # as first seen (original case)
+        self.parent = parent
+        self.children: Dict[str, '_Node'] = {}  # normcased name -> node
+        self.seqs = deque()
+        self.count = 0
+        self.bytes = 0
+        self.sensitive = 0
+        self.actions: Dict[str, int] = {}
+
+    def path(self) -> str:
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        path = os.sep.join(reversed(names))
+        return path or os.sep
+
+
+class EventIndex:
+    """
+    Bounded buffer of file events with folder and attribute indexes
+
+    Args:
+        maxlen: Events kept; the oldest are dropped (and uncounted) first
+    """
+
+    def __init__(self, maxlen: int = 10000):
+        self.maxlen = maxlen
+        self.events = OrderedDict()  # seq -> (time added, event, directory node)
+        self.root = _Node('', None)
+        self.by_value: Dict[tuple, deque] = {}  # ('action', x) etc. -> seqs
+        self.value_counts: Dict[tuple, int] = {}
+        self.next_seq = 0
+
+    @staticmethod
+    def _keys(event: dict) -> list:
+        keys = [('action', event.get('action')), ('category', event.get('category'))]
+        if event.get('is_sensitive'):
+            keys.append(('sensitive', True))
+        return keys
+
+    @staticmethod
+    def _split(path: str) -> List[str]:
+        return path.rstrip(os.sep).split(os.sep) if path.strip(os.sep) else ['']
+
+    def _find(self, path: str) -> Optional[_Node]:
+        """The node of a directory path, or None if no event is under it"""
+        node = self.root
+        for name in self._split(os.path.normpath(path)):
+            node = node.children.get(os.path.normcase(name))
+            if node is None:
+                return None
+        return node
+
+    def add(self, event: dict):
+        """Buffer an event (dropping the oldest if full)"""
+        node = self.root
+        for name in self._split(os.path.dirname(event['filepath'])):
+            key = os.path.normcase(name)
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = _Node(name, node)
+            node = child
+
+        seq = self.next_seq
+        self.next_seq += 1
+        self.events[seq] = (time.time(), event, node)
+        node.seqs.append(seq)
+        self._count(node, event, 1)
+        for key in self._keys(event):
+            self.by_value.setdefault(key, deque()).append(seq)
+            self.value_counts[key] = self.value_counts.get(key, 0) + 1
+
+        while len(self.events) > self.maxlen:
+            self._remove(next(iter(self.events)))
+
+    def _count(self, node: _Node, event: dict, sign: int):
+        size = (event.get('file_size') or 0) * sign
+        sensitive = sign if event.get('is_sensitive') else 0
+        action = event.get('action')
+        while node is not None:
+            node.count += sign
+            node.bytes += size
+            node.sensitive += sensitive
+            node.actions[action] = node.actions.get(action, 0) + sign
+            node = node.parent
+
+    def _remove(self, seq: int):
+        """Drop one event; stale sequence numbers left in lists are skipped and trimmed lazily"""
+        _, event, node = self.events.pop(seq)
+        self._count(node, event, -1)
+        self._trim(node.seqs)
+        for key in self._keys(event):
+            self.value_counts[key] -= 1
+            if not self.value_counts[key]:
+                del self.value_counts[key]
+                del self.by_value[key]
+            else:
+                self._trim(self.by_value[key])
+        # Prune directories with nothing left under them
+        while node.parent is not None and node.count == 0:
+            node.parent.children.pop(os.path.normcase(node.name), None)
+            node = node.parent
+
+    def _trim(self, seqs: deque):
+        while seqs and seqs[0] not in self.events:
+            seqs.popleft()
+
+    def _subtree(self, node: _Node) -> List[_Node]:
+        nodes, stack = [], [node]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.children.values())
+        return nodes
+
+    def query(self, prefix: Optional[str] = None, since: Optional[float] = None,
+              action: Optional[str] = None, category: Optional[str] = None,
+              sensitive: Optional[bool] = None, limit: Optional[int] = None) -> List[dict]:
+        """
+        Buffered events, oldest first
+
+        Args:
+            prefix: Only events under this directory
+            since: Only events buffered at or after this time (epoch seconds)
+            action, category, sensitive: Only events with these values
+            limit: Only the newest `limit` matches
+        """
+        if prefix is not None:
+            node = self._find(prefix)
+            if node is None:
+                return []
+            sources = [n.seqs for n in self._subtree(node)]
+        else:
+            keys = [k for k in (('action', action), ('category', category))
+                    if k[1] is not None] + ([('sensitive', True)] if sensitive else [])
+            if keys:
+                key = min(keys, key=lambda k: self.value_counts.get(k, 0))
+                sources = [self.by_value.get(key, ())]
+            else:
+                sources = [self.events.keys()]
+
+        matched = []
+        for seqs in sources:
+            found = 0
+            for seq in reversed(seqs):
+                entry = self.events.get(seq)
+                if entry is None:
+                    continue
+                added, event, _ = entry
+                if since is not None and added < since:
+                    break
+                if action is not None and event.get('action') != action:
+                    continue
+                if category is not None and event.get('category') != category:
+                    continue
+                if sensitive is not None and bool(event.get('is_sensitive')) != sensitive:
+                    continue
+                matched.append(seq)
+                found += 1
+                if limit is not None and found >= limit:
+                    break
+
+        matched.sort()
+        if limit is not None:
+            matched = matched[-limit:] if limit else []
+        return [self.events[seq][1] for seq in matched]
+
+    def remove_sensitive(self) -> List[dict]:
+        """Drop and return the sensitive events"""
+        seqs = [seq for seq in self.by_value.get(('sensitive', True), ()) if seq in self.events]
+        removed = [self.events[seq][1] for seq in seqs]
+        for seq in seqs:
+            self._remove(seq)
+        return removed
+
+    def clear(self):
+        self.events.clear()
+        self.root = _Node('', None)
+        self.by_value.clear()
+        self.value_counts.clear()
+
+    @staticmethod
+    def _counters(node: _Node) -> dict:
+        return {
+            'path': node.path(),
+            'events': node.count,
+            'bytes': node.bytes,
+            'sensitive': node.sensitive,
+            'actions': {action: n for action, n in node.actions.items() if n},
+        }
+
+    def summary(self, prefix: str) -> Optional[dict]:
+        """Counters for everything under a directory, or None if nothing is"""
+        node = self._find(prefix)
+        return self._counters(node) if node else None
+
+    def rollup(self, prefix: str, depth: int = 1, limit: Optional[int] = None) -> List[dict]:
+        """
+        Counters per folder `depth` levels below prefix, busiest first
+
+        Events directly in a shallower folder are reported for that folder.
+        """
+        node = self._find(prefix)
+        if node is None:
+            return []
+        rows = []
+        level = [node]
+        for _ in range(depth):
+            below = []
+            for parent in level:
+                children = list(parent.children.values())
+                own = parent.count - sum(child.count for child in children)
+                if own and parent is not node:
+                    rows.append(self._own_counters(parent, children))
+                below.extend(children)
+            level = below
+        rows.extend(self._counters(n) for n in level)
+        rows.sort(key=lambda row: row['events'], reverse=True)
+        return rows[:limit] if limit is not None else rows
+
+    def _own_counters(self, node: _Node, children: List[_Node]) -> dict:
+        row = self._counters(node)
+        for child in children:
+            row['events'] -= child.count
+            row['bytes'] -= child.bytes
+            row['sensitive'] -= child.sensitive
+            for action, n in child.actions.items():
+                row['actions'][action] = row['actions'].get(action, 0) - n
+        row['actions'] = {action: n for action, n in row['actions'].items() if n}
+        return row
+
+    def __len__(self):
+        return len(self.events)
+
+
+if __name__ == "__main__":
+    import random
+
+    base = os.path.join(os.sep, 'home', 'alice')
+    folders = [os.path.join(base, *parts) for parts in (
+        ('Documents', 'Finance'), ('Documents', 'Finance', '2024'), ('Documents', 'HR'),
+        ('Downloads',), ('Desktop',), ('Pictures', 'Trips'),
+    )]
+    index = EventIndex(maxlen=10000)
+    for i in range(50000):
+        folder = random.choice(folders)
+        index.add({
+            'action': random.choice(['created', 'modified', 'modified', 'deleted']),
+            'filepath': os.path.join(folder, f'file{i % 500}.xlsx'),
+            'category': 'documents',
+            'is_sensitive': random.random() < 0.05,
+            'file_size': random.randint(1000, 100000),
+        })
+
+    print(f"{len(index)} events buffered")
+    for row in index.rollup(base, depth=2):
+        print(f"  {row['path']:40} {row['events']:6} events {row['bytes'] / 1e6:8.1f} MB  "
+              f"{row['sensitive']} sensitive")
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        index.query(prefix=os.path.join(base, 'Documents', 'Finance'), since=time.time() - 3600, limit=50)
+    print(f"Prefix query: {(time.perf_counter() - started) * 1000:.3f} ms")
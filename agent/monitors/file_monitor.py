@@ -2,74 +2,101 @@
 File Monitor - Tracks file operations (create, modify, delete, rename)
 """
 
+import sys
 import threading
 import time
 import os
 from datetime import datetime
-from collections import deque
-from pathlib import Path
-
-import win32file
-import win32con
-import pywintypes
-
-
-# File action constants
-FILE_ACTIONS = {
-    1: 'created',
-    2: 'deleted',
-    3: 'modified',
-    4: 'renamed_from',
-    5: 'renamed_to',
-}
-
-# Sensitive file patterns
-SENSITIVE_PATTERNS = [
-    '.env', '.pem', '.key', '.pfx', '.p12',
-    'password', 'secret', 'credential', 'token',
-    'id_rsa', 'id_dsa', 'id_ecdsa',
-    '.ssh', 'aws_credentials',
-]
-
-# File type categories
-FILE_CATEGORIES = {
-    'documents': ['.doc', '.docx', '.pdf', '.txt', '.rtf', '.odt', '.xls', '.xlsx', '.ppt', '.pptx'],
-    'images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.psd', '.ai'],
-    'code': ['.py', '.js', '.ts', '.java', '.c', '.cpp', '.h', '.cs', '.go', '.rs', '.rb', '.php'],
-    'archives': ['.zip', '.rar', '.7z', '.tar', '.gz', '.bz2'],
-    'data': ['.json', '.xml', '.csv', '.sql', '.db', '.sqlite'],
-    'executables': ['.exe', '.msi', '.bat', '.cmd', '.ps1', '.sh'],
-}
 
+try:
+    from .file_events import EventCoalescer
+    from .path_rules import PathRules, FILE_CATEGORIES, SENSITIVE_PATTERNS
+    from .file_snapshot import SnapshotReconciler
+    from .file_watchers import create_backend
+    from .file_hashing import FileHasher
+    from .file_index import EventIndex
+except ImportError:
+    from file_events import EventCoalescer
+    from path_rules import PathRules, FILE_CATEGORIES, SENSITIVE_PATTERNS
+    from file_snapshot import SnapshotReconciler
+    from file_watchers import create_backend
+    from file_hashing import FileHasher
+    from file_index import EventIndex
+
+# Raw notifications for a path are merged until it has been quiet this long (seconds),
+# but a path written continuously still reports every MAX_EVENT_DELAY seconds
+DEBOUNCE_SECONDS = 0.5
+MAX_EVENT_DELAY = 5.0
+
+# Watched trees are diffed against a snapshot this often (seconds) and after an
+# overflow; every FULL_RECONCILE_EVERY-th pass also finds in-place modifications
+RECONCILE_INTERVAL = 300
+FULL_RECONCILE_EVERY = 12
+OVERFLOW_SETTLE_SECONDS = 2
 
 class FileMonitor:
-    def __init__(self, watch_paths=None, on_file_event_callback=None):
+    def __init__(self, watch_paths=None, on_file_event_callback=None, debounce=DEBOUNCE_SECONDS,
+                 reconcile_interval=RECONCILE_INTERVAL, hashing=False):
         """
         Initialize file monitor
 
         Args:
             watch_paths: List of directories to watch (default: user folders)
             on_file_event_callback: Called when file event occurs
+            debounce: Seconds to coalesce a path's notifications into one
+                event (created, modified, deleted or renamed); 0 reports
+                every raw notification
+            reconcile_interval: Seconds between snapshot diffs that recover
+                events the watches missed; 0 disables them
+            hashing: Hash event files (content_hash, copy_of) to follow
+                copies of sensitive files
         """
         self.watch_paths = watch_paths or self._get_default_watch_paths()
         self.on_file_event = on_file_event_callback
 
         self.running = False
         self.threads = []
-        self.events = deque(maxlen=10000)
+        self.events = EventIndex(maxlen=10000)  # indexed by folder, action, category
         self.lock = threading.Lock()
 
+        # Exclusion, category and sensitivity rules (replaced by server policy)
+        self.rules = PathRules()
+        self.rules_policy = None
+
+        # One thread watches every root (IOCP on Windows, inotify on Linux)
+        self.watcher = create_backend(
+            self._handle_file_event, self._on_overflow, lambda path: self.rules.is_excluded(path)
+        )
+
+        # Bursts (an Office save, duplicate watches) become one event per path
+        self.coalescer = EventCoalescer(
+            self._on_coalesced_event, debounce, MAX_EVENT_DELAY, is_ignored=self.is_temp_file
+        ) if debounce else None
+
+        # Optional content hashing, so copies of sensitive files are recognised
+        self.hasher = FileHasher(self._deliver_event) if hashing else None
+
+        # Snapshots of the watched trees, diffed to recover missed notifications
+        self.reconcile_interval = reconcile_interval
+        self.reconcilers = {}  # watch path -> SnapshotReconciler
+        self.reconcile_requests = set()
+        self.reconcile_wake = threading.Event()
+        self.seen = {}  # watch path -> paths notified since its last diff
+
         # Statistics
         self.stats = {
             'created': 0,
             'modified': 0,
             'deleted': 0,
             'renamed': 0,
+            'excluded': 0,
+            'overflows': 0,
+            'reconciled': 0,
         }
 
     def _get_default_watch_paths(self):
         """Get default paths to watch"""
-        user_profile = os.getenv('USERPROFILE', '')
+        user_profile = os.getenv('USERPROFILE') or os.path.expanduser('~')
         paths = []
 
         default_folders = [
@@ -86,85 +113,94 @@ class FileMonitor:
 
         return paths
 
-    def categorize_file(self, filepath):
-        """Get category for a file"""
-        ext = Path(filepath).suffix.lower()
+    def update_rules(self, policy):
+        """
+        Apply file rules from the server
 
-        for category, extensions in FILE_CATEGORIES.items():
-            if ext in extensions:
-                return category
+        Args:
+            policy: Dict with optional exclude, include (globs), categories
+                ({category: [extensions]}) and sensitive (keywords); None
+                restores the defaults
+        """
+        if policy == self.rules_policy:
+            return
+        try:
+            rules = PathRules.from_policy(policy)
+        except Exception as e:
+            print(f"Invalid file rules, keeping current ones: {e}")
+            return
+        self.rules = rules
+        self.rules_policy = policy
+        # Watches and snapshots were set up under the old rules; redo them
+        if self.running and self.watcher:
+            for path in self.watch_paths:
+                self.watcher.remove_root(path)
+                self.watcher.add_root(path)
+        self.reconcilers.clear()
+        self.reconcile_wake.set()
+        if policy and 'hashing' in policy:
+            self.set_hashing(bool(policy['hashing']))
+        print(f"File rules updated: {rules.describe()}")
+
+    def set_hashing(self, enabled):
+        """Turn content hashing of file events on or off"""
+        if enabled and not self.hasher:
+            self.hasher = FileHasher(self._deliver_event)
+            if self.running:
+                self.hasher.start()
+        elif not enabled and self.hasher:
+            hasher, self.hasher = self.hasher, None
+            hasher.stop()
 
-        return 'other'
+    def categorize_file(self, filepath):
+        """Get category for a file"""
+        return self.rules.category(filepath)
 
     def is_sensitive_file(self, filepath):
         """Check if file might contain sensitive data"""
-        filepath_lower = filepath.lower()
-        filename = os.path.basename(filepath_lower)
+        return self.rules.sensitive_keyword(filepath) is not None
 
-        for pattern in SENSITIVE_PATTERNS:
-            if pattern in filepath_lower or pattern in filename:
-                return True
+    def is_temp_file(self, filepath):
+        """Editor temp and lock files (~$doc.docx, ~WRL0001.tmp)"""
+        filename = os.path.basename(filepath)
+        return filename.startswith('~') or filename.endswith('.tmp')
 
-        return False
+    def _handle_file_event(self, base_path, action_name, filename):
+        """Process a raw file notification from the watcher"""
+        filepath = os.path.join(base_path, filename)
 
-    def watch_directory(self, path):
-        """Watch a directory for file changes"""
-        try:
-            # Get handle to directory
-            handle = win32file.CreateFile(
-                path,
-                win32con.GENERIC_READ,
-                win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
-                None,
-                win32con.OPEN_EXISTING,
-                win32con.FILE_FLAG_BACKUP_SEMANTICS,
-                None
-            )
-
-            print(f"Watching: {path}")
-
-            while self.running:
-                try:
-                    # Read directory changes
-                    results = win32file.ReadDirectoryChangesW(
-                        handle,
-                        1024,  # Buffer size
-                        True,  # Watch subtree
-                        win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
-                        win32con.FILE_NOTIFY_CHANGE_DIR_NAME |
-                        win32con.FILE_NOTIFY_CHANGE_ATTRIBUTES |
-                        win32con.FILE_NOTIFY_CHANGE_SIZE |
-                        win32con.FILE_NOTIFY_CHANGE_LAST_WRITE |
-                        win32con.FILE_NOTIFY_CHANGE_SECURITY,
-                        None,
-                        None
-                    )
-
-                    for action, filename in results:
-                        self._handle_file_event(path, action, filename)
-
-                except pywintypes.error as e:
-                    if e.winerror == 995:  # Operation aborted
-                        break
-                    print(f"Watch error in {path}: {e}")
-                    time.sleep(1)
-
-            win32file.CloseHandle(handle)
+        # Caches, VCS and package trees are dropped before any work is done
+        if self.rules.is_excluded(filepath):
+            self.stats['excluded'] += 1
+            return
 
-        except Exception as e:
-            print(f"Error watching {path}: {e}")
+        if self.reconcile_interval:
+            with self.lock:
+                self.seen.setdefault(base_path, set()).add(os.path.normcase(filepath))
 
-    def _handle_file_event(self, base_path, action, filename):
-        """Process a file event"""
-        action_name = FILE_ACTIONS.get(action, 'unknown')
-        filepath = os.path.join(base_path, filename)
+        if self.coalescer:
+            # Temp files are filtered after coalescing, so saves via temp files merge
+            self.coalescer.add(action_name, filepath, source=base_path)
+            return
 
         # Skip temporary files
-        if filename.startswith('~') or filename.endswith('.tmp'):
+        if self.is_temp_file(filepath):
             return
 
-        category = self.categorize_file(filepath)
-        is_sensitive = self.is_sensitive_file(filepath)
+        self._record_event(action_name, filepath, base_path)
+
+    def _on_coalesced_event(self, action_name, filepath, info):
+        """A path's burst of notifications is over"""
+        self._record_event(action_name, filepath, info['source'], info)
+
+    def _record_event(self, action_name, filepath, base_path, info=None):
+        """Store a file event and notify"""
+        classified = self.rules.classify(filepath)
+        if classified is None:
+            return  # excluded by rules that changed while it was pending
+        category, extension, keyword = classified
+        is_sensitive = keyword is not None
+        filename = os.path.relpath(filepath, base_path) if base_path else os.path.basename(filepath)
 
         event = {
             'timestamp': datetime.now().isoformat(),
@@ -174,72 +210,125 @@ class FileMonitor:
             'directory': base_path,
             'category': category,
             'is_sensitive': is_sensitive,
-            'extension': Path(filename).suffix.lower(),
+            'extension': extension,
         }
-
-        # Get file size for created/modified
-        if action_name in ['created', 'modified'] and os.path.exists(filepath):
+        if keyword:
+            event['sensitive_match'] = keyword
+        if info:
+            event['raw_events'] = info['raw_events']
+            if info.get('reconciled'):
+                event['reconciled'] = True
+            if action_name == 'renamed':
+                event['old_filepath'] = info['old_filepath']
+                event['modified'] = info['modified']
+
+        # Get file size for created/modified/renamed
+        if action_name in ['created', 'modified', 'renamed'] and os.path.exists(filepath):
             try:
                 event['file_size'] = os.path.getsize(filepath)
             except Exception:
                 event['file_size'] = 0
 
+        # Hashed off this thread; the hasher delivers it when done
+        hasher = self.hasher
+        if hasher and hasher.submit(event):
+            return
+        self._deliver_event(event)
+
+    def _deliver_event(self, event):
+        """Store a finished file event and notify"""
+        action_name = event['action']
         with self.lock:
-            self.events.append(event)
+            self.events.add(event)
 
             # Update stats
             if action_name in ['created', 'modified', 'deleted']:
                 self.stats[action_name] += 1
             elif action_name.startswith('renamed'):
                 self.stats['renamed'] += 1
+            if event.get('reconciled'):
+                self.stats['reconciled'] += 1
 
         if self.on_file_event:
             self.on_file_event(event)
 
         # Alert on sensitive files
-        if is_sensitive:
-            print(f"[SENSITIVE] {action_name}: {filepath}")
+        if event['is_sensitive']:
+            print(f"[SENSITIVE] {action_name}: {event['filepath']}")
+
+    def _on_overflow(self, base_path):
+        """The watcher lost notifications for a tree: recover them from its snapshot"""
+        self.stats['overflows'] += 1
+        self.request_reconcile(base_path)
 
     def add_watch_path(self, path):
         """Add a directory to watch"""
         if path not in self.watch_paths and os.path.exists(path):
             self.watch_paths.append(path)
             if self.running:
-                # Start new watcher thread
-                thread = threading.Thread(target=self.watch_directory, args=(path,), daemon=True)
-                thread.start()
-                self.threads.append(thread)
+                if self.watcher:
+                    self.watcher.add_root(path)
+                self.request_reconcile(path)
 
     def remove_watch_path(self, path):
         """Remove a directory from watch list"""
         if path in self.watch_paths:
             self.watch_paths.remove(path)
-            # Thread will stop on next iteration
+            if self.watcher:
+                self.watcher.remove_root(path)
+            self.reconcilers.pop(path, None)
 
-    def get_events(self, clear=False, action_filter=None, category_filter=None):
-        """Get file events with optional filters"""
-        with self.lock:
-            events = list(self.events)
-
-            if action_filter:
-                events = [e for e in events if e['action'] == action_filter]
+    def get_events(self, clear=False, action_filter=None, category_filter=None,
+                   prefix=None, since=None, limit=None):
+        """
+        Get file events with optional filters, oldest first
 
-            if category_filter:
-                events = [e for e in events if e['category'] == category_filter]
+        Args:
+            prefix: Only events under this folder; a relative folder
+                ('Documents/Finance') is looked up under each watch path
+            since: Only events recorded since this time (epoch seconds)
+            limit: Only the newest `limit` events
+        """
+        with self.lock:
+            if prefix is not None and not os.path.isabs(prefix):
+                events = []
+                for path in self.watch_paths:
+                    events.extend(self.events.query(os.path.join(path, prefix), since, action_filter,
+                                                    category_filter, limit=limit))
+                events.sort(key=lambda e: e['timestamp'])
+                if limit is not None:
+                    events = events[-limit:] if limit else []
+            else:
+                events = self.events.query(prefix, since, action_filter, category_filter, limit=limit)
 
             if clear:
                 self.events.clear()
 
         return events
 
-    def get_sensitive_events(self, clear=False):
+    def get_sensitive_events(self, clear=False, since=None, limit=None):
         """Get only sensitive file events"""
         with self.lock:
-            events = [e for e in self.events if e.get('is_sensitive')]
             if clear:
                 # Only clear sensitive events
-                self.events = deque([e for e in self.events if not e.get('is_sensitive')], maxlen=10000)
-        return events
+                return self.events.remove_sensitive()
+            return self.events.query(since=since, sensitive=True, limit=limit)
+
+    def get_folder_rollup(self, prefix=None, depth=1, limit=20):
+        """
+        Event, byte and sensitive counts per folder, busiest first
+
+        Args:
+            prefix: Folder to break down (default: each watch path)
+            depth: Folder levels below prefix to report
+        """
+        with self.lock:
+            prefixes = [prefix] if prefix else self.watch_paths
+            rows = []
+            for path in prefixes:
+                rows.extend(self.events.rollup(path, depth))
+        rows.sort(key=lambda row: row['events'], reverse=True)
+        return rows[:limit]
 
     def get_stats(self):
         """Get file operation statistics"""
@@ -252,7 +341,12 @@ class FileMonitor:
             'running': self.running,
             'watch_paths': self.watch_paths,
             'total_events': len(self.events),
-            'stats': self.get_stats()
+            'stats': self.get_stats(),
+            'watcher': self.watcher.get_stats() if self.watcher else None,
+            'coalescing': self.coalescer.get_stats() if self.coalescer else None,
+            'hashing': self.hasher.get_stats() if self.hasher else None,
+            'rules': self.rules.describe(),
+            'snapshots': {path: r.get_stats() for path, r in list(self.reconcilers.items())},
         }
 
     def start(self):
@@ -262,23 +356,129 @@ class FileMonitor:
 
         self.running = True
 
-        # Start watcher thread for each path
-        for path in self.watch_paths:
-            thread = threading.Thread(target=self.watch_directory, args=(path,), daemon=True)
+        if self.hasher:
+            self.hasher.start()
+
+        if self.watcher:
+            for path in self.watch_paths:
+                self.watcher.add_root(path)
+            self.watcher.start()
+        else:
+            print(f"No file watcher for {sys.platform}; changes are found by periodic rescans")
+
+        # Emits coalesced events as their debounce windows expire
+        if self.coalescer:
+            thread = threading.Thread(target=self._flush_loop, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        # Indexes the watched trees, then recovers missed events
+        if self.reconcile_interval:
+            thread = threading.Thread(target=self._reconcile_loop, daemon=True)
             thread.start()
             self.threads.append(thread)
 
         print(f"File monitor started ({len(self.watch_paths)} directories)")
 
+    def _flush_loop(self):
+        """Advance the coalescer's timer wheel"""
+        while self.running:
+            time.sleep(self.coalescer.timers.tick)
+            try:
+                self.coalescer.flush_due()
+            except Exception as e:
+                print(f"File event flush error: {e}")
+
+    def _is_unindexed(self, filepath):
+        return self.rules.is_excluded(filepath) or self.is_temp_file(filepath)
+
+    def request_reconcile(self, path):
+        """Diff a watched tree against its snapshot soon (full pass)"""
+        with self.lock:
+            self.reconcile_requests.add(path)
+        self.reconcile_wake.set()
+
+    def reconcile(self, path, full=False):
+        """
+        Diff one watched tree against its snapshot and record what its watch missed
+
+        Changes to paths that were notified since the last diff were already
+        reported (or are pending in the coalescer) and are skipped.
+
+        Returns:
+            Number of events recovered
+        """
+        reconciler = self.reconcilers.get(path)
+        if reconciler is None:
+            reconciler = SnapshotReconciler(path, self._is_unindexed)
+            reconciler.build()
+            self.reconcilers[path] = reconciler
+            with self.lock:
+                self.seen.pop(path, None)
+            return 0
+
+        changes = reconciler.reconcile(full)
+        with self.lock:
+            seen = self.seen.pop(path, set())
+
+        recovered = 0
+        for action, filepath, old_filepath, modified in changes:
+            if os.path.normcase(filepath) in seen or (old_filepath and os.path.normcase(old_filepath) in seen):
+                continue
+            recovered += 1
+            self._record_event(action, filepath, path, {
+                'old_filepath': old_filepath,
+                'modified': modified,
+                'source': path,
+                'raw_events': 0,
+                'reconciled': True,
+            })
+        return recovered
+
+    def _reconcile_loop(self):
+        """Index each watched tree, then diff periodically and after overflows"""
+        passes = 0
+        while self.running:
+            with self.lock:
+                requested, self.reconcile_requests = self.reconcile_requests, set()
+
+            for path in list(self.watch_paths):
+                if not self.running:
+                    break
+                if requested and path not in requested and path in self.reconcilers:
+                    continue  # woken for another tree
+                full = path in requested or passes % FULL_RECONCILE_EVERY == FULL_RECONCILE_EVERY - 1
+                try:
+                    recovered = self.reconcile(path, full)
+                    if recovered:
+                        print(f"Recovered {recovered} missed file events in {path}")
+                except Exception as e:
+                    print(f"Reconcile error in {path}: {e}")
+            if not requested:
+                passes += 1
+
+            self.reconcile_wake.wait(self.reconcile_interval)
+            self.reconcile_wake.clear()
+            if self.running and self.reconcile_requests:
+                # Let an overflow storm settle so it costs one pass
+                time.sleep(OVERFLOW_SETTLE_SECONDS)
+
     def stop(self):
         """Stop file monitoring"""
         self.running = False
+        self.reconcile_wake.set()
+        if self.watcher:
+            self.watcher.stop()
 
         # Threads will stop on their own
         for thread in self.threads:
             thread.join(timeout=2)
 
         self.threads.clear()
+        if self.coalescer:
+            self.coalescer.flush_all()
+        if self.hasher:
+            self.hasher.stop()
         print("File monitor stopped")
 
 
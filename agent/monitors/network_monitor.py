@@ -10,13 +10,19 @@ from collections import deque, defaultdict
 
 import psutil
 
+try:
+    from .process_table import get_process_table
+except ImportError:
+    from process_table import get_process_table
+
 
 class NetworkMonitor:
-    def __init__(self, on_network_callback=None, interval=30):
+    def __init__(self, on_network_callback=None, interval=30, process_table=None):
         self.running = False
         self.thread = None
         self.on_network = on_network_callback
         self.interval = interval
+        self.process_table = process_table or get_process_table()
         self.lock = threading.Lock()
 
         self.network_events = deque(maxlen=2000)
@@ -37,12 +43,9 @@ class NetworkMonitor:
             connections = psutil.net_connections(kind='inet')
             for conn in connections:
                 if conn.pid and conn.pid > 0:
-                    try:
-                        proc = psutil.Process(conn.pid)
-                        name = proc.name()
-                        process_conns[name] += 1
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
+                    record = self.process_table.get(conn.pid)
+                    if record:
+                        process_conns[record.name] += 1
         except (psutil.AccessDenied, PermissionError):
             pass
         return process_conns
@@ -50,6 +53,7 @@ class NetworkMonitor:
     def _get_process_net_usage(self):
         """Get per-process network usage estimates based on connections and IO counters"""
         results = []
+        records = self.process_table.snapshot(max_age=self.interval / 2)
         process_conns = self._get_process_connections()
 
         # Get total network IO
@@ -70,12 +74,13 @@ class NetworkMonitor:
         total_process_io_read = 0
         total_process_io_write = 0
 
-        for proc in psutil.process_iter(['pid', 'name']):
+        for record in records:
             try:
-                name = proc.info['name']
-                if name in process_conns and process_conns[name] > 0:
+                name = record.name
+                proc = self.process_table.process(record.pid)
+                if proc and name in process_conns and process_conns[name] > 0:
                     io = proc.io_counters()
-                    pid = proc.info['pid']
+                    pid = record.pid
                     key = f"{name}_{pid}"
 
                     if key in self._prev_counters:
@@ -125,10 +130,13 @@ class NetworkMonitor:
         # Initial snapshot
         self._prev_total = psutil.net_io_counters()
         # Warm up process IO counters
-        for proc in psutil.process_iter(['pid', 'name']):
+        for record in self.process_table.snapshot(max_age=self.interval / 2):
+            proc = self.process_table.process(record.pid)
+            if proc is None:
+                continue
             try:
                 io = proc.io_counters()
-                key = f"{proc.info['name']}_{proc.info['pid']}"
+                key = f"{record.name}_{record.pid}"
                 self._prev_counters[key] = {
                     'read': io.read_bytes,
                     'write': io.write_bytes,
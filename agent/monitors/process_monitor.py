@@ -1,22 +1,26 @@
 """
 Process Monitor - Tracks active applications and window titles
+Activity is recorded per (application, normalized window title) segment.
 """
 
 import time
 import threading
 from datetime import datetime
-from collections import deque
 
-import psutil
-import win32gui
-import win32process
+try:
+    from .window_sampler import get_window_sampler
+    from .activity_sessions import SessionLog, TitleNormalizer
+except ImportError:
+    from window_sampler import get_window_sampler
+    from activity_sessions import SessionLog, TitleNormalizer
 
 
 class ProcessMonitor:
-    def __init__(self):
+    def __init__(self, sampler=None, title_rules=None):
         self.running = False
-        self.thread = None
-        self.activities = deque(maxlen=1000)  # Buffer for activities
+        self.sampler = sampler or get_window_sampler()
+        self.titles = TitleNormalizer(title_rules)
+        self.activities = SessionLog(maxlen=1000)  # Buffer for activities
         self.current_app = None
         self.current_title = None
         self.current_exe = None
@@ -24,74 +28,39 @@ class ProcessMonitor:
         self.lock = threading.Lock()
 
     def get_active_window_info(self):
-        """Get information about the currently active window"""
-        try:
-            hwnd = win32gui.GetForegroundWindow()
-            if not hwnd:
-                return None, None, None
-
-            # Get window title
-            title = win32gui.GetWindowText(hwnd)
-
-            # Get process ID
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-
-            # Get process info
-            try:
-                process = psutil.Process(pid)
-                app_name = process.name()
-                exe_path = process.exe()
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                app_name = "Unknown"
-                exe_path = None
-
-            return app_name, title, exe_path
-        except Exception as e:
-            print(f"Error getting active window: {e}")
+        """Get information about the currently active window (from the shared sampler)"""
+        context = self.sampler.current()
+        if not context['hwnd']:
             return None, None, None
+        return context['app_name'] or "Unknown", self.titles.normalize(context['title']), context['exe_path']
+
+    def set_title_rules(self, rules):
+        """Replace the title normalization rules ([(pattern, replacement)], None for defaults)"""
+        self.titles = TitleNormalizer(rules)
 
     def record_session(self):
         """Record the current session to activities buffer"""
         if self.current_app and self.session_start:
-            end_time = datetime.now()
-            duration = int((end_time - self.session_start).total_seconds())
-
-            if duration > 0:  # Only record if at least 1 second
-                activity = {
-                    'app_name': self.current_app,
-                    'window_title': self.current_title or '',
-                    'executable_path': self.current_exe,
-                    'started_at': self.session_start.isoformat(),
-                    'ended_at': end_time.isoformat(),
-                    'duration_seconds': duration
-                }
-
-                with self.lock:
-                    self.activities.append(activity)
-
-    def monitor_loop(self):
-        """Main monitoring loop"""
-        while self.running:
-            try:
-                app_name, title, exe_path = self.get_active_window_info()
-
-                if app_name and app_name != self.current_app:
-                    # Application changed - record previous session
-                    self.record_session()
-
-                    # Start new session
-                    self.current_app = app_name
-                    self.current_title = title
-                    self.current_exe = exe_path
-                    self.session_start = datetime.now()
-                elif title != self.current_title:
-                    # Same app but title changed (e.g., switched tabs)
-                    self.current_title = title
-
-                time.sleep(1)  # Check every second
-            except Exception as e:
-                print(f"Monitor error: {e}")
-                time.sleep(1)
+            with self.lock:
+                self.activities.record(self.current_app, self.current_title or '', self.current_exe,
+                                       self.session_start, datetime.now())
+
+    def on_window_change(self, previous, context):
+        """Sampler callback: start a new session when the application or title changes"""
+        if not self.running:
+            return
+        app_name, title, exe_path = self.get_active_window_info()
+
+        # Titles are normalized, so an unread counter ticking over is not a change
+        if app_name and (app_name != self.current_app or title != self.current_title):
+            # Record previous session
+            self.record_session()
+
+            # Start new session
+            self.current_app = app_name
+            self.current_title = title
+            self.current_exe = exe_path
+            self.session_start = datetime.now()
 
     def start(self):
         """Start the process monitor"""
@@ -107,27 +76,30 @@ class ProcessMonitor:
         self.current_title = title
         self.current_exe = exe_path
 
-        self.thread = threading.Thread(target=self.monitor_loop, daemon=True)
-        self.thread.start()
+        self.sampler.subscribe(self.on_window_change)
+        self.sampler.start()
         print("Process monitor started")
 
     def stop(self):
         """Stop the process monitor"""
+        if not self.running:
+            return
         self.running = False
+        self.sampler.unsubscribe(self.on_window_change)
+        self.sampler.stop()
         self.record_session()  # Record final session
 
-        if self.thread:
-            self.thread.join(timeout=2)
-
         print("Process monitor stopped")
 
     def get_activities(self, clear=True):
         """Get buffered activities and optionally clear the buffer"""
         with self.lock:
-            activities = list(self.activities)
-            if clear:
-                self.activities.clear()
-        return activities
+            return self.activities.get(clear)
+
+    def requeue_activities(self, activities):
+        """Put activities taken with get_activities() back, e.g. after a failed send"""
+        with self.lock:
+            self.activities.restore(activities)
 
     def get_current_activity(self):
         """Get information about the current activity"""
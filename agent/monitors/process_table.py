@@ -0,0 +1,250 @@
+"""
+Process Table - One shared, cached view of the running processes
+Monitors that need the process list read it from here instead of each walking
+psutil.process_iter. A refresh lists the pids, keeps the records of processes
+it already knows (same pid and create time) and reads name and exe only for
+new ones, so a steady system costs one identity check per process.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+
+REFRESH_INTERVAL = 2.0  # seconds
+
+
+class ProcessRecord(NamedTuple):
+    pid: int
+    create_time: float  # epoch seconds
+    name: str
+    exe: Optional[str]  # None when access is denied
+
+
+class ProcessTable:
+    """
+    Snapshot of the process table, refreshed on a thread or on demand
+
+    Records are keyed by (pid, create_time), so a reused pid is a new
+    process. After each refresh, subscribers are called on the refreshing
+    thread with (started, exited) lists of ProcessRecord.
+
+    Args:
+        interval: Seconds between refreshes while started, unless a user
+            asks for a shorter one
+    """
+
+    def __init__(self, interval: float = REFRESH_INTERVAL):
+        self.base_interval = interval
+        self.interval = interval
+        self.intervals: List[float] = []  # shorter intervals asked for by current users
+        self.records: Dict[Tuple[int, float], ProcessRecord] = {}
+        self.by_pid: Dict[int, ProcessRecord] = {}
+        self.procs: Dict[int, psutil.Process] = {}  # pid -> psutil handle, for io_counters() etc.
+        self.refreshed_at = None  # monotonic
+        self.subscribers: List[Callable] = []
+        self.lock = threading.Lock()  # serializes refreshes and start/stop
+        self.users = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        self.stats = {
+            'refreshes': 0,
+            'started': 0,
+            'exited': 0,
+            'last_duration': None,
+        }
+
+    def refresh(self) -> Tuple[List[ProcessRecord], List[ProcessRecord]]:
+        """
+        Re-read the process table and notify subscribers of changes
+
+        Returns:
+            (started, exited) since the previous refresh
+        """
+        with self.lock:
+            started, exited = self._refresh()
+        if started or exited:
+            for callback in self.subscribers:
+                try:
+                    callback(started, exited)
+                except Exception as e:
+                    print(f"Process table subscriber error: {e}")
+        return started, exited
+
+    def _refresh(self):
+        began = time.perf_counter()
+        first = self.refreshed_at is None
+        records, by_pid, procs = {}, {}, {}
+        started = []
+
+        for pid in psutil.pids():
+            proc = self.procs.get(pid)
+            try:
+                # is_running() compares create times, so it catches pid reuse
+                if proc is None or not proc.is_running():
+                    proc = psutil.Process(pid)
+                key = (pid, proc.create_time())
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+
+            record = self.records.get(key)
+            if record is None:
+                try:
+                    with proc.oneshot():
+                        name = proc.name()
+                        try:
+                            exe = proc.exe() or None
+                        except (psutil.AccessDenied, psutil.ZombieProcess):
+                            exe = None
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+                record = ProcessRecord(pid, key[1], name, exe)
+                if not first:
+                    started.append(record)
+            records[key] = record
+            by_pid[pid] = record
+            procs[pid] = proc
+
+        exited = [record for key, record in self.records.items() if key not in records]
+        # Replaced, not modified, so readers never see a half-built table
+        self.records, self.by_pid, self.procs = records, by_pid, procs
+        self.refreshed_at = time.monotonic()
+
+        self.stats['refreshes'] += 1
+        self.stats['started'] += len(started)
+        self.stats['exited'] += len(exited)
+        self.stats['last_duration'] = round(time.perf_counter() - began, 4)
+        return started, exited
+
+    def snapshot(self, max_age: Optional[float] = None) -> List[ProcessRecord]:
+        """
+        The running processes
+
+        Args:
+            max_age: Refresh first if the table is older than this (seconds)
+        """
+        if max_age is not None and (self.refreshed_at is None
+                                    or time.monotonic() - self.refreshed_at > max_age):
+            self.refresh()
+        return list(self.by_pid.values())
+
+    def get(self, pid: int) -> Optional[ProcessRecord]:
+        """The record of a pid as of the last refresh, or None"""
+        return self.by_pid.get(pid)
+
+    def process(self, pid: int) -> Optional[psutil.Process]:
+        """The psutil handle of a pid as of the last refresh, or None"""
+        return self.procs.get(pid)
+
+    def subscribe(self, callback: Callable):
+        """Call callback(started, exited) after every refresh that changed something"""
+        with self.lock:
+            if callback not in self.subscribers:
+                self.subscribers = self.subscribers + [callback]
+
+    def unsubscribe(self, callback: Callable):
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s != callback]
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Process table error: {e}")
+
+    def _set_interval(self):
+        """Run at the shortest interval a current user asked for (caller holds the lock)"""
+        self.interval = min(self.intervals + [self.base_interval])
+
+    def start(self, interval: Optional[float] = None):
+        """
+        Refresh periodically; each start() needs a matching stop()
+
+        Args:
+            interval: Refresh at least this often; the table runs at the
+                shortest interval any current user has asked for
+        """
+        with self.lock:
+            self.users += 1
+            if interval is not None:
+                self.intervals.append(interval)
+                self._set_interval()
+            if self.thread is not None:
+                return
+            if self.refreshed_at is None:
+                self._refresh()
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+
+    def stop(self, interval: Optional[float] = None):
+        """
+        Stop refreshing once the last user has stopped
+
+        Args:
+            interval: The interval passed to the matching start()
+        """
+        with self.lock:
+            self.users = max(0, self.users - 1)
+            if interval is not None and interval in self.intervals:
+                self.intervals.remove(interval)
+                self._set_interval()
+            if self.users or self.thread is None:
+                return
+            thread, self.thread = self.thread, None
+            self.stop_event.set()
+        thread.join(timeout=2)
+
+    def get_stats(self) -> dict:
+        """Get process table statistics"""
+        return {
+            **self.stats,
+            'processes': len(self.by_pid),
+            'running': self.thread is not None,
+            'interval': self.interval,
+            'users': self.users,
+            'subscribers': len(self.subscribers),
+        }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_process_table() -> ProcessTable:
+    """The process table shared by every monitor in the process"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ProcessTable()
+        return _shared
+
+
+if __name__ == "__main__":
+    table = ProcessTable()
+    began = time.perf_counter()
+    table.refresh()
+    print(f"{len(table.snapshot())} processes, first refresh {time.perf_counter() - began:.3f}s")
+    began = time.perf_counter()
+    table.refresh()
+    print(f"Steady refresh {time.perf_counter() - began:.3f}s")
+
+    def on_change(started, exited):
+        for record in started:
+            print(f"  [START] {record.name} (PID: {record.pid}) {record.exe}")
+        for record in exited:
+            print(f"  [EXIT] {record.name} (PID: {record.pid})")
+
+    table.subscribe(on_change)
+    table.start()
+    print("Watching process starts and exits (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        table.stop()
+        print(table.get_stats())
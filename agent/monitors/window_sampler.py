@@ -0,0 +1,333 @@
+"""
+Window Sampler - One shared view of the foreground window
+A single thread polls the foreground window and publishes a context dict
+(title, pid, process name and exe) that any monitor can read without making
+its own Win32 calls. Process details are cached per (pid, create_time), so
+switching back to a window costs one query, not a name and exe lookup.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import win32gui
+    import win32process
+except ImportError:
+    win32gui = None
+    win32process = None
+
+
+SAMPLE_INTERVAL = 0.2  # seconds
+PROCESS_CACHE_SIZE = 256
+
+EMPTY_CONTEXT = {
+    'hwnd': 0,
+    'title': '',
+    'pid': None,
+    'app_name': None,
+    'exe_path': None,
+    'since': None,
+}
+
+
+class Win32WindowSource:
+    """Foreground window and process details from Win32 and psutil"""
+
+    def foreground_window(self) -> int:
+        return win32gui.GetForegroundWindow() or 0
+
+    def window_title(self, hwnd: int) -> str:
+        return win32gui.GetWindowText(hwnd)
+
+    def window_pid(self, hwnd: int) -> Optional[int]:
+        _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        return pid or None
+
+    def process_start(self, pid: int) -> Optional[float]:
+        """Creation time of a process, or None if it is gone"""
+        try:
+            return psutil.Process(pid).create_time()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+    def process_info(self, pid: int) -> Tuple[Optional[str], Optional[str]]:
+        """(name, exe path); either may be None when access is denied"""
+        try:
+            proc = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return None, None
+        name = exe = None
+        try:
+            name = proc.name()
+            exe = proc.exe()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+        return name, exe
+
+
+class FakeWindowSource:
+    """
+    Scripted windows and processes, for running the sampler without a desktop
+
+    Args:
+        processes: {pid: (create_time, name, exe)}
+    """
+
+    def __init__(self, processes: Optional[dict] = None):
+        self.processes = dict(processes or {})
+        self.windows = {}  # hwnd -> [title, pid]
+        self.hwnd = 0
+        self.calls = {'foreground_window': 0, 'window_title': 0, 'window_pid': 0,
+                      'process_start': 0, 'process_info': 0}
+
+    def focus(self, hwnd: int, title: Optional[str] = None, pid: Optional[int] = None):
+        """Bring a window to the front, creating or updating it"""
+        window = self.windows.setdefault(hwnd, ['', None])
+        if title is not None:
+            window[0] = title
+        if pid is not None:
+            window[1] = pid
+        self.hwnd = hwnd
+
+    def set_title(self, hwnd: int, title: str):
+        self.windows[hwnd][0] = title
+
+    def foreground_window(self) -> int:
+        self.calls['foreground_window'] += 1
+        return self.hwnd
+
+    def window_title(self, hwnd: int) -> str:
+        self.calls['window_title'] += 1
+        return self.windows.get(hwnd, ('', None))[0]
+
+    def window_pid(self, hwnd: int) -> Optional[int]:
+        self.calls['window_pid'] += 1
+        return self.windows.get(hwnd, ('', None))[1]
+
+    def process_start(self, pid: int) -> Optional[float]:
+        self.calls['process_start'] += 1
+        process = self.processes.get(pid)
+        return process[0] if process else None
+
+    def process_info(self, pid: int) -> Tuple[Optional[str], Optional[str]]:
+        self.calls['process_info'] += 1
+        process = self.processes.get(pid)
+        return (process[1], process[2]) if process else (None, None)
+
+
+def create_source():
+    """The platform's window source, or None where there is none"""
+    if win32gui is not None and psutil is not None:
+        return Win32WindowSource()
+    return None
+
+
+class WindowSampler:
+    """
+    Polls the foreground window on one thread and shares the result
+
+    The context is a dict that is replaced, never modified, on each change,
+    so current() is a plain attribute read. Subscribers are called on the
+    sampler thread with (previous, current) when the window, process or
+    title changes.
+
+    Args:
+        source: Window source (default: the platform's, see create_source)
+        interval: Seconds between samples
+    """
+
+    def __init__(self, source=None, interval: float = SAMPLE_INTERVAL):
+        self.source = source if source is not None else create_source()
+        self.interval = interval
+        self.context = EMPTY_CONTEXT
+        self.subscribers: List[Callable] = []
+        self.process_cache = OrderedDict()  # (pid, create_time) -> (name, exe)
+        self.window_pid = (0, None)  # last hwnd and its pid
+        self.lock = threading.Lock()
+        self.users = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        self.stats = {
+            'samples': 0,
+            'changes': 0,
+            'process_lookups': 0,
+            'process_cache_hits': 0,
+            'errors': 0,
+        }
+
+    def current(self) -> dict:
+        """The current foreground context (do not modify it)"""
+        return self.context
+
+    def subscribe(self, callback: Callable):
+        """Call callback(previous, current) on every change"""
+        with self.lock:
+            if callback not in self.subscribers:
+                self.subscribers = self.subscribers + [callback]
+
+    def unsubscribe(self, callback: Callable):
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s != callback]
+
+    def _process(self, pid: int) -> Tuple[Optional[str], Optional[str]]:
+        """(name, exe) of a process, from the cache while it is the same process"""
+        create_time = self.source.process_start(pid)
+        if create_time is None:
+            return None, None
+        key = (pid, create_time)
+        cached = self.process_cache.get(key)
+        if cached is not None:
+            self.process_cache.move_to_end(key)
+            self.stats['process_cache_hits'] += 1
+            return cached
+        self.stats['process_lookups'] += 1
+        info = self.source.process_info(pid)
+        self.process_cache[key] = info
+        while len(self.process_cache) > PROCESS_CACHE_SIZE:
+            self.process_cache.popitem(last=False)
+        return info
+
+    def sample(self) -> Optional[dict]:
+        """
+        Take one sample and publish it if anything changed
+
+        Returns:
+            The new context if it changed, else None
+        """
+        if self.source is None:
+            return None
+        self.stats['samples'] += 1
+        try:
+            hwnd = self.source.foreground_window()
+            previous = self.context
+            if not hwnd:
+                if not previous['hwnd']:
+                    return None
+                context = {**EMPTY_CONTEXT, 'since': time.time()}
+            else:
+                title = self.source.window_title(hwnd)
+                # A window's process never changes, so only a new window is looked up
+                if hwnd == self.window_pid[0]:
+                    pid = self.window_pid[1]
+                else:
+                    pid = self.source.window_pid(hwnd)
+                    self.window_pid = (hwnd, pid)
+                if hwnd == previous['hwnd'] and title == previous['title'] and pid == previous['pid']:
+                    return None
+                if pid is not None and pid == previous['pid']:
+                    app_name, exe_path = previous['app_name'], previous['exe_path']
+                else:
+                    app_name, exe_path = self._process(pid) if pid else (None, None)
+                context = {
+                    'hwnd': hwnd,
+                    'title': title or '',
+                    'pid': pid,
+                    'app_name': app_name,
+                    'exe_path': exe_path,
+                    'since': time.time(),
+                }
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Window sampler error: {e}")
+            return None
+
+        self.context = context
+        self.stats['changes'] += 1
+        for callback in self.subscribers:
+            try:
+                callback(previous, context)
+            except Exception as e:
+                print(f"Window subscriber error: {e}")
+        return context
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        """Start sampling; each start() needs a matching stop()"""
+        with self.lock:
+            self.users += 1
+            if self.thread is not None or self.source is None:
+                return
+            self.stop_event.clear()
+            self.sample()
+            self.thread = threading.Thread(target=self._loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop sampling once the last user has stopped"""
+        with self.lock:
+            self.users = max(0, self.users - 1)
+            if self.users or self.thread is None:
+                return
+            thread, self.thread = self.thread, None
+            self.stop_event.set()
+        thread.join(timeout=2)
+
+    def get_stats(self) -> dict:
+        """Get sampler statistics"""
+        return {
+            **self.stats,
+            'running': self.thread is not None,
+            'users': self.users,
+            'subscribers': len(self.subscribers),
+            'cached_processes': len(self.process_cache),
+        }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_window_sampler() -> WindowSampler:
+    """The sampler shared by every monitor in the process"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = WindowSampler()
+        return _shared
+
+
+if __name__ == "__main__":
+    source = FakeWindowSource({
+        100: (1000.0, 'chrome.exe', r'C:\Program Files\Google\Chrome\Application\chrome.exe'),
+        200: (1001.0, 'WINWORD.EXE', r'C:\Program Files\Microsoft Office\root\Office16\WINWORD.EXE'),
+    })
+    sampler = WindowSampler(source)
+    printer = lambda old, new: print(f"  {old['app_name']} -> {new['app_name']}: {new['title']}")
+    sampler.subscribe(printer)
+
+    source.focus(1, 'Inbox - Gmail - Google Chrome', 100)
+    sampler.sample()
+    source.set_title(1, 'Pull requests - Google Chrome')
+    sampler.sample()
+    source.focus(2, 'Report.docx - Word', 200)
+    sampler.sample()
+    sampler.unsubscribe(printer)
+    for _ in range(100):  # alt-tabbing: cached after the first switch
+        source.focus(1)
+        sampler.sample()
+        source.focus(2)
+        sampler.sample()
+    print(sampler.get_stats())
+    print(source.calls)
+
+    if create_source() is not None:
+        sampler = get_window_sampler()
+        sampler.subscribe(lambda old, new: print(f"[{new['app_name']}] {new['title']}"))
+        sampler.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            sampler.stop()
@@ -11,6 +11,24 @@ try:
 except Exception as e:
     print(f"  [FAIL] AlertEngine: {e}")
 
+try:
+    from monitors.correlation_engine import CorrelationEngine
+    print("  [OK] CorrelationEngine")
+except Exception as e:
+    print(f"  [FAIL] CorrelationEngine: {e}")
+
+try:
+    from monitors.aggregate_rules import AggregateEvaluator
+    print("  [OK] AggregateEvaluator")
+except Exception as e:
+    print(f"  [FAIL] AggregateEvaluator: {e}")
+
+try:
+    from monitors.alert_journal import AlertJournal
+    print("  [OK] AlertJournal")
+except Exception as e:
+    print(f"  [FAIL] AlertJournal: {e}")
+
 try:
     from monitors.app_blocker import AppBlocker
     print("  [OK] AppBlocker")
@@ -41,6 +59,48 @@ try:
 except Exception as e:
     print(f"  [FAIL] DLPMonitor: {e}")
 
+try:
+    from monitors.dlp_workers import ScanWorkerPool
+    print("  [OK] ScanWorkerPool")
+except Exception as e:
+    print(f"  [FAIL] ScanWorkerPool: {e}")
+
+try:
+    from monitors.dlp_cache import ScanResultCache
+    print("  [OK] ScanResultCache")
+except Exception as e:
+    print(f"  [FAIL] ScanResultCache: {e}")
+
+try:
+    from monitors.dlp_extractors import TextExtractor
+    print("  [OK] TextExtractor")
+except Exception as e:
+    print(f"  [FAIL] TextExtractor: {e}")
+
+try:
+    from monitors.dlp_scanner import PatternScanner
+    print("  [OK] PatternScanner")
+except Exception as e:
+    print(f"  [FAIL] PatternScanner: {e}")
+
+try:
+    from monitors.dlp_patterns import PatternCompiler
+    print("  [OK] PatternCompiler")
+except Exception as e:
+    print(f"  [FAIL] PatternCompiler: {e}")
+
+try:
+    from monitors.dlp_edm import EDMIndex
+    print("  [OK] EDMIndex")
+except Exception as e:
+    print(f"  [FAIL] EDMIndex: {e}")
+
+try:
+    from monitors.dlp_fingerprint import FingerprintIndex
+    print("  [OK] FingerprintIndex")
+except Exception as e:
+    print(f"  [FAIL] FingerprintIndex: {e}")
+
 try:
     from monitors.employee_dashboard import EmployeeDashboard
     print("  [OK] EmployeeDashboard")
@@ -53,6 +113,60 @@ try:
 except Exception as e:
     print(f"  [FAIL] FileMonitor: {e}")
 
+try:
+    from monitors.file_events import EventCoalescer
+    print("  [OK] EventCoalescer")
+except Exception as e:
+    print(f"  [FAIL] EventCoalescer: {e}")
+
+try:
+    from monitors.path_rules import PathRules
+    print("  [OK] PathRules")
+except Exception as e:
+    print(f"  [FAIL] PathRules: {e}")
+
+try:
+    from monitors.file_snapshot import SnapshotReconciler
+    print("  [OK] SnapshotReconciler")
+except Exception as e:
+    print(f"  [FAIL] SnapshotReconciler: {e}")
+
+try:
+    from monitors.file_watchers import create_backend
+    print("  [OK] File watcher backends")
+except Exception as e:
+    print(f"  [FAIL] File watcher backends: {e}")
+
+try:
+    from monitors.file_hashing import FileHasher
+    print("  [OK] FileHasher")
+except Exception as e:
+    print(f"  [FAIL] FileHasher: {e}")
+
+try:
+    from monitors.file_index import EventIndex
+    print("  [OK] EventIndex")
+except Exception as e:
+    print(f"  [FAIL] EventIndex: {e}")
+
+try:
+    from monitors.window_sampler import WindowSampler
+    print("  [OK] WindowSampler")
+except Exception as e:
+    print(f"  [FAIL] WindowSampler: {e}")
+
+try:
+    from monitors.process_table import ProcessTable
+    print("  [OK] ProcessTable")
+except Exception as e:
+    print(f"  [FAIL] ProcessTable: {e}")
+
+try:
+    from monitors.activity_sessions import SessionLog
+    print("  [OK] SessionLog")
+except Exception as e:
+    print(f"  [FAIL] SessionLog: {e}")
+
 try:
     from monitors.idle_detector import IdleDetector
     print("  [OK] IdleDetector")